@@ -1,3 +1,4 @@
+from typing import Union
 from fastapi import Depends, HTTPException, status
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -5,12 +6,14 @@ from app.models.user import User
 from app.db.session import get_db
 from app.core.config import settings
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.future import select
+from app.schemas.user import TokenPrincipal
+from app.services.user_cache import user_cache
+from app.services.token_denylist import token_denylist
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> Union[User, TokenPrincipal]:
     try:
         # Decode the JWT token
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -25,21 +28,63 @@ async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depe
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Could not validate credentials"
         )
-    
-    # Fetch the user from the database
-    stmt = select(User).where(User.email == email)  # Use SQLAlchemy's `select`
-    result = await db.execute(stmt)
-    user = result.scalars().first()
-    
+
+    token_version = payload.get("ver", 0)
+
+    # Stateless mode: trust the signed claims, only check the revocation list
+    if settings.STATELESS_AUTH and payload.get("uid") is not None and payload.get("role"):
+        if await token_denylist.is_revoked(payload["uid"], token_version):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
+        return TokenPrincipal(
+            id=payload["uid"],
+            email=email,
+            role=payload["role"],
+            token_version=token_version
+        )
+
+    # Fetch the user, going to the database only on a cache miss
+    user = await user_cache.get_user(db, email)
+
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="User not found"
         )
-    
+
+    if token_version < (user.token_version or 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked"
+        )
+
+    return user
+
+
+async def get_current_user_model(db: AsyncSession = Depends(get_db), current_user: Union[User, TokenPrincipal] = Depends(get_current_user)) -> User:
+    """Full `User` row for handlers that need more than the token claims."""
+    if isinstance(current_user, User):
+        return current_user
+
+    user = await user_cache.get_user(db, current_user.email)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     return user
 
 
+async def revoke_user_tokens(db: AsyncSession, user: User):
+    """Bump the user's token version and commit, so tokens issued before a role or account change stop working."""
+    user.token_version = (user.token_version or 0) + 1
+    await db.commit()
+    await user_cache.invalidate(user.email)
+    await token_denylist.revoke_before(user.id, user.token_version)
+
+
 # async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
 #     try:
 #         # Decode the JWT token
@@ -3,6 +3,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
+from app.services.user_cache import user_cache
+from app.core.security import password_hash_pool
+from app.services.notification_outbox import notification_worker
 from app.schemas.admin import AllSellersResponse, SellerResponse, ChangeUserRoleRequest, AllUserResponse, UserResponse
 from app.db.session import get_db
 from sqlalchemy.future import select
@@ -84,8 +87,7 @@ async def change_user_role(user_id: int,request: ChangeUserRoleRequest,db: Async
 
     # ✅ Step 4: Update the user's role
     user.role = request.role
-    await db.commit()
-    await db.refresh(user)
+    await deps.revoke_user_tokens(db, user)  # tokens carrying the old role stop working
 
     return {"status": "success", "message": f"User role updated to {user.role}"}
 
@@ -152,3 +154,22 @@ async def get_users_current_year(
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
+
+# runtime metrics
+@router.get("/metrics", response_model=dict)
+async def get_metrics(db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view metrics"
+        )
+
+    return {
+        "status": "success",
+        "message": "Metrics retrieved successfully",
+        "data": {
+            "user_cache": user_cache.stats(),
+            "password_hashing": password_hash_pool.stats(),
+            "notification_outbox": await notification_worker.stats(db),
+        }
+    }
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.cart import Cart
-from app.schemas.cart import CartCreate, CartUpdate, CardCreateResponse, CartResponse, CartListResponse
+from collections import Counter
+from app.schemas.cart import CartCreate, CartUpdate, CardCreateResponse, CartResponse, CartListResponse, CartBatchCreate, CartBatchUpdate
 from app.db.session import get_db
+from app.models.cart import Cart
 from app.models.user import User
 from app.api import deps
-from sqlalchemy.future import select
+from app.services.cart import cart_store
 
 
 router = APIRouter(
@@ -14,41 +15,59 @@ router = APIRouter(
 )
 
 
-# cart create 
+# add a product to the cart; adding it again increases the quantity
 @router.post("/create", response_model=CardCreateResponse)
 async def create_cart(cart: CartCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
-    cart_item = Cart(**cart.model_dump(), user_id=current_user.id)
-
-    db.add(cart_item)
-    await db.commit()
-    await db.refresh(cart_item) 
+    quantity = await cart_store.add(db, current_user.id, cart.product_id, cart.quantity)
    
     response = {
         "status" : "success",
-        "message" : "Product created successfully",
-        "data" : CartResponse.model_validate(cart_item)
+        "message" : "Product added to cart",
+        "data" : CartResponse(product_id=cart.product_id, quantity=quantity, user_id=current_user.id)
     }
 
     return response
 
 
 
-# view cart
-@router.get("/", response_model=CartListResponse)
-async def get_cart(db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
-    result = await db.execute(select(Cart).where(Cart.user_id == current_user.id))
-    carts = result.scalars().all()
-
+async def _cart_response(db: AsyncSession, user_id: int, message: str):
+    lines, total = await cart_store.summary(db, user_id)
     return {
         "status": "success",
-        "message": "Cart retrieved successfully",
-        "count": len(carts),
-        "data": [CartResponse.model_validate(item) for item in carts]
+        "message": message,
+        "count": len(lines),
+        "data": lines,
+        "total": total
     }
 
 
+# add several products at once; quantities add to what is already in the cart
+@router.post("/items", response_model=CartListResponse)
+async def add_cart_items(batch: CartBatchCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
+    quantities = Counter()
+    for item in batch.items:
+        quantities[item.product_id] += item.quantity
+    await cart_store.add_many(db, current_user.id, quantities)
+    return await _cart_response(db, current_user.id, "Products added to cart")
 
-# delete cart
+
+# set the quantity of several products at once; 0 removes a product
+@router.put("/items", response_model=CartListResponse)
+async def update_cart_items(batch: CartBatchUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
+    await cart_store.set_many(db, current_user.id, {item.product_id: item.quantity for item in batch.items})
+    return await _cart_response(db, current_user.id, "Cart updated")
+
+
+
+# view cart with prices, subtotals and the total
+@router.get("/", response_model=CartListResponse)
+async def get_cart(db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
+    return await _cart_response(db, current_user.id, "Cart retrieved successfully")
+
+
+
+# remove a cart line by its row id; kept for existing clients, new ones use /products/{product_id}.
+# Row ids are only stable with the "db" cart backend: the Redis flusher rewrites a cart's rows.
 @router.delete("/{cart_id}")
 async def delete_cart(cart_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
     cart = await db.get(Cart, cart_id)
@@ -58,10 +77,21 @@ async def delete_cart(cart_id: int, db: AsyncSession = Depends(get_db), current_
     elif cart.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to delete this cart")
 
-    db.delete(cart)
-    await db.commit()   
+    await cart_store.remove(db, current_user.id, cart.product_id)
 
     return {
         "status": "success",
         "message": "Cart deleted successfully"
-    }
\ No newline at end of file
+    }
+
+
+# remove a product from the cart
+@router.delete("/products/{product_id}")
+async def delete_cart_product(product_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
+    if not await cart_store.remove(db, current_user.id, product_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not in cart")
+
+    return {
+        "status": "success",
+        "message": "Cart deleted successfully"
+    }
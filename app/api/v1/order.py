@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from app.db.session import get_db
 from app.models.user import User
-from app.schemas.order import OrderCreate, OrderResponse, OrderFullResponse, OrderList, OrderUpdateSchema
+from app.schemas.order import OrderCreate, CheckoutRequest, OrderResponse, OrderFullResponse, OrderSummaryList, OrderUpdateSchema
 from app.services.order import OrderService
+from app.services.idempotency import IdempotencyStore, idempotency_store
 from app.api import deps
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from app.models.order import Order, OrderItem
+from app.models.product import Product
 
 
 router = APIRouter(
@@ -16,48 +20,99 @@ router = APIRouter(
 )
 
 
+def _json_response(payload: BaseModel) -> Response:
+    return Response(content=payload.model_dump_json(), media_type="application/json")
+
+
 # create order endpoint
 @router.post("/create", response_model=OrderResponse)
 async def create_order(
     order_in: OrderCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255)
 ):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    
-    try:
-        new_order = await OrderService.create_order(db, order_in, current_user)
-        result = await db.execute(
-            select(Order)
-            .where(Order.id == new_order.id)
-            .options(
-                selectinload(Order.shipping_address),
-                selectinload(Order.order_items).selectinload(OrderItem.product)
-            )
-        )
-        loaded_order = result.scalars().first()
-        return {
-            "status": "success",
-            "message": "Order created",
-            "data": OrderFullResponse.model_validate(loaded_order)
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+
+    async def create():
+        try:
+            # The service returns the order with its address, items and products attached
+            new_order = await OrderService.create_order(db, order_in, current_user)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _json_response(OrderResponse(
+            status="success",
+            message="Order created",
+            data=OrderFullResponse.model_validate(new_order)
+        ))
+
+    if not idempotency_key:
+        return await create()
+    # a retried checkout replays the stored response instead of placing a second order
+    return await idempotency_store.run(
+        current_user.id, "orders:create", idempotency_key,
+        IdempotencyStore.fingerprint(order_in.model_dump_json().encode()), create
+    )
+
+
+# checkout endpoint: turns the current user's cart into an order
+@router.post("/checkout", response_model=OrderResponse)
+async def checkout(
+    checkout_in: CheckoutRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255)
+):
+    async def place():
+        try:
+            new_order = await OrderService.checkout(db, checkout_in.shipping_address_id, current_user)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _json_response(OrderResponse(
+            status="success",
+            message="Order created",
+            data=OrderFullResponse.model_validate(new_order)
+        ))
+
+    if not idempotency_key:
+        return await place()
+    return await idempotency_store.run(
+        current_user.id, "orders:checkout", idempotency_key,
+        IdempotencyStore.fingerprint(checkout_in.model_dump_json().encode()), place
+    )
 
 
 # payment endpoint
-@router.post("/{order_id}/pay", response_model=OrderFullResponse)
-async def process_payment(order_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
-    try:
-        loaded_order = await OrderService.process_payment(db, order_id)
-        return {
-            "status": "paid",
-            "message": "Order paid",
-            "data": OrderFullResponse.model_validate(loaded_order, from_attributes=True)
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@router.post("/{order_id}/pay", response_model=OrderResponse)
+async def process_payment(
+    order_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255)
+):
+    async def pay():
+        try:
+            loaded_order = await OrderService.process_payment(db, order_id)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _json_response(OrderResponse(
+            status="paid",
+            message="Order paid",
+            data=OrderFullResponse.model_validate(loaded_order, from_attributes=True)
+        ))
+
+    if not idempotency_key:
+        return await pay()
+    return await idempotency_store.run(
+        current_user.id, f"orders:{order_id}:pay", idempotency_key, IdempotencyStore.fingerprint(b""), pay
+    )
 
 
 # get order endpoint
@@ -66,7 +121,7 @@ async def get_order(order_id: int, db: AsyncSession = Depends(get_db), current_u
     result = await db.execute(select(Order).where(Order.id == order_id)
         .options(
             selectinload(Order.shipping_address),
-            selectinload(Order.order_items).selectinload(OrderItem.product)
+            selectinload(Order.order_items).selectinload(OrderItem.product).selectinload(Product.category)
         )
     )
     loaded_order = result.scalars().first()
@@ -82,43 +137,34 @@ async def get_order(order_id: int, db: AsyncSession = Depends(get_db), current_u
 
 
 # list orders endpoint
-@router.get("/", response_model=OrderList)
-async def list_orders(db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
-    result = await db.execute(select(Order)
-        .where(Order.user_id == current_user.id)
-        .options(
-            selectinload(Order.shipping_address),
-            selectinload(Order.order_items).selectinload(OrderItem.product)
-        )
-    )
-    loaded_orders = result.scalars().all()
-    
+@router.get("/", response_model=OrderSummaryList)
+async def list_orders(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_items: bool = Query(False, description="Attach compact line items to each order"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    orders, next_cursor = await OrderService.list_orders(db, current_user, limit, cursor, include_items)
     return {
         "status": "success",
         "message": "Orders found",
-        "count": len(loaded_orders),
-        "data": [OrderFullResponse.model_validate(order, from_attributes=True) for order in loaded_orders]
+        "count": len(orders),
+        "data": orders,
+        "next_cursor": next_cursor
     }
 
 
 # cancel order endpoint
 @router.delete("/{order_id}")
 async def cancel_order(order_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
-    result = await db.execute(select(Order).where(Order.id == order_id)
-        .options(
-            selectinload(Order.shipping_address),
-            selectinload(Order.order_items).selectinload(OrderItem.product)
-        )
-    )
-    loaded_order = result.scalars().first()
-    
-    if not loaded_order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    loaded_order.status = "cancelled"
-    await db.flush() 
-    await db.commit()
-    
+    try:
+        await OrderService.cancel_order(db, order_id, current_user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     return {
         "status": "success",
         "message": "Order cancelled"
@@ -133,6 +179,8 @@ async def update_order_status(order_id: int, order_update: OrderUpdateSchema, db
     
     try:
         updated_order = await OrderService.update_order_status(db, order_id, order_update)
-        return {"status": "success", "message": "Order status updated and user notified"}
+        return {"status": "success", "message": "Order status updated and user notified", "version": updated_order.version}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
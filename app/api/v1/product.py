@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
 import logging
 
 from app.db.session import get_db
@@ -9,11 +10,16 @@ from app.schemas.product import (
     ProductResponse,
     ProductListResponse,
     ProductCreateResponse,
-    ProductDetailsResponse
+    ProductDetailsResponse,
+    ProductImportResponse,
+    ProductBulkUpdateRequest,
+    ProductBulkUpdateResponse
 )
 from app.models.user import User
 from app.api.deps import get_current_user
 from app.services.product import ProductService
+from app.services.product_search import ProductSearchService
+from app.services.product_import import ProductImportService
 
 router = APIRouter(prefix="/products", tags=["products"])
 logger = logging.getLogger(__name__)
@@ -33,17 +39,74 @@ async def create_product(
     )
 
 
+@router.post("/import", response_model=ProductImportResponse)
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    fmt = format or ProductImportService.detect_format(file.filename, file.content_type)
+    report = await ProductImportService.import_stream(db, file.file, fmt, current_user)
+    return ProductImportResponse(
+        status="success" if not report.failed else "partial",
+        message=f"Imported {report.inserted} of {report.total_rows} products",
+        data=report
+    )
+
+
 @router.get("/", response_model=ProductListResponse)
 async def get_products(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: Literal["-updated_at", "updated_at", "price", "-price"] = "-updated_at",
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    is_active: Optional[bool] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    products = await ProductService.get_products(db, current_user)
+    products, next_cursor = await ProductService.get_products(
+        db, current_user,
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        is_active=is_active
+    )
     return ProductListResponse(
         status="success",
         message="Products successfully retrieved",
         count=len(products),
-        data=products
+        data=products,
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/search", response_model=ProductListResponse)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    category_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    products, next_cursor = await ProductSearchService.search(
+        db, current_user, q,
+        limit=limit,
+        cursor=cursor,
+        category_id=category_id
+    )
+    return ProductListResponse(
+        status="success",
+        message="Search results retrieved",
+        count=len(products),
+        data=products,
+        next_cursor=next_cursor
     )
 
 
@@ -53,13 +116,27 @@ async def get_product(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    product = await ProductService.get_product(db, product_id, current_user)
+    product = await ProductService.get_product_detail(db, product_id, current_user)
     return ProductDetailsResponse(
         status="success",
         message="Product successfully retrieved",
-        data=ProductResponse.model_validate(product)
+        data=product
+    )
+
+@router.put("/bulk-update", response_model=ProductBulkUpdateResponse)
+async def bulk_update_products(
+    bulk_update: ProductBulkUpdateRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    result = await ProductService.bulk_update_stock_and_price(db, bulk_update.items, current_user)
+    return ProductBulkUpdateResponse(
+        status="success",
+        message=f"Updated {result.updated} products",
+        data=result
     )
 
+
 @router.put("/{product_id}", response_model=ProductDetailsResponse)
 async def update_product(
     product_id: int,
@@ -71,7 +148,7 @@ async def update_product(
     return ProductDetailsResponse(
         status="success",
         message="Product successfully updated",
-        data=ProductResponse.model_validate(updated_product)
+        data=ProductService.to_response(updated_product)
     )
 
 @router.delete("/{product_id}")
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.schemas.user import UserCreate, UserLogin, UserResponse, Token, UserRead, UserUpdate
+from app.schemas.user import UserCreate, UserLogin, UserResponse, Token, UserRead, UserUpdate, RefreshTokenRequest
 from app.models.user import User
 from app.db.session import get_db
-from app.core.security import verify_password, create_access_token, hash_password
+from app.core.security import verify_password_async, create_access_token, hash_password_async, build_token_claims
 from sqlalchemy.future import select
-from app.api.deps import get_current_user
+from sqlalchemy.orm import undefer
+from app.api.deps import get_current_user, get_current_user_model, revoke_user_tokens
 from typing import Annotated
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from app.services.notification import NotificationService
-from app.schemas.user import PromoNotificationSchema
+from app.services.promo_campaign import PromoCampaignService
+from app.schemas.user import PromoNotificationSchema, PromoCampaignRead
+from app.services.user_cache import user_cache
+from app.services.refresh_token import RefreshTokenService
 
 
 
@@ -37,7 +40,7 @@ async def register_user(new_user: UserCreate, db: AsyncSession = Depends(get_db)
     if existing_user_phone:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Phone number already registered!")
 
-    hashed_password = hash_password(new_user.password) # hash password
+    hashed_password = await hash_password_async(new_user.password) # hash password off the event loop
 
     new_user_model = User(
         email=new_user.email,
@@ -61,10 +64,10 @@ async def register_user(new_user: UserCreate, db: AsyncSession = Depends(get_db)
 
 # authenticate user 
 async def authenticate_user(email: str, password: str, db: AsyncSession):
-    result = await db.execute(select(User).where(User.email == email))
+    result = await db.execute(select(User).options(undefer(User.hashed_password)).where(User.email == email))
     user = result.scalars().first()
 
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         return False
 
     return user 
@@ -77,8 +80,9 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
     if not user:
         raise  HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password combination!")
 
-    token = create_access_token(data={"sub": user.email})
-    return {"access_token": token, "token_type": "bearer"}
+    token = create_access_token(data=build_token_claims(user))
+    refresh_token = await RefreshTokenService.issue(db, user)
+    return {"access_token": token, "token_type": "bearer", "refresh_token": refresh_token}
 
 
 # User Login
@@ -88,13 +92,23 @@ async def login_user(user_in: UserLogin, db: AsyncSession = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password combination!")
 
-    token = create_access_token(data={"sub": user.email})
-    return {"access_token": token, "token_type": "bearer"}
+    token = create_access_token(data=build_token_claims(user))
+    refresh_token = await RefreshTokenService.issue(db, user)
+    return {"access_token": token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+# exchange a refresh token for a new access/refresh token pair
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(token_in: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    user, refresh_token = await RefreshTokenService.rotate(db, token_in.refresh_token)
+
+    token = create_access_token(data=build_token_claims(user))
+    return {"access_token": token, "token_type": "bearer", "refresh_token": refresh_token}
 
 
 # get current user details
 @router.get("/profile", response_model=UserResponse)
-async def get_user_profile(current_user: User = Depends(get_current_user)):
+async def get_user_profile(current_user: User = Depends(get_current_user_model)):
     current_user_data = UserRead.model_validate(current_user)
     # return current_user_data
 
@@ -110,18 +124,25 @@ async def get_user_profile(current_user: User = Depends(get_current_user)):
 
 # Update user profile
 @router.put("/profile-update", response_model=UserRead)
-async def update_user_profile(user_in: UserUpdate, db: AsyncSession = Depends(get_db),current_user: User = Depends(get_current_user)):
-    for key, value in user_in.model_dump(exclude_unset=True).items():
+async def update_user_profile(user_in: UserUpdate, db: AsyncSession = Depends(get_db),current_user: User = Depends(get_current_user_model)):
+    updates = user_in.model_dump(exclude_unset=True)
+    for key, value in updates.items():
         setattr(current_user, key, value)
     db.add(current_user)
-    await db.commit()
+
+    # role and account status live in issued tokens, so those changes revoke them
+    if "role" in updates or "is_active" in updates:
+        await revoke_user_tokens(db, current_user)
+    else:
+        await db.commit()
+        await user_cache.invalidate(current_user.email)
     return current_user
 
 
 
 
-# Send promotional notifications
-@router.post("/send-promo")
+# Queue a promotional email to all active users; the campaign worker sends it in the background
+@router.post("/send-promo", response_model=PromoCampaignRead, status_code=status.HTTP_202_ACCEPTED)
 async def send_promo_notification(promo: PromoNotificationSchema,db: AsyncSession = Depends(get_db),current_user: User = Depends(get_current_user)):
     """
     Admin can send promotional notifications to all users.
@@ -130,26 +151,23 @@ async def send_promo_notification(promo: PromoNotificationSchema,db: AsyncSessio
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Get all users
-    result = await db.execute(select(User))
-    users = result.scalars().all()
+    return await PromoCampaignService.create(db, promo.subject, promo.message, current_user)
 
-    if not users:
-        raise HTTPException(status_code=404, detail="No users found")
 
-    # Send notification to each user
-    for user in users:
-        NotificationService.send_notification(
-            user_email=user.email,
-            subject=promo.subject,
-            message=promo.message,
-            method="email"
-        )
+# Progress of a promo campaign
+@router.get("/promo-campaigns/{campaign_id}", response_model=PromoCampaignRead)
+async def get_promo_campaign(campaign_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
 
-    return {"status": "success", "message": "Promotional notifications sent"}
+    return await PromoCampaignService.get(db, campaign_id)
 
 
 
-# logout 
+# logout: revoke the refresh token and every token rotated from it
+@router.post("/logout")
+async def logout_user(token_in: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    await RefreshTokenService.revoke(db, token_in.refresh_token)
+    return {"status": "success", "message": "Logged out successfully"}
 
 
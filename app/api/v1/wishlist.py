@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.wishlist import Wishlist
-from app.schemas.wishlist import WishlistItemCreate, WishlistCreateResponse, WishlistItemResponse, WishlistResponse
+from app.schemas.wishlist import WishlistItemCreate, WishlistCreateResponse, WishlistItemResponse, WishlistResponse, WishlistMembershipRequest, WishlistMembershipResponse
 from app.db.session import get_db
 from app.models.user import User
 from app.api import deps
 from sqlalchemy.future import select
+from app.services.wishlist import WishlistService, wishlist_membership
 
 
 router = APIRouter(
@@ -14,35 +16,47 @@ router = APIRouter(
 )
 
 
-# wishlist create
+# wishlist create; adding a product that is already there returns the existing entry
 @router.post("/create", response_model=WishlistCreateResponse)
 async def create_wishlist(wishlist: WishlistItemCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
-    wishlist_item = Wishlist(**wishlist.model_dump(), user_id=current_user.id)
-
-    db.add(wishlist_item)
-    await db.commit()
-    await db.refresh(wishlist_item)
+    wishlist_item, added = await WishlistService.add(db, current_user.id, wishlist.product_id)
 
     response = {
         "status": "success",
-        "message": "Product added to wishlist successfully",
+        "message": "Product added to wishlist successfully" if added else "Product is already in the wishlist",
         "data": WishlistItemResponse.model_validate(wishlist_item)
     }   
 
     return response
 
 
-# view wishlist
+# view wishlist, newest first, with product name, price, image and stock status
 @router.get("/", response_model=WishlistResponse)
-async def get_wishlist(db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
-    result = await db.execute(select(Wishlist).where(Wishlist.user_id == current_user.id))
-    wishlist = result.scalars().all()
+async def get_wishlist(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    items, next_cursor = await WishlistService.list_items(db, current_user.id, limit, cursor)
 
     return {
         "status": "success",
         "message": "Wishlist retrieved successfully",
-        "count": len(wishlist),
-        "data": [WishlistItemResponse.model_validate(item) for item in wishlist]
+        "count": len(items),
+        "data": items,
+        "next_cursor": next_cursor
+    }
+
+
+
+# which of the given products are in the wishlist, e.g. for the hearts on a listing page
+@router.post("/membership", response_model=WishlistMembershipResponse)
+async def wishlist_membership_lookup(lookup: WishlistMembershipRequest, db: AsyncSession = Depends(get_db), current_user: User = Depends(deps.get_current_user)):
+    return {
+        "status": "success",
+        "message": "Wishlist membership retrieved successfully",
+        "data": await wishlist_membership.contains(db, current_user.id, list(dict.fromkeys(lookup.product_ids)))
     }
 
 
@@ -61,6 +75,7 @@ async def delete_wishlist(wishlist_id: int, db: AsyncSession = Depends(get_db),
     await db.delete(wishlist)
     await db.flush() 
     await db.commit()
+    await wishlist_membership.invalidate(current_user.id)
 
     return {
         "status": "success",
@@ -0,0 +1,132 @@
+"""
+Contention benchmark: many concurrent buyers checking out the same SKU.
+
+    python -m app.cli.bench_checkout --buyers 500 --stock 100
+
+Creates a throwaway seller, category, address and product, fires `--buyers`
+concurrent single-item orders through OrderService.create_order, prints
+throughput, latency percentiles and whether any stock was oversold, then
+deletes everything it created. Run it against Postgres: SQLite serializes
+writers on a file lock and measures that lock rather than the stock update.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import delete, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.address import Address
+from app.models.base import register_models
+from app.models.category import Category
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User, UserRole
+from app.schemas.order import OrderCreate
+from app.services.order import OrderService
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else None
+
+
+async def _setup(Session, stock: int):
+    tag = uuid.uuid4().hex[:8].upper()
+    async with Session() as db:
+        user = User(email=f"bench-{tag}@example.com", hashed_password="!", name="bench", role=UserRole.SELLER)
+        category = Category(name=f"bench-{tag}")
+        db.add_all([user, category])
+        await db.flush()
+        address = Address(user_id=user.id, street_address="1 Bench St", city="Bench", state="B", postal_code="0", country="B")
+        product = Product(
+            name="Bench product", description="Contention benchmark product", price=1.0,
+            stock_quantity=stock, category_id=category.id, sku=f"BENCH-{tag}", user_id=user.id
+        )
+        db.add_all([address, product])
+        await db.commit()
+        return user, category.id, address.id, product.id
+
+
+async def _teardown(Session, user, category_id, address_id, product_id):
+    async with Session() as db:
+        order_ids = select(Order.id).where(Order.user_id == user.id).scalar_subquery()
+        await db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+        await db.execute(delete(Order).where(Order.user_id == user.id))
+        await db.execute(delete(Product).where(Product.id == product_id))
+        await db.execute(delete(Address).where(Address.id == address_id))
+        await db.execute(delete(Category).where(Category.id == category_id))
+        await db.execute(delete(User).where(User.id == user.id))
+        await db.commit()
+
+
+async def _buyer(Session, order_in, user, latencies, outcomes):
+    started = time.perf_counter()
+    async with Session() as db:
+        try:
+            await OrderService.create_order(db, order_in, user)
+            outcomes["sold"] += 1
+        except HTTPException as e:
+            outcomes["sold_out" if e.status_code == 409 else "errors"] += 1
+        except Exception:
+            outcomes["errors"] += 1
+    latencies.append(time.perf_counter() - started)
+
+
+async def bench(database_url: str, buyers: int, stock: int, pool_size: int, keep: bool):
+    # SQLite engines use NullPool, which takes no sizing arguments
+    pool = {} if make_url(database_url).get_backend_name() == "sqlite" else {"pool_size": pool_size, "max_overflow": 0}
+    engine = create_async_engine(database_url, **pool)
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        user, category_id, address_id, product_id = await _setup(Session, stock)
+        order_in = OrderCreate(shipping_address_id=address_id, items=[{"product_id": product_id, "quantity": 1}])
+        latencies, outcomes = [], {"sold": 0, "sold_out": 0, "errors": 0}
+
+        started = time.perf_counter()
+        await asyncio.gather(*(_buyer(Session, order_in, user, latencies, outcomes) for _ in range(buyers)))
+        elapsed = time.perf_counter() - started
+
+        async with Session() as db:
+            remaining = (await db.get(Product, product_id)).stock_quantity
+
+        print(json.dumps({
+            "buyers": buyers,
+            "stock": stock,
+            **outcomes,
+            "remaining_stock": remaining,
+            "oversold": outcomes["sold"] > stock or remaining != stock - outcomes["sold"],
+            "elapsed_seconds": round(elapsed, 3),
+            "checkouts_per_second": round(buyers / elapsed, 1),
+            "latency_ms": {
+                f"p{pct}": round(_percentile(latencies, pct) * 1000, 1) for pct in (50, 95, 99)
+            },
+        }, indent=2))
+
+        if not keep:
+            await _teardown(Session, user, category_id, address_id, product_id)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent checkouts of a single SKU")
+    parser.add_argument("--buyers", type=int, default=500, help="Concurrent single-item checkouts")
+    parser.add_argument("--stock", type=int, default=100, help="Starting stock of the contended SKU")
+    parser.add_argument("--pool-size", type=int, default=20, help="Database connections shared by the buyers")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL, help="Defaults to DATABASE_URL")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark rows instead of deleting them")
+    args = parser.parse_args()
+
+    register_models()
+    asyncio.run(bench(args.database_url, args.buyers, args.stock, args.pool_size, args.keep))
+
+
+if __name__ == "__main__":
+    main()
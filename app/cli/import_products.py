@@ -0,0 +1,44 @@
+"""
+Bulk import products from a CSV or NDJSON file.
+
+    python -m app.cli.import_products products.csv --user-id 1
+"""
+import argparse
+import asyncio
+import json
+
+from app.db.session import engine, async_session
+from app.models.base import register_models
+from app.models.user import User
+from app.services.product_import import ProductImportService, IMPORT_FORMATS
+
+
+async def import_products(path: str, user_id: int, fmt: str = None):
+    try:
+        async with async_session() as db:
+            user = await db.get(User, user_id)
+            if not user:
+                raise SystemExit(f"User {user_id} not found")
+
+            with open(path, "rb") as stream:
+                report = await ProductImportService.import_stream(
+                    db, stream, fmt or ProductImportService.detect_format(path), user
+                )
+        print(json.dumps(report.model_dump(), indent=2))
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products from CSV or NDJSON")
+    parser.add_argument("path", help="File to import")
+    parser.add_argument("--user-id", type=int, required=True, help="Seller or admin who will own the products")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+    args = parser.parse_args()
+
+    register_models()
+    asyncio.run(import_products(args.path, args.user_id, args.format))
+
+
+if __name__ == "__main__":
+    main()
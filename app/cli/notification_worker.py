@@ -0,0 +1,56 @@
+"""
+Drain the notification outbox outside the web process.
+
+    python -m app.cli.notification_worker            # run until interrupted
+    python -m app.cli.notification_worker --once     # send what is due now, then exit
+
+Set NOTIFICATION_WORKER_INTERVAL_SECONDS=0 on the web app when running this instead.
+"""
+import argparse
+import asyncio
+
+from app.core.config import settings
+from app.db.session import engine, async_session
+from app.models.base import register_models
+from app.services.notification_outbox import notification_worker
+
+
+async def drain_once():
+    try:
+        total = 0
+        while True:
+            async with async_session() as db:
+                claimed = await notification_worker.drain(db)
+            total += claimed
+            if claimed < notification_worker.batch_size:
+                break
+        print(f"Processed {total} notifications")
+    finally:
+        await engine.dispose()
+
+
+async def run_forever(interval: float):
+    try:
+        await notification_worker.run(interval)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued notifications")
+    parser.add_argument("--once", action="store_true", help="Drain what is due now and exit")
+    parser.add_argument(
+        "--interval", type=float, default=settings.NOTIFICATION_WORKER_INTERVAL_SECONDS or 2.0,
+        help="Seconds between polls when idle"
+    )
+    args = parser.parse_args()
+
+    register_models()
+    try:
+        asyncio.run(drain_once() if args.once else run_forever(args.interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
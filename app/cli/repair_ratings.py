@@ -0,0 +1,38 @@
+"""
+Recompute the denormalized rating stats on products from the reviews table.
+
+    python -m app.cli.repair_ratings
+    python -m app.cli.repair_ratings --product-id 12 --product-id 40
+
+Backfills the columns on an existing database and repairs any drift. Each run
+is one GROUP BY over reviews and writes only the products whose stats differ.
+"""
+import argparse
+import asyncio
+import json
+
+from app.db.session import engine, async_session
+from app.models.base import register_models
+from app.services.review import ReviewService
+
+
+async def repair_ratings(product_ids=None):
+    try:
+        async with async_session() as db:
+            repaired = await ReviewService.recompute_ratings(db, product_ids)
+        print(json.dumps({"repaired": len(repaired), "product_ids": sorted(repaired)}, indent=2))
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute product rating stats from reviews")
+    parser.add_argument("--product-id", type=int, action="append", dest="product_ids", help="Limit to these products (repeatable)")
+    args = parser.parse_args()
+
+    register_models()
+    asyncio.run(repair_ratings(args.product_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,11 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     SECRET_KEY: str
     DATABASE_URL: str
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 2
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     ALGORITHM: str = "HS256"
+    # trust the id/role/version claims in access tokens instead of loading the user row
+    STATELESS_AUTH: bool = False
 
     SMTP_SERVER: str
     SMTP_PORT: int
@@ -14,8 +17,63 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str
 
     EMAIL_FROM: str
+    SMTP_USE_TLS: bool = True  # STARTTLS before login
 
     REDIS_URL: str
+    REDIS_RECONNECT_COOLDOWN_SECONDS: int = 30  # after a failed connect, Redis calls skip it this long
+
+    # user lookup cache used by deps.get_current_user
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_USE_REDIS: bool = False
+
+    # read-through product cache
+    PRODUCT_CACHE_TTL_SECONDS: int = 300
+    # cached first page of each product's reviews
+    REVIEW_CACHE_TTL_SECONDS: int = 300
+
+    # per-user Redis sets answering wishlist membership lookups
+    WISHLIST_CACHE_TTL_SECONDS: int = 300
+
+    # bulk product import
+    PRODUCT_IMPORT_BATCH_SIZE: int = 1000
+    PRODUCT_IMPORT_MAX_REPORTED_ERRORS: int = 1000
+
+    # flash-sale products: Redis-held stock written back to the database in batches
+    HOT_INVENTORY_RECONCILE_SECONDS: float = 1.0  # 0 disables the in-process reconciler
+    HOT_INVENTORY_RECONCILE_BATCH_SIZE: int = 5000
+    HOT_INVENTORY_HOLD_SECONDS: int = 60  # a reservation neither committed nor rolled back by then stops holding stock back from reseeded counters
+
+    # cart storage
+    CART_BACKEND: str = "db"  # "redis" keeps live carts in Redis and writes them behind to the cart table
+    CART_REDIS_TTL_SECONDS: int = 604800  # idle carts leave Redis after this and are reloaded from the table
+    CART_FLUSH_INTERVAL_SECONDS: float = 2.0  # 0 disables the in-process flusher
+    CART_FLUSH_BATCH_SIZE: int = 500
+
+    # notification outbox worker
+    NOTIFICATION_WORKER_INTERVAL_SECONDS: float = 2.0  # 0 disables the in-process worker
+    NOTIFICATION_BATCH_SIZE: int = 100
+    NOTIFICATION_MAX_ATTEMPTS: int = 8  # then the row is dead-lettered
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 30.0  # doubled after every failed attempt
+    NOTIFICATION_RETRY_MAX_SECONDS: float = 3600.0
+    NOTIFICATION_LEASE_SECONDS: int = 300  # a claimed row is retried if the worker dies mid-send
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: float = 300.0  # digestible notifications wait this long for company, 0 sends each one
+    NOTIFICATION_DIGEST_MAX_EVENTS: int = 20  # a window holding this many notifications is flushed at once
+
+    # promotional campaigns
+    PROMO_WORKER_INTERVAL_SECONDS: float = 5.0  # 0 disables the in-process campaign worker
+    PROMO_BATCH_SIZE: int = 500  # recipients per streamed chunk and per checkpoint
+    PROMO_SEND_CONCURRENCY: int = 4  # concurrent senders, each holding one pooled SMTP connection
+    PROMO_RATE_PER_SECOND: float = 20.0  # overall send rate, 0 for unlimited
+    PROMO_STALE_SECONDS: int = 300  # a running campaign without a checkpoint for this long is resumed
+
+    # Idempotency-Key handling for order endpoints
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # how long a stored response is replayed
+    IDEMPOTENCY_LOCK_SECONDS: int = 60  # in-flight marker lifetime, outlives any single request
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # how long a duplicate waits for the in-flight request
+
+    # bcrypt work runs in a bounded thread pool, off the event loop
+    PASSWORD_HASH_CONCURRENCY: int = 2
 
     class Config:
         env_file = ".env"
@@ -1,3 +1,7 @@
+import asyncio
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -15,13 +19,97 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHashPool:
+    """
+    Runs bcrypt calls in a dedicated thread pool so they never block the event loop.
+
+    At most `concurrency` hashes run at once; further callers wait on a semaphore,
+    which is what the queue-depth metrics count. bcrypt releases the GIL, so the
+    threads hash in parallel while the loop keeps serving other requests. Each
+    event loop gets its own semaphore (asyncio primitives are bound to one loop);
+    the shared executor still caps hashing threads across all of them.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="password-hash")
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.max_waiting = 0
+        self.total_wait_seconds = 0.0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def run(self, func, *args):
+        semaphore = self._semaphore()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        queued_at = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.total_wait_seconds += time.monotonic() - queued_at
+
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+password_hash_pool = PasswordHashPool(concurrency=settings.PASSWORD_HASH_CONCURRENCY)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hash_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+# default lifetime of an access token
+def access_token_lifetime() -> timedelta:
+    return timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+# claims carried by an access token; enough to authorize a request without loading the user
+def build_token_claims(user) -> dict:
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role.value if user.role else None,
+        "ver": user.token_version or 0,
+    }
+
+
 # create access token
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_enode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(days=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = datetime.now(timezone.utc) + access_token_lifetime()
     to_enode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_enode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
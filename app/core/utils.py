@@ -1,5 +1,6 @@
 import uuid
 import re
+from datetime import datetime, timezone
 
 
 def generate_uuid() -> str:
@@ -11,3 +12,5 @@ def is_valid_email(email: str) -> bool:
     return re.match(email_regex, email) is not None
 
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
@@ -7,17 +7,20 @@ from app.db.base_class import Base
 from app.models.user import User
 from app.models.wishlist import Wishlist
 from app.models.address import Address
-from app.models.product import Product
+from app.models.product import Product, ensure_product_search_index
 from app.models.category import Category
 from app.models.cart import Cart
 from app.models.order import Order
 from app.models.review import Review
+from app.models.refresh_token import RefreshToken
+from app.models.notification import NotificationOutbox, PromoCampaign
 
 async def init_db():
     try:
         async with engine.begin() as conn:
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(ensure_product_search_index)
             print("All tables created successfully")
     except Exception as e:
         print(f"An error occurred during database initialization: {e}")
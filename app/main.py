@@ -4,26 +4,41 @@ from app.api.v1 import user, product, category, cart, wishlist, order, address,
 from app.services.redis_service import redis_service
 from app.middleware.custom_middleware import add_cors_middleware
 from contextlib import asynccontextmanager
-import logging
-# Redis 
-
-# logger = logging.getLogger(__name__)
-
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     # Startup
-#     try:
-#         await redis_service.connect()
-#     except Exception as e:
-#         logger.error(f"Redis connection failed after retries: {str(e)}")
-#         logger.warning("Application running without Redis")
-
-#     yield
-
-#     # Shutdown
-#     await redis_service.close()
-
-app = FastAPI()
+from app.core.config import settings
+from app.services.hot_inventory import hot_inventory
+from app.services.notification_outbox import notification_worker
+from app.services.promo_campaign import promo_campaign_runner
+from app.services.cart import RedisCartStore, cart_store
+import asyncio
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: Redis connects lazily on first use; the reconciler writes
+    # flash-sale reservations back to products.stock_quantity and the
+    # notification worker drains the outbox; the promo runner sends queued
+    # campaigns and the cart flusher writes Redis carts back to the cart table
+    background = []
+    if settings.HOT_INVENTORY_RECONCILE_SECONDS > 0:
+        background.append(asyncio.create_task(hot_inventory.run(settings.HOT_INVENTORY_RECONCILE_SECONDS)))
+    if settings.NOTIFICATION_WORKER_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(notification_worker.run(settings.NOTIFICATION_WORKER_INTERVAL_SECONDS)))
+    if settings.PROMO_WORKER_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(promo_campaign_runner.run(settings.PROMO_WORKER_INTERVAL_SECONDS)))
+    if isinstance(cart_store, RedisCartStore) and settings.CART_FLUSH_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(cart_store.run(settings.CART_FLUSH_INTERVAL_SECONDS)))
+
+    yield
+
+    # Shutdown
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    if isinstance(cart_store, RedisCartStore):
+        await cart_store.flush_all()  # write back carts the flusher has not picked up yet
+    await redis_service.close()
+
+app = FastAPI(lifespan=lifespan)
 
 
 # connect all router here 
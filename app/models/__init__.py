@@ -7,6 +7,8 @@ from app.models.category import Category
 from app.models.review import Review
 from app.models.cart import Cart
 from app.models.wishlist import Wishlist
+from app.models.refresh_token import RefreshToken
+from app.models.notification import NotificationOutbox, OutboxStatus, PromoCampaign, CampaignStatus
 
 __all__ = [
     "BaseModel",
@@ -20,5 +22,10 @@ __all__ = [
     "OrderItem",
     "OrderStatus",
     "Category",
-    "Review"
+    "Review",
+    "RefreshToken",
+    "NotificationOutbox",
+    "OutboxStatus",
+    "PromoCampaign",
+    "CampaignStatus"
 ]
\ No newline at end of file
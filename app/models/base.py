@@ -9,3 +9,5 @@ def register_models():
     from app.models.cart import Cart
     from app.models.order import Order
     from app.models.review import Review
+    from app.models.refresh_token import RefreshToken
+    from app.models.notification import NotificationOutbox, PromoCampaign
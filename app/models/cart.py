@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 
 
 class Cart(Base):
     __tablename__ = 'cart'
+    __table_args__ = (
+        # one line per product; adding it again updates the quantity
+        UniqueConstraint("user_id", "product_id", name="uq_cart_user_product"),
+    )
 
     user_id = Column(Integer, ForeignKey("users.id"))
     product_id = Column(Integer, ForeignKey("products.id"))
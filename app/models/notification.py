@@ -0,0 +1,61 @@
+import enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, Index, ForeignKey
+from app.models.base import Base
+from app.core.utils import utcnow
+
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"  # gave up after NOTIFICATION_MAX_ATTEMPTS
+
+
+class NotificationOutbox(Base):
+    """Notification written in the same transaction as the change it reports, sent later by the worker."""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # the worker polls for due pending rows
+        Index("ix_notification_outbox_status_available_at", "status", "available_at"),
+        # enqueue_digest looks for the recipient's open digest window
+        Index("ix_notification_outbox_recipient_digest_key", "recipient", "digest_key"),
+    )
+
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    method = Column(String(20), nullable=False, default="email")
+    # rows with the same recipient and digest key that come due together are sent as one message
+    digest_key = Column(String(100))
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    # next time the worker may pick the row up: retry backoff and in-flight leases move it forward
+    available_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    last_error = Column(Text)
+    sent_at = Column(DateTime(timezone=True))
+
+
+class CampaignStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class PromoCampaign(Base):
+    """Promotional email sent to every active user by the campaign worker, resumable from `last_user_id`."""
+    __tablename__ = "promo_campaigns"
+
+    subject = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    status = Column(Enum(CampaignStatus), nullable=False, default=CampaignStatus.QUEUED, index=True)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    total_recipients = Column(Integer)
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    # checkpoint: recipients are streamed in user id order and every id up to here has been handled
+    last_user_id = Column(Integer, nullable=False, default=0)
+    # refreshed at every checkpoint; a RUNNING campaign with a stale heartbeat is resumed by another worker
+    heartbeat_at = Column(DateTime(timezone=True))
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
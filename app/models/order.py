@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, Float, ForeignKey, Enum, Boolean, Index, text, true
 from sqlalchemy.orm import relationship
 import enum
 from app.models.base import Base
 from sqlalchemy.sql import func
 from sqlalchemy import DateTime
+from app.core.utils import utcnow
 
 class OrderStatus(str, enum.Enum):
     PENDING = "pending"
@@ -14,12 +15,20 @@ class OrderStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __mapper_args__ = {"eager_defaults": True}  # fetch server-generated timestamps during the INSERT
+    __table_args__ = (
+        # keyset pagination of a user's order history, newest first
+        Index("ix_orders_user_created_at_id", "user_id", "created_at", "id"),
+    )
     
     user_id = Column(Integer, ForeignKey("users.id"))
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
+    # bumped by every status transition; transitions only apply to the version they read
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     total_amount = Column(Float)
     shipping_address_id = Column(Integer, ForeignKey("addresses.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # set from Python so stored values round-trip exactly through pagination cursors
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
     # Relationships
@@ -30,11 +39,23 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+        # the hot-inventory reconciler only ever scans items whose stock is still pending
+        Index(
+            "ix_order_items_stock_pending", "product_id",
+            postgresql_where=text("NOT stock_committed"),
+            sqlite_where=text("stock_committed = 0"),
+        ),
+    )
     
     order_id = Column(Integer, ForeignKey("orders.id"))
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer)
     price = Column(Float)  # Price at the time of purchase
+    # False while a hot-inventory reservation has not yet been deducted from products.stock_quantity
+    stock_committed = Column(Boolean, default=True, server_default=true(), nullable=False)
 
     # Relationships
     order = relationship("Order", back_populates="order_items")
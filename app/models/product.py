@@ -1,9 +1,18 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text, Boolean, TIMESTAMP, func
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text, Boolean, TIMESTAMP, Index, DDL, event, func, false
 from sqlalchemy.orm import relationship
 from app.models.base import Base
+from app.core.utils import utcnow
 
 class Product(Base):
     __tablename__ = 'products' 
+    __table_args__ = (
+        # keyset pagination for GET /products: every sort ends with id as a tie-breaker
+        Index("ix_products_updated_at_id", "updated_at", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_category_updated_at_id", "category_id", "updated_at", "id"),
+        Index("ix_products_category_price_id", "category_id", "price", "id"),
+        Index("ix_products_user_updated_at_id", "user_id", "updated_at", "id"),
+    )
 
     name = Column(String(255), index=True)
     description = Column(Text)
@@ -13,8 +22,19 @@ class Product(Base):
     sku = Column(String(50), unique=True)
     image_url = Column(String(255))
     is_active = Column(Boolean, default=True)
+    # flash-sale mode: checkouts reserve from a Redis counter, see app/services/hot_inventory.py
+    hot_inventory = Column(Boolean, default=False, server_default=false(), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
-    updated_at = Column(TIMESTAMP(timezone=True), default=func.now(), onupdate=func.now())
+    # review stats, kept in step with the reviews table by ReviewService (repair: app/cli/repair_ratings.py)
+    rating_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_sum = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_1 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_2 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_3 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_4 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_5 = Column(Integer, default=0, server_default="0", nullable=False)
+    # set from Python so stored values round-trip exactly through pagination cursors
+    updated_at = Column(TIMESTAMP(timezone=True), default=utcnow, onupdate=utcnow)
 
 
     # Relationships
@@ -23,3 +43,49 @@ class Product(Base):
     order_items = relationship("OrderItem", back_populates="product")
     cart = relationship("Cart", back_populates="product")
     wishlist = relationship("Wishlist", back_populates="product")
+
+    @property
+    def rating(self) -> dict:
+        return {
+            "count": self.rating_count or 0,
+            "sum": self.rating_sum or 0,
+            "histogram": {stars: getattr(self, f"rating_{stars}") or 0 for stars in range(1, 6)},
+        }
+
+
+# Full-text search over name and description. Postgres uses a GIN expression index,
+# which the database keeps current on its own; SQLite (tests) uses an external-content
+# FTS5 table kept in sync by triggers.
+PRODUCT_SEARCH_DOCUMENT = "to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+PRODUCT_SEARCH_DDL = {
+    "postgresql": [
+        f"CREATE INDEX IF NOT EXISTS ix_products_search ON products USING GIN ({PRODUCT_SEARCH_DOCUMENT})",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+        "name, description, content='products', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, name, description) "
+        "VALUES ('delete', old.id, old.name, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, name, description) "
+        "VALUES ('delete', old.id, old.name, old.description); "
+        "INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    ],
+}
+
+for _dialect, _statements in PRODUCT_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Product.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+
+
+def ensure_product_search_index(connection):
+    """Create the search index on a database whose products table already exists, and fill it."""
+    dialect = connection.dialect.name
+    for statement in PRODUCT_SEARCH_DDL.get(dialect, []):
+        connection.exec_driver_sql(statement)
+    if dialect == "sqlite":
+        connection.exec_driver_sql("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
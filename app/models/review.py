@@ -1,15 +1,23 @@
-from sqlalchemy import Column, Integer, Text, ForeignKey
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.models.base import Base
+from app.core.utils import utcnow
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # keyset pagination for GET /reviews/products/{id}: every sort ends with id as a tie-breaker
+        Index("ix_reviews_product_created_at_id", "product_id", "created_at", "id"),
+        Index("ix_reviews_product_rating_id", "product_id", "rating", "id"),
+    )
     
     user_id = Column(Integer, ForeignKey("users.id"))
     product_id = Column(Integer, ForeignKey("products.id"))
     rating = Column(Integer) 
     comment = Column(Text)
+    # set from Python so stored values round-trip exactly through pagination cursors
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="reviews")
-    product = relationship("Product", back_populates="reviews")
\ No newline at end of file
+    product = relationship("Product", back_populates="reviews")
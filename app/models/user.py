@@ -1,5 +1,5 @@
 from sqlalchemy import Column, String, Boolean, ForeignKey, Enum, Integer
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 import enum
 from app.models.base import Base
 
@@ -12,15 +12,19 @@ class User(Base):
     __tablename__ = "users"
     
     email = Column(String(255), unique=True, index=True, nullable=False)
-    hashed_password = Column(String(255), nullable=False)
+    # never loaded implicitly: cached users (app/services/user_cache.py) don't carry it, so
+    # every user looks the same; password checks select it with undefer(User.hashed_password)
+    hashed_password = deferred(Column(String(255), nullable=False), raiseload=True)
     name = Column(String(255))
     phone_number = Column(String(20))
     is_active = Column(Boolean, default=True)
     role = Column(Enum(UserRole), default=UserRole.USER)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)  # bumped to revoke issued tokens
 
     # Relationships
     addresses = relationship("Address", back_populates="user")
     orders = relationship("Order", back_populates="user")
     reviews = relationship("Review", back_populates="user")
     cart = relationship("Cart", back_populates="user")
-    wishlist = relationship("Wishlist", back_populates="user")
\ No newline at end of file
+    wishlist = relationship("Wishlist", back_populates="user")
+    refresh_tokens = relationship("RefreshToken", back_populates="user")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 from sqlalchemy.sql import func
@@ -7,6 +7,12 @@ from sqlalchemy import DateTime
 
 class Wishlist(Base):
     __tablename__ = "wishlist"
+    __table_args__ = (
+        # a product is in a user's wishlist at most once; adding it again is a no-op
+        UniqueConstraint("user_id", "product_id", name="uq_wishlist_user_product"),
+        # keyset pagination of a user's wishlist, newest first
+        Index("ix_wishlist_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
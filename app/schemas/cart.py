@@ -1,9 +1,10 @@
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
 
 
 class CartBase(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(..., gt=0)
 
 
 # Schema for cart creation
@@ -16,9 +17,23 @@ class CartUpdate(BaseModel):
     quantity: int
 
 
-# Schema for cart response
+# Schema for setting a product's quantity; 0 removes it
+class CartItemQuantity(BaseModel):
+    product_id: int
+    quantity: int = Field(..., ge=0)
+
+
+# Schemas for batch add / update
+class CartBatchCreate(BaseModel):
+    items: List[CartCreate] = Field(..., min_length=1, max_length=100)
+
+
+class CartBatchUpdate(BaseModel):
+    items: List[CartItemQuantity] = Field(..., min_length=1, max_length=100)
+
+
+# Schema for cart response: one line per product
 class CartResponse(CartBase):
-    id: int
     user_id: int
 
     class Config:
@@ -35,8 +50,18 @@ class CardCreateResponse(BaseModel):
 
 
 
+# priced cart line
+class CartLine(BaseModel):
+    product_id: int
+    product_name: str
+    price: float
+    quantity: int
+    subtotal: float
+
+
 class CartListResponse(BaseModel):
     status: str
     message: str
     count: int
-    data: list[CartResponse]
\ No newline at end of file
+    data: list[CartLine]
+    total: float
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
@@ -14,7 +14,7 @@ class OrderStatus(str, Enum):
 
 class OrderItemBase(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(..., gt=0)
 
 class OrderItemCreate(OrderItemBase):
     pass
@@ -32,7 +32,11 @@ class OrderItemResponse(BaseModel):
 
 class OrderCreate(BaseModel):
     shipping_address_id: int
-    items: List[OrderItemCreate]
+    items: List[OrderItemCreate] = Field(..., min_length=1)
+
+
+class CheckoutRequest(BaseModel):
+    shipping_address_id: int
 
 
 class OrderFullResponse(BaseModel):
@@ -41,6 +45,7 @@ class OrderFullResponse(BaseModel):
     shipping_address: AddressResponse
     total_amount: float
     status: OrderStatus
+    version: int
     order_items: List[OrderItemResponse]
     created_at: datetime
     updated_at: Optional[datetime]
@@ -59,13 +64,31 @@ class OrderResponse(BaseModel):
         from_attributes = True
 
 
-class OrderList(BaseModel):
+class OrderItemSummary(BaseModel):
+    """Compact line item for order history: no product description or category."""
+    product_id: int
+    product_name: Optional[str] = None
+    quantity: int
+    price: float
+
+
+class OrderSummary(BaseModel):
+    id: int
+    status: OrderStatus
+    total_amount: float
+    item_count: int  # number of line items
+    created_at: datetime
+    items: Optional[List[OrderItemSummary]] = None  # only with include_items=true
+
+
+class OrderSummaryList(BaseModel):
     status: str
     message: str
     count: int
-    data: List[OrderFullResponse]
-
+    data: List[OrderSummary]
+    next_cursor: Optional[str] = None
 
 
 class OrderUpdateSchema(BaseModel):
-    status: str
+    status: OrderStatus
+    version: Optional[int] = None  # if set, the update only applies to this version of the order
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, HttpUrl, Field, field_validator, field_serializer
-from typing import Optional, List
+from pydantic import BaseModel, HttpUrl, Field, computed_field, field_validator, field_serializer, model_validator
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -12,6 +12,7 @@ class ProductBase(BaseModel):
     sku: str = Field(..., min_length=8, max_length=20, pattern=r"^[A-Z0-9-]+$")
     image_url: Optional[HttpUrl] = None
     is_active: bool = True
+    hot_inventory: bool = False  # flash-sale mode: stock is reserved in Redis
 
     @field_serializer('image_url')
     def serialize_image_url(self, image_url: Optional[HttpUrl], _info):
@@ -23,6 +24,9 @@ class CategoryResponse(BaseModel):
     name: str
     created_at: Optional[datetime] = None 
 
+    class Config:
+        from_attributes = True
+
 
 class ProductCreate(ProductBase):
     @field_validator('sku')
@@ -45,17 +49,33 @@ class ProductUpdate(BaseModel):
     stock_quantity: Optional[int] = Field(None, ge=0)
     image_url: Optional[HttpUrl] = None
     is_active: Optional[bool] = None
+    hot_inventory: Optional[bool] = None
 
     @field_serializer('image_url')
     def serialize_image_url(self, image_url: Optional[HttpUrl], _info):
         return str(image_url) if image_url else None
 
 
+class ProductRating(BaseModel):
+    count: int = 0
+    sum: int = 0
+    histogram: Dict[int, int] = Field(default_factory=lambda: dict.fromkeys(range(1, 6), 0))  # stars -> reviews
+
+    @computed_field
+    @property
+    def average(self) -> Optional[float]:
+        return round(self.sum / self.count, 2) if self.count else None
+
+
 class ProductResponse(ProductBase):
     id: int
     user_id: int
     updated_at: datetime
-    category: Optional[CategoryResponse]  # Add category serialization
+    category: Optional[CategoryResponse] = None  # Add category serialization
+    rating: ProductRating = Field(default_factory=ProductRating)
+
+    class Config:
+        from_attributes = True
 
     @field_serializer('updated_at')
     def serialize_updated_at(self, dt: datetime, _info):
@@ -67,6 +87,7 @@ class ProductListResponse(BaseModel):
     message: str
     count: int
     data: List[ProductResponse]
+    next_cursor: Optional[str] = None
 
 
 class ProductCreateResponse(BaseModel):
@@ -79,3 +100,56 @@ class ProductDetailsResponse(BaseModel):
     status: str
     message: str
     data: ProductResponse
+
+
+class ProductImportError(BaseModel):
+    row: int
+    sku: Optional[str] = None
+    errors: List[str]
+
+
+class ProductImportReport(BaseModel):
+    total_rows: int
+    inserted: int
+    failed: int
+    errors: List[ProductImportError]
+    errors_truncated: bool = False
+
+
+class ProductImportResponse(BaseModel):
+    status: str
+    message: str
+    data: ProductImportReport
+
+
+class ProductBulkUpdateItem(BaseModel):
+    id: Optional[int] = Field(None, gt=0)
+    sku: Optional[str] = Field(None, min_length=8, max_length=20)
+    stock_quantity: Optional[int] = Field(None, ge=0)
+    price: Optional[float] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def validate_item(self):
+        if (self.id is None) == (self.sku is None):
+            raise ValueError("Provide exactly one of id or sku")
+        if self.stock_quantity is None and self.price is None:
+            raise ValueError("Provide stock_quantity, price or both")
+        if self.sku is not None:
+            self.sku = self.sku.upper().strip()
+        return self
+
+
+class ProductBulkUpdateRequest(BaseModel):
+    items: List[ProductBulkUpdateItem] = Field(..., min_length=1, max_length=10000)
+
+
+class ProductBulkUpdateResult(BaseModel):
+    updated: int
+    unknown_ids: List[int]
+    unknown_skus: List[str]
+
+
+class ProductBulkUpdateResponse(BaseModel):
+    status: str
+    message: str
+    data: ProductBulkUpdateResult
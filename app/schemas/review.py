@@ -56,6 +56,7 @@ class ReviewListResponse(BaseModel):
     message: str
     count: int
     data: list[ReviewResponse] 
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True 
\ No newline at end of file
@@ -115,10 +115,24 @@ class UserRead(UserBase):
         from_attributes = True
 
 
+# Principal built from access token claims when stateless auth is enabled
+class TokenPrincipal(BaseModel):
+    id: int
+    email: EmailStr
+    role: UserRole
+    token_version: int = 0
+
+
 # schema for token
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+# schema for exchanging a refresh token
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 
 # Schema for response
@@ -131,4 +145,20 @@ class UserResponse(BaseModel):
 
 class PromoNotificationSchema(BaseModel):
     subject: str
-    message: str
\ No newline at end of file
+    message: str
+
+class PromoCampaignRead(BaseModel):
+    id: int
+    subject: str
+    status: str
+    total_recipients: Optional[int] = None
+    sent_count: int
+    failed_count: int
+    last_user_id: int
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 from .product import ProductResponse
 
@@ -22,14 +22,36 @@ class WishlistItemResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class WishlistProduct(BaseModel):
+    """Wishlist entry with the product fields a listing needs."""
+    id: int
+    product_id: int
+    name: str
+    price: float
+    image_url: Optional[str] = None
+    in_stock: bool
+    added_at: Optional[datetime] = None
+
+
 class WishlistResponse(BaseModel):
     status: str
     message: str
     count: int
-    data: List[WishlistItemResponse]
+    data: List[WishlistProduct]
+    next_cursor: Optional[str] = None
 
 
 class WishlistCreateResponse(BaseModel):
     status: str
     message: str
     data: WishlistItemResponse
+
+
+class WishlistMembershipRequest(BaseModel):
+    product_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+
+class WishlistMembershipResponse(BaseModel):
+    status: str
+    message: str
+    data: Dict[int, bool]  # product id -> in the wishlist
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.models.cart import Cart
+from app.models.product import Product
+from app.schemas.cart import CartLine
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseCartStore:
+    """Carts kept only in the `cart` table; every change is a commit."""
+
+    async def items(self, db: AsyncSession, user_id: int) -> Dict[int, int]:
+        """The user's cart as {product_id: quantity}."""
+        result = await db.execute(select(Cart.product_id, Cart.quantity).where(Cart.user_id == user_id))
+        return {product_id: quantity for product_id, quantity in result.all()}
+
+    @staticmethod
+    def _upsert(dialect: str, user_id: int, quantities: Dict[int, int], replace: bool):
+        """INSERT .. ON CONFLICT (user_id, product_id) that adds to or replaces the quantity."""
+        insert_ = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert_(Cart).values([
+            {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in quantities.items()
+        ])
+        quantity = statement.excluded.quantity if replace else Cart.quantity + statement.excluded.quantity
+        return statement.on_conflict_do_update(
+            index_elements=[Cart.user_id, Cart.product_id],
+            set_={"quantity": quantity, "updated_at": func.now()}
+        ).returning(Cart.product_id, Cart.quantity)
+
+    @staticmethod
+    async def _check_products(db: AsyncSession, product_ids: Iterable[int]):
+        """Raise 404 naming every id in `product_ids` that is not a product."""
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        result = await db.execute(select(Product.id).where(Product.id.in_(product_ids)))
+        missing = sorted(product_ids - set(result.scalars().all()))
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product {', '.join(map(str, missing))} not found"
+            )
+
+    async def _write(self, db: AsyncSession, user_id: int, quantities: Dict[int, int], replace: bool) -> Dict[int, int]:
+        removed = [product_id for product_id, quantity in quantities.items() if quantity <= 0]
+        kept = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+        await self._check_products(db, kept)
+        written = dict.fromkeys(removed, 0)
+        if removed:
+            await db.execute(delete(Cart).where(Cart.user_id == user_id, Cart.product_id.in_(removed)))
+        if kept:
+            result = await db.execute(self._upsert(db.get_bind().dialect.name, user_id, kept, replace))
+            written.update(result.all())
+        await db.commit()
+        return written
+
+    async def add_many(self, db: AsyncSession, user_id: int, quantities: Dict[int, int]) -> Dict[int, int]:
+        """Add quantities ({product_id: quantity}); returns the new quantity of each product."""
+        return await self._write(db, user_id, quantities, replace=False)
+
+    async def set_many(self, db: AsyncSession, user_id: int, quantities: Dict[int, int]) -> Dict[int, int]:
+        """Replace quantities, removing products set to 0; returns the new quantity of each product."""
+        return await self._write(db, user_id, quantities, replace=True)
+
+    async def add(self, db: AsyncSession, user_id: int, product_id: int, quantity: int) -> int:
+        """Add `quantity` of a product; returns the new quantity in the cart."""
+        return (await self.add_many(db, user_id, {product_id: quantity}))[product_id]
+
+    async def remove(self, db: AsyncSession, user_id: int, product_id: int) -> bool:
+        result = await db.execute(delete(Cart).where(Cart.user_id == user_id, Cart.product_id == product_id))
+        await db.commit()
+        return result.rowcount > 0
+
+    async def clear(self, db: AsyncSession, user_id: int):
+        await db.execute(delete(Cart).where(Cart.user_id == user_id))
+        await db.commit()
+
+    @staticmethod
+    async def _priced(db: AsyncSession, query) -> Tuple[List[CartLine], float]:
+        result = await db.execute(query)
+        lines, total = [], 0.0
+        for row in result:
+            lines.append(CartLine(
+                product_id=row.product_id, product_name=row.name, price=row.price,
+                quantity=row.quantity, subtotal=row.subtotal
+            ))
+            total = row.total
+        return lines, total
+
+    async def summary(self, db: AsyncSession, user_id: int) -> Tuple[List[CartLine], float]:
+        """
+        The cart priced in one joined query: each line's price and subtotal, and the grand total
+        as a window sum. Products that no longer exist drop out.
+        """
+        subtotal = Product.price * Cart.quantity
+        return await self._priced(db,
+            select(
+                Cart.product_id, Product.name, Product.price, Cart.quantity,
+                subtotal.label("subtotal"), func.sum(subtotal).over().label("total")
+            )
+            .join(Product, Product.id == Cart.product_id)
+            .where(Cart.user_id == user_id)
+            .order_by(Cart.id)
+        )
+
+
+class RedisCartStore(DatabaseCartStore):
+    """
+    Live carts in a Redis hash per user, `cart:{user_id}` mapping product id to
+    quantity, written behind to the `cart` table.
+
+    Every write marks the user in the `cart:dirty` set; the flusher pops dirty
+    users in batches and replaces their rows with a snapshot of the hash. A
+    cart that is not in Redis (never loaded, idle past the TTL, or Redis was
+    flushed) is loaded from the table on first use. The "_" field marks a loaded
+    cart, so an empty cart is still a hit. Writes since the last flush are lost
+    if Redis loses its data; carts are cheap to rebuild, orders never depend on it.
+    """
+
+    DIRTY_KEY = "cart:dirty"
+    LOADED_FIELD = "_"
+
+    def __init__(self, ttl: int, batch_size: int):
+        self.ttl = ttl
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    @staticmethod
+    def _unavailable() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cart service unavailable, please retry"
+        )
+
+    async def _load(self, db: AsyncSession, user_id: int):
+        items = await super().items(db, user_id)
+        values = {str(product_id): quantity for product_id, quantity in items.items()}
+        values[self.LOADED_FIELD] = 1
+        if not await redis_service.hash_load(self._key(user_id), values, self.ttl):
+            raise self._unavailable()
+
+    async def _hash_write(self, db: AsyncSession, user_id: int, mode: str, amounts: Dict[int, int]) -> list:
+        amounts = {str(product_id): amount for product_id, amount in amounts.items()}
+        for _ in range(2):
+            reply = await redis_service.hash_write(
+                self._key(user_id), self.DIRTY_KEY, str(user_id), mode, amounts, self.ttl
+            )
+            if reply is None:
+                break
+            if reply is not False:
+                return reply
+            await self._load(db, user_id)
+        raise self._unavailable()
+
+    async def items(self, db: AsyncSession, user_id: int) -> Dict[int, int]:
+        for _ in range(2):
+            reply = await redis_service.hash_get_many([self._key(user_id)], expire=self.ttl)
+            if reply is None:
+                break
+            if reply[0]:
+                return {
+                    int(field): int(value) for field, value in reply[0].items() if field != self.LOADED_FIELD
+                }
+            await self._load(db, user_id)
+        raise self._unavailable()
+
+    async def add_many(self, db: AsyncSession, user_id: int, quantities: Dict[int, int]) -> Dict[int, int]:
+        await self._check_products(db, [product_id for product_id, quantity in quantities.items() if quantity > 0])
+        return dict(zip(quantities, await self._hash_write(db, user_id, "incr", quantities)))
+
+    async def set_many(self, db: AsyncSession, user_id: int, quantities: Dict[int, int]) -> Dict[int, int]:
+        await self._check_products(db, [product_id for product_id, quantity in quantities.items() if quantity > 0])
+        return dict(zip(quantities, await self._hash_write(db, user_id, "set", quantities)))
+
+    async def subtract(self, db: AsyncSession, user_id: int, quantities: Dict[int, int], attempts: int = 3):
+        """
+        Take ordered quantities out of the cart, keeping whatever was added meanwhile; lines that
+        reach 0 are removed. Called after the order is committed, so Redis errors are retried.
+        """
+        for attempt in range(attempts):
+            try:
+                return await self.add_many(db, user_id, {product_id: -quantity for product_id, quantity in quantities.items()})
+            except HTTPException:
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def remove(self, db: AsyncSession, user_id: int, product_id: int) -> bool:
+        if product_id not in await self.items(db, user_id):
+            return False
+        await self._hash_write(db, user_id, "del", {product_id: 0})
+        return True
+
+    async def clear(self, db: AsyncSession, user_id: int):
+        await self._hash_write(db, user_id, "clear", {})
+
+    async def summary(self, db: AsyncSession, user_id: int) -> Tuple[List[CartLine], float]:
+        """Price the Redis quantities in one query, passing them in as a CASE on product id."""
+        items = await self.items(db, user_id)
+        if not items:
+            return [], 0.0
+        quantity = case(items, value=Product.id)
+        return await self._priced(db,
+            select(
+                Product.id.label("product_id"), Product.name, Product.price, quantity.label("quantity"),
+                (Product.price * quantity).label("subtotal"), func.sum(Product.price * quantity).over().label("total")
+            )
+            .where(Product.id.in_(items))
+            .order_by(Product.id)
+        )
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write one batch of dirty carts to the table; returns how many dirty carts were taken."""
+        user_ids = await redis_service.set_pop(self.DIRTY_KEY, self.batch_size)
+        if not user_ids:
+            return 0
+        snapshots = await redis_service.hash_get_many([self._key(user_id) for user_id in user_ids])
+        if snapshots is None:
+            await redis_service.set_add(self.DIRTY_KEY, *user_ids)
+            return 0
+
+        # a cart that vanished from Redis before its flush keeps its last flushed rows
+        flushed = [int(user_id) for user_id, snapshot in zip(user_ids, snapshots) if snapshot]
+        rows = [
+            {"user_id": int(user_id), "product_id": int(field), "quantity": int(value)}
+            for user_id, snapshot in zip(user_ids, snapshots)
+            for field, value in snapshot.items() if field != self.LOADED_FIELD
+        ]
+        if rows:
+            # a product deleted since it was carted would fail the whole batch on its foreign key
+            result = await db.execute(select(Product.id).where(Product.id.in_({row["product_id"] for row in rows})))
+            known = set(result.scalars().all())
+            dropped = [row for row in rows if row["product_id"] not in known]
+            if dropped:
+                logger.warning(f"Dropping cart lines for missing products from the flush: {dropped}")
+                rows = [row for row in rows if row["product_id"] in known]
+        try:
+            await db.execute(delete(Cart).where(Cart.user_id.in_(flushed)))
+            if rows:
+                await db.execute(insert(Cart), rows)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # retry these carts on the next pass
+            await redis_service.set_add(self.DIRTY_KEY, *user_ids)
+            raise
+        return len(user_ids)
+
+    async def flush_all(self):
+        """Flush until no dirty carts are left, e.g. on shutdown."""
+        try:
+            async with async_session() as db:
+                while await self.flush(db):
+                    pass
+        except Exception as e:
+            logger.error(f"Cart flush failed: {str(e)}", exc_info=True)
+
+    async def run(self, interval: float):
+        """Flush forever; started from the application lifespan."""
+        while True:
+            try:
+                async with async_session() as db:
+                    flushed = await self.flush(db)
+                if flushed == self.batch_size:
+                    continue  # more carts may be waiting
+            except Exception as e:
+                logger.error(f"Cart flush failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(interval)
+
+
+if settings.CART_BACKEND == "redis":
+    cart_store = RedisCartStore(ttl=settings.CART_REDIS_TTL_SECONDS, batch_size=settings.CART_FLUSH_BATCH_SIZE)
+else:
+    cart_store = DatabaseCartStore()
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.utils import generate_uuid
+from app.db.session import async_session
+from app.models.order import OrderItem
+from app.models.product import Product
+from app.services.inventory import InventoryService
+from app.services.product_cache import product_cache
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class HotReservation:
+    """The flash-sale stock one checkout took from Redis, settled or released once its transaction ends."""
+
+    def __init__(self):
+        self.token = generate_uuid()
+        self.quantities: Dict[int, int] = {}
+
+
+class HotInventory:
+    """
+    Flash-sale stock for products flagged `hot_inventory`.
+
+    Checkouts reserve from a Redis counter `inv:{product_id}` with one Lua call
+    instead of locking the product row, and record their order items with
+    `stock_committed = False`. The reconciler later claims those items in batches
+    and deducts them from `products.stock_quantity` in the same transaction, so
+    the database always knows the true availability:
+
+        stock_quantity - sum(quantity of items not yet committed)
+
+    Counters are seeded from that value with SET NX whenever they are missing,
+    which is how a restarted or flushed Redis recovers. The same Lua call that
+    takes a reservation also records it in `inv:{product_id}:held` until its
+    transaction commits or rolls back, and seeding subtracts what is held there:
+    those order items aren't visible to the database yet. A reservation whose
+    transaction commits while a counter is being seeded may be counted twice,
+    which undersells until the next reseed rather than overselling. Redis losing
+    its data outright also loses the held entries, so run it with persistence.
+    """
+
+    def __init__(self, batch_size: int, hold: int):
+        self.batch_size = batch_size
+        self.hold = hold
+
+    @staticmethod
+    def _key(product_id: int) -> str:
+        return f"inv:{product_id}"
+
+    @staticmethod
+    def _held_key(product_id: int) -> str:
+        return f"inv:{product_id}:held"
+
+    @staticmethod
+    async def _database_available(db: AsyncSession, product_ids: List[int]) -> Dict[int, int]:
+        pending = (
+            select(OrderItem.product_id, func.sum(OrderItem.quantity).label("quantity"))
+            .where(OrderItem.stock_committed.is_(False), OrderItem.product_id.in_(product_ids))
+            .group_by(OrderItem.product_id)
+            .subquery()
+        )
+        result = await db.execute(
+            select(Product.id, Product.stock_quantity - func.coalesce(pending.c.quantity, 0))
+            .outerjoin(pending, pending.c.product_id == Product.id)
+            .where(Product.id.in_(product_ids))
+        )
+        return dict(result.tuples().all())
+
+    async def seed(self, db: AsyncSession, product_ids: Iterable[int]):
+        """Create missing counters from the database's view of available stock, less in-flight reservations."""
+        product_ids = list(product_ids)
+        # read what is held before the database: a reservation settled in between
+        # is then subtracted twice rather than not at all
+        held = await redis_service.held_sums([self._held_key(product_id) for product_id in product_ids], self.hold)
+        if held is None:
+            return
+        held = dict(zip(product_ids, held))
+        available = await self._database_available(db, product_ids)
+        await redis_service.set_many_nx(
+            {self._key(product_id): quantity - held[product_id] for product_id, quantity in available.items()}
+        )
+
+    async def available(self, db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, int]:
+        """Units left per product: the Redis counter, or the database's view where there is none."""
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        counters = await redis_service.get_counters([self._key(product_id) for product_id in product_ids])
+        available = {
+            product_id: counter for product_id, counter in zip(product_ids, counters or []) if counter is not None
+        }
+        missing = [product_id for product_id in product_ids if product_id not in available]
+        if missing:
+            available.update(await self._database_available(db, missing))
+        return available
+
+    async def reserve(self, db: AsyncSession, reservation: HotReservation, quantities: Dict[int, int]) -> Dict[int, int]:
+        """
+        Take `quantities` ({product_id: quantity}) from the Redis counters, all or nothing,
+        and add them to `reservation`.
+
+        Returns the remaining count per product. Raises 409 when an item is short and
+        503 when Redis is unavailable, since the database alone can't tell what is left.
+        """
+        amounts = {self._key(product_id): quantity for product_id, quantity in quantities.items()}
+        held = {self._key(product_id): self._held_key(product_id) for product_id in quantities}
+        for _ in range(2):
+            reply = await redis_service.reserve_counters(amounts, held, reservation.token, self.hold)
+            if reply is None:
+                break
+            outcome, values = reply
+            if outcome == 1:
+                reservation.quantities.update(quantities)
+                return dict(zip(quantities, values))
+            if outcome == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Insufficient stock for " + ", ".join(
+                        f"product {key.split(':')[1]} (requested {amounts[key]})" for key in values
+                    )
+                )
+            await self.seed(db, [int(key.split(":")[1]) for key in values])
+
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Inventory service unavailable, please retry"
+        )
+
+    async def settle(self, reservation: HotReservation):
+        """Stop holding a committed reservation; its order items now count against the database stock."""
+        if reservation.quantities:
+            await redis_service.hash_delete(
+                [self._held_key(product_id) for product_id in reservation.quantities], reservation.token
+            )
+
+    async def abort(self, reservation: HotReservation):
+        """Return a rolled-back reservation to the counters."""
+        released = await redis_service.release_held(
+            {self._key(product_id): quantity for product_id, quantity in reservation.quantities.items()},
+            {self._key(product_id): self._held_key(product_id) for product_id in reservation.quantities},
+            reservation.token
+        )
+        if not released:
+            logger.error(f"Could not return hot inventory {reservation.quantities} to Redis")
+
+    async def release(self, quantities: Dict[int, int]):
+        """Return a cancelled order's `quantities` to the counters; missing counters pick them up when reseeded."""
+        released = await redis_service.incr_existing(
+            {self._key(product_id): quantity for product_id, quantity in quantities.items()}
+        )
+        if not released:
+            logger.error(f"Could not return hot inventory {dict(quantities)} to Redis")
+
+    async def forget(self, product_ids: Iterable[int]):
+        """Drop counters so they are reseeded, e.g. after stock was edited directly."""
+        await redis_service.delete(*(self._key(product_id) for product_id in product_ids))
+
+    async def reconcile(self, db: AsyncSession, product_ids: Optional[Iterable[int]] = None) -> int:
+        """Deduct pending reservations from products.stock_quantity, one batch per transaction."""
+        applied = 0
+        skip_locked = db.get_bind().dialect.name == "postgresql"
+        while True:
+            pending = select(OrderItem.id).where(OrderItem.stock_committed.is_(False))
+            if product_ids is not None:
+                pending = pending.where(OrderItem.product_id.in_(list(product_ids)))
+            pending = pending.limit(self.batch_size)
+            if skip_locked:
+                # several app workers may reconcile at once; each takes different rows
+                pending = pending.with_for_update(skip_locked=True)
+
+            result = await db.execute(
+                update(OrderItem)
+                .where(OrderItem.id.in_(pending.scalar_subquery()))
+                .values(stock_committed=True)
+                .returning(OrderItem.product_id, OrderItem.quantity)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            if not rows:
+                await db.rollback()
+                break
+
+            quantities = Counter()
+            for product_id, quantity in rows:
+                quantities[product_id] += quantity
+            stock = await InventoryService.deduct(db, quantities)
+            await db.commit()
+            await product_cache.invalidate(quantities, listings=InventoryService.crossed_zero(quantities, stock, released=False))
+
+            applied += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        return applied
+
+    async def run(self, interval: float):
+        """Reconcile forever; started from the application lifespan."""
+        while True:
+            try:
+                async with async_session() as db:
+                    applied = await self.reconcile(db)
+                if applied:
+                    logger.info(f"Reconciled {applied} hot inventory reservations")
+            except Exception as e:
+                logger.error(f"Hot inventory reconciliation failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(interval)
+
+
+hot_inventory = HotInventory(
+    batch_size=settings.HOT_INVENTORY_RECONCILE_BATCH_SIZE, hold=settings.HOT_INVENTORY_HOLD_SECONDS
+)
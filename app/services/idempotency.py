@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Response, status
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyStore:
+    """
+    Replays the first response to a request carrying an `Idempotency-Key` header.
+
+    Records live in Redis under `idem:{user_id}:{scope}:{key}`. The first request
+    claims the key with SET NX and an in-flight marker, runs, then stores its
+    status code and body bytes. A duplicate arriving meanwhile polls until the
+    stored response appears; later duplicates get it straight back. Responses
+    with a 5xx status are not stored, so a retry after a server error runs again.
+    Without Redis requests simply run unprotected, like every other cache here.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, ttl: int, lock_ttl: int, wait_seconds: float):
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_seconds = wait_seconds
+
+    @staticmethod
+    def fingerprint(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()
+
+    @staticmethod
+    def _replay(record: dict) -> Response:
+        return Response(
+            content=record["body"],
+            status_code=record["status_code"],
+            media_type="application/json",
+            headers={REPLAY_HEADER: "true"}
+        )
+
+    async def run(
+        self,
+        user_id: int,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Response]]
+    ) -> Response:
+        redis_key = f"idem:{user_id}:{scope}:{key}"
+        while True:
+            claimed = await redis_service.set_nx(redis_key, {"state": "in_progress", "fingerprint": fingerprint}, self.lock_ttl)
+            if claimed is None:
+                logger.warning(f"Idempotency store unavailable - running {scope} without replay protection")
+                return await handler()
+            if claimed:
+                break
+
+            replay = await self._await_stored(redis_key, fingerprint)
+            if replay is not None:
+                return replay
+            # the first request failed without storing a response; try to take over
+
+        try:
+            response = await handler()
+        except HTTPException as e:
+            response = JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers=e.headers)
+        except Exception:
+            await redis_service.delete(redis_key)
+            raise
+
+        if response.status_code >= 500:
+            await redis_service.delete(redis_key)
+        else:
+            await redis_service.set(redis_key, {
+                "state": "done",
+                "fingerprint": fingerprint,
+                "status_code": response.status_code,
+                "body": response.body.decode(),
+            }, expire=self.ttl)
+        return response
+
+    async def _await_stored(self, redis_key: str, fingerprint: str) -> Optional[Response]:
+        """Wait for the in-flight request's response; None if its record disappeared."""
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            record = await redis_service.get(redis_key)
+            if record is None:
+                return None
+            if record["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request"
+                )
+            if record["state"] == "done":
+                return self._replay(record)
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress, retry later"
+                )
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+
+idempotency_store = IdempotencyStore(
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_ttl=settings.IDEMPOTENCY_LOCK_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
@@ -0,0 +1,109 @@
+import logging
+from typing import Dict
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.product import Product
+
+logger = logging.getLogger(__name__)
+
+
+class InventoryService:
+    """
+    Set-based stock reservation. Each call issues one conditional UPDATE for all
+    products involved, so concurrent buyers never read-modify-write stock in Python:
+    the database applies `stock_quantity >= requested` under the row lock and a
+    losing buyer simply matches no row. Callers own the transaction and must roll
+    back when a reservation fails.
+
+    Stock changes are not product edits, so these UPDATEs keep `updated_at` as it
+    was; otherwise every purchase would move the product in `-updated_at` listings.
+    """
+
+    @staticmethod
+    async def reserve(db: AsyncSession, quantities: Dict[int, int]) -> Dict[int, tuple]:
+        """
+        Take `quantities` ({product_id: quantity}) out of stock.
+
+        Returns {product_id: (stock_quantity, updated_at)} after the decrement, or raises
+        409 naming every short item. Nothing is reserved unless every item fits.
+        """
+        if not quantities:
+            return {}
+        ids = sorted(quantities)
+        if db.get_bind().dialect.name == "postgresql" and len(ids) > 1:
+            # lock rows in id order so two multi-item checkouts can't deadlock each other
+            await db.execute(select(Product.id).where(Product.id.in_(ids)).order_by(Product.id).with_for_update())
+
+        requested = case(quantities, value=Product.id)
+        result = await db.execute(
+            update(Product)
+            .where(
+                Product.id.in_(ids),
+                Product.is_active.is_(True),
+                Product.stock_quantity >= requested
+            )
+            .values(stock_quantity=Product.stock_quantity - requested, updated_at=Product.updated_at)
+            .returning(Product.id, Product.stock_quantity, Product.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        reserved = {row.id: (row.stock_quantity, row.updated_at) for row in result}
+        if len(reserved) == len(ids):
+            return reserved
+
+        short = [product_id for product_id in ids if product_id not in reserved]
+        result = await db.execute(
+            select(Product.id, Product.stock_quantity).where(Product.id.in_(short))
+        )
+        available = dict(result.all())
+        logger.info(f"Stock reservation failed for products {short}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Insufficient stock for " + ", ".join(
+                f"product {product_id} (requested {quantities[product_id]}, available {available.get(product_id) or 0})"
+                for product_id in short
+            )
+        )
+
+    @staticmethod
+    async def release(db: AsyncSession, quantities: Dict[int, int]) -> Dict[int, int]:
+        """Put `quantities` ({product_id: quantity}) back into stock; returns the new stock of each product."""
+        if not quantities:
+            return {}
+        result = await db.execute(
+            update(Product)
+            .where(Product.id.in_(quantities))
+            .values(stock_quantity=Product.stock_quantity + case(quantities, value=Product.id), updated_at=Product.updated_at)
+            .returning(Product.id, Product.stock_quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return dict(result.all())
+
+    @staticmethod
+    async def deduct(db: AsyncSession, quantities: Dict[int, int]) -> Dict[int, int]:
+        """
+        Take `quantities` out of stock unconditionally, for reservations already granted elsewhere;
+        returns the new stock of each product.
+        """
+        if not quantities:
+            return {}
+        result = await db.execute(
+            update(Product)
+            .where(Product.id.in_(quantities))
+            .values(stock_quantity=Product.stock_quantity - case(quantities, value=Product.id), updated_at=Product.updated_at)
+            .returning(Product.id, Product.stock_quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return dict(result.all())
+
+    @staticmethod
+    def crossed_zero(quantities: Dict[int, int], stock: Dict[int, int], released: bool) -> bool:
+        """
+        Whether taking (or with `released`, returning) `quantities` moved any product between
+        in and out of stock, given its `stock` afterwards. Cached listings only need dropping then.
+        """
+        sign = -1 if released else 1
+        return any((after > 0) != (after + sign * quantities[product_id] > 0) for product_id, after in stock.items())
@@ -1,44 +1,127 @@
 from typing import Literal
+import logging
 import smtplib
+from datetime import timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from app.core.config import Settings
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.utils import utcnow
+from app.models.notification import NotificationOutbox, OutboxStatus
+
+logger = logging.getLogger(__name__)
 
 
 class NotificationService:
     @staticmethod
-    def send_notification(user_email: str, subject: str, message: str, method: str = "email"):
+    def enqueue(db: AsyncSession, user_email: str, subject: str, message: str, method: str = "email"):
+        """
+        Queue a notification in the outbox as part of the caller's transaction.
+        The outbox worker delivers it after commit; nothing is sent if the caller rolls back.
+        """
+        if method not in ("email", "push"):
+            raise ValueError("Invalid notification method")
+        db.add(NotificationOutbox(recipient=user_email, subject=subject, body=message, method=method))
+
+    @staticmethod
+    async def enqueue_digest(
+        db: AsyncSession, user_email: str, digest_key: str, subject: str, message: str, method: str = "email"
+    ):
         """
-        Sends an email notification to the user.
+        Queue a notification that may be merged with others for the same recipient and `digest_key`.
+        The first one opens a window of NOTIFICATION_DIGEST_WINDOW_SECONDS; everything queued before
+        it closes is sent as a single digest, or right away once NOTIFICATION_DIGEST_MAX_EVENTS are waiting.
+        """
+        if settings.NOTIFICATION_DIGEST_WINDOW_SECONDS <= 0:
+            NotificationService.enqueue(db, user_email, subject, message, method)
+            return
+        if method not in ("email", "push"):
+            raise ValueError("Invalid notification method")
+
+        # rows the worker has not picked up yet; a claimed or retried row never takes new company
+        window = (
+            NotificationOutbox.recipient == user_email,
+            NotificationOutbox.digest_key == digest_key,
+            NotificationOutbox.method == method,
+            NotificationOutbox.status == OutboxStatus.PENDING,
+            NotificationOutbox.attempts == 0,
+        )
+        deadline, waiting = (await db.execute(
+            select(func.min(NotificationOutbox.available_at), func.count()).where(*window)
+        )).one()
+
+        if not waiting:
+            deadline = utcnow() + timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW_SECONDS)
+        elif waiting + 1 >= settings.NOTIFICATION_DIGEST_MAX_EVENTS:
+            # full: flush the window now instead of waiting for the timer
+            deadline = utcnow()
+            await db.execute(
+                update(NotificationOutbox)
+                .where(*window)
+                .values(available_at=deadline)
+                .execution_options(synchronize_session=False)
+            )
+
+        db.add(NotificationOutbox(
+            recipient=user_email, subject=subject, body=message, method=method,
+            digest_key=digest_key, available_at=deadline
+        ))
+
+    @staticmethod
+    def build_digest(notifications) -> tuple:
+        """Merge notifications (oldest first) into one (subject, body), keeping every message."""
+        if len(notifications) == 1:
+            return notifications[0].subject, notifications[0].body
+        subjects = {notification.subject for notification in notifications}
+        if len(subjects) == 1:
+            subject = f"{notifications[0].subject} ({len(notifications)} updates)"
+            body = "\n\n".join(notification.body for notification in notifications)
+        else:
+            subject = f"You have {len(notifications)} updates"
+            body = "\n\n".join(f"{notification.subject}\n{notification.body}" for notification in notifications)
+        return subject, body
+
+    @staticmethod
+    def build_email(user_email: str, subject: str, message: str) -> str:
+        msg = MIMEMultipart()
+        msg["From"] = settings.EMAIL_FROM
+        msg["To"] = user_email
+        msg["Subject"] = subject
+        msg.attach(MIMEText(message, "plain"))
+        return msg.as_string()
+
+    @staticmethod
+    def deliver(user_email: str, subject: str, message: str, method: str = "email"):
+        """
+        Send one notification now, raising on failure. Blocking: call it from a worker thread.
         """
         if method == "email":
-            try:
-                # Set up the email server
-                server = smtplib.SMTP(Settings.SMTP_SERVER, Settings.SMTP_PORT)
-                server.starttls()
-                server.login(Settings.SMTP_USERNAME, Settings.SMTP_PASSWORD)
-
-                # Create email message
-                msg = MIMEMultipart()
-                msg["From"] = Settings.EMAIL_FROM
-                msg["To"] = user_email
-                msg["Subject"] = subject
-                msg.attach(MIMEText(message, "plain"))
-
-                # Send email
-                server.sendmail(Settings.EMAIL_FROM, user_email, msg.as_string())
-                server.quit()
-
-                print(f"Email sent to {user_email}")
-                return {"status": "success", "message": "Email sent successfully"}
-
-            except Exception as e:
-                print(f"Error sending email: {str(e)}")
-                return {"status": "error", "message": str(e)}
+            # Set up the email server; leaving the block sends QUIT
+            with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=30) as server:
+                if settings.SMTP_USE_TLS:
+                    server.starttls()
+                server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+                server.sendmail(settings.EMAIL_FROM, user_email, NotificationService.build_email(user_email, subject, message))
+            logger.info(f"Email sent to {user_email}")
 
         elif method == "push":
-            print(f"Sending Push Notification to {user_email} - Message: {message}")
-            return {"status": "success", "message": "Push notification sent"}
+            logger.info(f"Sending Push Notification to {user_email} - Message: {message}")
 
         else:
             raise ValueError("Invalid notification method")
+
+    @staticmethod
+    def send_notification(user_email: str, subject: str, message: str, method: str = "email"):
+        """
+        Sends a notification to the user immediately.
+        """
+        try:
+            NotificationService.deliver(user_email, subject, message, method)
+            return {"status": "success", "message": "Notification sent successfully"}
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending email: {str(e)}")
+            return {"status": "error", "message": str(e)}
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import random
+from datetime import timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.utils import utcnow
+from app.db.session import async_session
+from app.models.notification import NotificationOutbox, OutboxStatus
+from app.services.notification import NotificationService
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationOutboxWorker:
+    """
+    Delivers notifications queued with NotificationService.enqueue.
+
+    Each pass claims a batch of due rows by pushing their `available_at` out by a
+    lease and committing, so no transaction stays open while SMTP runs and a
+    worker that dies mid-send only delays those rows until the lease expires.
+    Sends run in a thread. Failures are retried with capped exponential backoff
+    and jitter; after `max_attempts` the row is dead-lettered (status DEAD)
+    with its last error kept for inspection. Delivery is at-least-once.
+
+    Claimed rows sharing a recipient, method and digest key (see
+    NotificationService.enqueue_digest) go out as one digest message and
+    share its outcome.
+    """
+
+    def __init__(self, batch_size: int, max_attempts: int, retry_base: float, retry_max: float, lease: int):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _claim(self, db: AsyncSession):
+        now = utcnow()
+        due = (
+            select(NotificationOutbox.id)
+            .where(NotificationOutbox.status == OutboxStatus.PENDING, NotificationOutbox.available_at <= now)
+            .order_by(NotificationOutbox.available_at)
+            .limit(self.batch_size)
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            # concurrent workers claim disjoint batches
+            due = due.with_for_update(skip_locked=True)
+
+        result = await db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(due.scalar_subquery()))
+            .values(attempts=NotificationOutbox.attempts + 1, available_at=now + timedelta(seconds=self.lease))
+            .returning(
+                NotificationOutbox.id, NotificationOutbox.recipient, NotificationOutbox.subject,
+                NotificationOutbox.body, NotificationOutbox.method, NotificationOutbox.digest_key,
+                NotificationOutbox.attempts
+            )
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.all()
+        await db.commit()
+        return claimed
+
+    @staticmethod
+    def _group(claimed) -> list:
+        groups = {}
+        for row in sorted(claimed, key=lambda row: row.id):
+            key = (row.recipient, row.method, row.digest_key) if row.digest_key else row.id
+            groups.setdefault(key, []).append(row)
+        return list(groups.values())
+
+    async def _send(self, rows):
+        subject, body = NotificationService.build_digest(rows)
+        try:
+            await asyncio.to_thread(NotificationService.deliver, rows[0].recipient, subject, body, rows[0].method)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    async def drain(self, db: AsyncSession) -> int:
+        """Claim and send one batch of due notifications; returns how many were claimed."""
+        claimed = await self._claim(db)
+        for rows in self._group(claimed):
+            ids = [row.id for row in rows]
+            attempts = max(row.attempts for row in rows)
+            error = await self._send(rows)
+            if error is None:
+                values = {"status": OutboxStatus.SENT, "sent_at": utcnow(), "last_error": None}
+            elif attempts >= self.max_attempts:
+                logger.error(f"Notifications {ids} dead-lettered after {attempts} attempts: {error}")
+                values = {"status": OutboxStatus.DEAD, "last_error": error}
+            else:
+                logger.warning(f"Notifications {ids} attempt {attempts} failed: {error}")
+                values = {
+                    "available_at": utcnow() + timedelta(seconds=self.retry_delay(attempts)),
+                    "last_error": error
+                }
+            await db.execute(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.id.in_(ids))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        return len(claimed)
+
+    @staticmethod
+    async def stats(db: AsyncSession) -> dict:
+        result = await db.execute(
+            select(NotificationOutbox.status, func.count()).group_by(NotificationOutbox.status)
+        )
+        counts = {status.value: 0 for status in OutboxStatus}
+        counts.update({status.value: count for status, count in result.all()})
+        return counts
+
+    async def run(self, interval: float):
+        """Drain forever; started from the application lifespan or app.cli.notification_worker."""
+        while True:
+            try:
+                async with async_session() as db:
+                    claimed = await self.drain(db)
+                if claimed == self.batch_size:
+                    continue  # more may be due right away
+            except Exception as e:
+                logger.error(f"Notification outbox pass failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(interval)
+
+
+notification_worker = NotificationOutboxWorker(
+    batch_size=settings.NOTIFICATION_BATCH_SIZE,
+    max_attempts=settings.NOTIFICATION_MAX_ATTEMPTS,
+    retry_base=settings.NOTIFICATION_RETRY_BASE_SECONDS,
+    retry_max=settings.NOTIFICATION_RETRY_MAX_SECONDS,
+    lease=settings.NOTIFICATION_LEASE_SECONDS,
+)
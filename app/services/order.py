@@ -1,79 +1,398 @@
-from app.models.order import Order, OrderItem
+import logging
+from collections import Counter, defaultdict
+from typing import Optional
+from fastapi import HTTPException, status
+from app.models.order import Order, OrderItem, OrderStatus
 from app.models.product import Product
 from app.models.address import Address
+from app.models.cart import Cart
+from app.models.user import User
+from app.core.pagination import encode_cursor, decode_cursor, parse_cursor_datetime, keyset_after
+from app.schemas.order import OrderItemSummary, OrderSummary
+from sqlalchemy import delete, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.services.cart import RedisCartStore, cart_store
+from app.services.hot_inventory import HotReservation, hot_inventory
+from app.services.inventory import InventoryService
 from app.services.notification import NotificationService
+from app.services.product_cache import product_cache
 from sqlalchemy.future import select
 
+logger = logging.getLogger(__name__)
+
+# the order state machine: every status change must be one of these transitions
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PAID, OrderStatus.CANCELLED},
+    OrderStatus.PAID: {OrderStatus.SHIPPED, OrderStatus.CANCELLED},
+    OrderStatus.SHIPPED: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
 
 class OrderService:
+    @staticmethod
+    async def transition(
+        db: AsyncSession,
+        order_id: int,
+        target: OrderStatus,
+        current_user=None,
+        expected_version: Optional[int] = None
+    ) -> Order:
+        """
+        Move an order to `target` if ORDER_TRANSITIONS allows it, without taking row locks.
+        The UPDATE only matches the status and version that were read, so of two concurrent
+        transitions exactly one applies and the other gets a 409. Non-admin users may only
+        touch their own orders. The caller commits.
+        """
+        result = await db.execute(
+            select(Order).where(Order.id == order_id).execution_options(populate_existing=True)
+        )
+        order = result.scalars().first()
+        if not order or (current_user is not None and current_user.role != "admin" and order.user_id != current_user.id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+        if expected_version is not None and expected_version != order.version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Order is at version {order.version}, not {expected_version}"
+            )
+        if target not in ORDER_TRANSITIONS[order.status]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Order in status {order.status.value} cannot become {target.value}"
+            )
+
+        result = await db.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.status == order.status, Order.version == order.version)
+            .values(status=target, version=Order.version + 1)
+            .returning(Order.version, Order.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Order was changed by another request, reload it and retry"
+            )
+        set_committed_value(order, "status", target)
+        set_committed_value(order, "version", row.version)
+        set_committed_value(order, "updated_at", row.updated_at)
+        return order
+
+    @staticmethod
+    async def _get_shipping_address(db: AsyncSession, address_id: int, current_user) -> Address:
+        """The user's own address; someone else's is reported as missing."""
+        result = await db.execute(
+            select(Address).where(Address.id == address_id, Address.user_id == current_user.id)
+        )
+        shipping_address = result.scalars().first()
+        if not shipping_address:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shipping address not found")
+        return shipping_address
+
+    @staticmethod
+    async def _place_order(db: AsyncSession, current_user, shipping_address, lines, hot_reserved: HotReservation) -> Order:
+        """
+        Reserve stock for `lines` ([(product, quantity)]) and add the order with its items to the
+        session. Flash-sale reservations are recorded in `hot_reserved`, which the caller settles
+        after committing or aborts if its transaction fails. The caller commits.
+        """
+        products = {product.id: product for product, _ in lines}
+        for product in products.values():
+            if not product.is_active:
+                raise Exception(f"Product {product.id} is not available")
+
+        quantities = Counter()
+        for product, quantity in lines:
+            quantities[product.id] += quantity
+
+        # Reserve stock for every line in one conditional UPDATE; raises 409 if any item is short
+        reserved = await InventoryService.reserve(
+            db, {product_id: quantity for product_id, quantity in quantities.items() if not products[product_id].hot_inventory}
+        )
+        for product_id, (stock_quantity, updated_at) in reserved.items():
+            set_committed_value(products[product_id], "stock_quantity", stock_quantity)
+            set_committed_value(products[product_id], "updated_at", updated_at)
+
+        # Flash-sale products reserve from Redis last, so nothing above needs undoing there;
+        # their items stay uncommitted until the reconciler deducts them from the products table
+        hot = {product_id: quantity for product_id, quantity in quantities.items() if products[product_id].hot_inventory}
+        if hot:
+            for product_id, remaining in (await hot_inventory.reserve(db, hot_reserved, hot)).items():
+                set_committed_value(products[product_id], "stock_quantity", remaining)
+
+        total_amount = 0
+        order_items = []
+        for product, quantity in lines:
+            order_items.append(OrderItem(
+                product=product,
+                quantity=quantity,
+                price=product.price,
+                stock_committed=not product.hot_inventory
+            ))
+            total_amount += product.price * quantity
+
+        # Create the order; it and its items are inserted in a single flush
+        new_order = Order(
+            user_id=current_user.id,
+            shipping_address=shipping_address,
+            total_amount=total_amount,
+            order_items=order_items
+        )
+        db.add(new_order)
+        return new_order
+
     @staticmethod
     async def create_order(
         db: AsyncSession,
         order_in,
         current_user
     ):
+        hot_reserved = HotReservation()
         try:
-            # Check if shipping address exists
-            shipping_address = await db.get(Address, order_in.shipping_address_id)
-            if not shipping_address:
-                raise Exception("Shipping address not found")
-            
-            total_amount = 0
-            order_items = []
-            
-            # Loop through items to build order items and calculate total amount
-            for item in order_in.items:
-                product = await db.get(Product, item.product_id)
-                if not product:
-                    raise Exception(f"Product {item.product_id} not found")
-                order_item = OrderItem(
-                    product_id=product.id,
-                    quantity=item.quantity,
-                    price=product.price
-                )
-                total_amount += product.price * item.quantity
-                order_items.append(order_item)
+            shipping_address = await OrderService._get_shipping_address(db, order_in.shipping_address_id, current_user)
             
-            # Create and add the new order
-            new_order = Order(
-                user_id=current_user.id,
-                shipping_address_id=shipping_address.id,
-                total_amount=total_amount,
-                order_items=order_items
+            # Fetch every product in one query and price the order in memory
+            product_ids = {item.product_id for item in order_in.items}
+            result = await db.execute(
+                select(Product)
+                .where(Product.id.in_(product_ids))
+                .options(selectinload(Product.category))
             )
-            db.add(new_order)
+            products = {product.id: product for product in result.scalars().all()}
+
+            missing = sorted(product_ids - products.keys())
+            if missing:
+                raise Exception(f"Product {', '.join(map(str, missing))} not found")
+
+            lines = [(products[item.product_id], item.quantity) for item in order_in.items]
+            new_order = await OrderService._place_order(db, current_user, shipping_address, lines, hot_reserved)
             await db.commit()
-            return new_order
         
+        except HTTPException:
+            await db.rollback()
+            await hot_inventory.abort(hot_reserved)
+            raise
         except Exception as e:
             await db.rollback()
+            await hot_inventory.abort(hot_reserved)
             raise Exception(f"Order creation failed: {str(e)}")
+
+        await hot_inventory.settle(hot_reserved)
+        # Listings only change when a product sells out: bumping the shared list
+        # version on every checkout would empty the listing cache during a sale
+        await product_cache.invalidate(products, listings=OrderService._sold_out(lines))
+        return new_order
+
+    @staticmethod
+    async def checkout(
+        db: AsyncSession,
+        shipping_address_id: int,
+        current_user
+    ):
+        """
+        Turn the user's cart into an order in one transaction: the cart is read together with
+        current prices and stock, the order and its items are inserted in one flush and the
+        ordered lines are removed from the cart.
+        """
+        hot_reserved = HotReservation()
+        in_redis = isinstance(cart_store, RedisCartStore)
+        try:
+            shipping_address = await OrderService._get_shipping_address(db, shipping_address_id, current_user)
+
+            if in_redis:
+                # live carts are in Redis; price them with a single product query
+                cart = await cart_store.items(db, current_user.id)
+                result = await db.execute(
+                    select(Product).where(Product.id.in_(cart)).options(selectinload(Product.category))
+                )
+                lines = [(product, cart[product.id]) for product in result.scalars().all()]
+            else:
+                # lock the lines so a concurrent checkout of the same cart waits for this one
+                result = await db.execute(
+                    select(Product, Cart.quantity)
+                    .join(Cart, Cart.product_id == Product.id)
+                    .where(Cart.user_id == current_user.id)
+                    .order_by(Cart.id)
+                    .options(selectinload(Product.category))
+                    .with_for_update(of=Cart)
+                )
+                lines = result.tuples().all()
+            if not lines:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
+
+            new_order = await OrderService._place_order(db, current_user, shipping_address, lines, hot_reserved)
+            ordered = {product.id: quantity for product, quantity in lines}
+            # lines added to the cart while checking out stay there
+            result = await db.execute(delete(Cart).where(Cart.user_id == current_user.id, Cart.product_id.in_(ordered)))
+            if not in_redis and result.rowcount != len(ordered):
+                # another checkout took these lines first (databases without FOR UPDATE get here)
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Cart was checked out by another request")
+            await db.commit()
+
+        except HTTPException:
+            await db.rollback()
+            await hot_inventory.abort(hot_reserved)
+            raise
+        except Exception as e:
+            await db.rollback()
+            await hot_inventory.abort(hot_reserved)
+            raise Exception(f"Checkout failed: {str(e)}")
+
+        await hot_inventory.settle(hot_reserved)
+        if in_redis:
+            # the Redis cart is the live one; its flushed rows were already removed above,
+            # so if this fails the ordered lines at least don't come back on a reload
+            try:
+                await cart_store.subtract(db, current_user.id, ordered)
+            except HTTPException:
+                logger.error(f"Order {new_order.id} placed but cart of user {current_user.id} was not cleared")
+        await product_cache.invalidate(list(ordered), listings=OrderService._sold_out(lines))
+        return new_order
+
+    @staticmethod
+    def _sold_out(lines) -> bool:
+        """Whether placing `lines` took the last unit of a product; hot products' table stock is untouched."""
+        return any(product.stock_quantity <= 0 for product, _ in lines if not product.hot_inventory)
+
+    @staticmethod
+    async def _release_stock(db: AsyncSession, order_id: int):
+        """
+        Return a cancelled order's stock in the caller's transaction. Gives back the database
+        quantities released here, the hot-inventory quantities the caller must hand back to
+        Redis after commit, and whether a sold-out product came back into stock.
+        """
+        # Hot-inventory items the reconciler hasn't deducted yet only hold Redis stock;
+        # claim them first so the reconciler can't deduct them after this point
+        result = await db.execute(
+            update(OrderItem)
+            .where(OrderItem.order_id == order_id, OrderItem.stock_committed.is_(False))
+            .values(stock_committed=True)
+            .returning(OrderItem.id, OrderItem.product_id, OrderItem.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.all()
+        hot_release = Counter()
+        for _, product_id, quantity in claimed:
+            hot_release[product_id] += quantity
+
+        # Everything else was taken from products.stock_quantity and goes back there
+        result = await db.execute(
+            select(OrderItem.product_id, Product.hot_inventory, func.sum(OrderItem.quantity))
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(OrderItem.order_id == order_id, OrderItem.id.not_in([item_id for item_id, _, _ in claimed]))
+            .group_by(OrderItem.product_id, Product.hot_inventory)
+        )
+        quantities = {}
+        for product_id, is_hot, quantity in result.all():
+            quantities[product_id] = quantity
+            if is_hot:
+                hot_release[product_id] += quantity
+        stock = await InventoryService.release(db, quantities)
+        return quantities, hot_release, InventoryService.crossed_zero(quantities, stock, released=True)
+
+    @staticmethod
+    async def cancel_order(
+        db: AsyncSession,
+        order_id: int,
+        current_user
+    ):
+        try:
+            # Only one of several concurrent transitions wins, so the stock is returned once
+            await OrderService.transition(db, order_id, OrderStatus.CANCELLED, current_user)
+            quantities, hot_release, restocked = await OrderService._release_stock(db, order_id)
+            await db.commit()
+
+        except HTTPException:
+            await db.rollback()
+            raise
+        except Exception as e:
+            await db.rollback()
+            raise Exception(f"Order cancellation failed: {str(e)}")
+
+        await hot_inventory.release(hot_release)
+        await product_cache.invalidate([*quantities, *hot_release], listings=restocked)
     
+    @staticmethod
+    async def list_orders(
+        db: AsyncSession,
+        current_user,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        include_items: bool = False
+    ):
+        """
+        Return one page of the user's order history, newest first, and the next cursor.
+
+        Orders are summarized in a single query (item count via a correlated
+        subquery) and keyset-paginated on (created_at, id); compact line items
+        for the whole page come from one more query when requested.
+        """
+        item_count = (
+            select(func.count(OrderItem.id))
+            .where(OrderItem.order_id == Order.id)
+            .correlate(Order)
+            .scalar_subquery()
+        )
+        query = (
+            select(Order.id, Order.status, Order.total_amount, Order.created_at, item_count.label("item_count"))
+            .where(Order.user_id == current_user.id)
+        )
+        if cursor:
+            last_created_at, last_id = decode_cursor(cursor, 2)
+            query = query.where(keyset_after(
+                (Order.created_at, Order.id), (parse_cursor_datetime(last_created_at), last_id), descending=True
+            ))
+
+        result = await db.execute(query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1))
+        orders = [OrderSummary.model_validate(row._mapping) for row in result]
+
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor([orders[-1].created_at, orders[-1].id])
+
+        if include_items and orders:
+            result = await db.execute(
+                select(OrderItem.order_id, OrderItem.product_id, Product.name, OrderItem.quantity, OrderItem.price)
+                .outerjoin(Product, Product.id == OrderItem.product_id)
+                .where(OrderItem.order_id.in_([order.id for order in orders]))
+                .order_by(OrderItem.order_id, OrderItem.id)
+            )
+            items = defaultdict(list)
+            for order_id, product_id, product_name, quantity, price in result:
+                items[order_id].append(OrderItemSummary(
+                    product_id=product_id, product_name=product_name, quantity=quantity, price=price
+                ))
+            for order in orders:
+                order.items = items[order.id]
+
+        return orders, next_cursor
+
     @staticmethod
     async def process_payment(
         db: AsyncSession,
         order_id: int
     ):
         try:
-            # Fetch the order
+            await OrderService.transition(db, order_id, OrderStatus.PAID)
+            await db.commit()
+
+            # Fetch the paid order with everything the response needs
             result = await db.execute(select(Order).where(Order.id == order_id)
                 .options(
                     selectinload(Order.shipping_address),
-                    selectinload(Order.order_items).selectinload(OrderItem.product)
+                    selectinload(Order.order_items).selectinload(OrderItem.product).selectinload(Product.category)
                 )
             )
-            loaded_order = result.scalars().first()
+            return result.scalars().first()
 
-            if not loaded_order:
-                raise Exception("Order not found")
-            
-            # Update the order status to 'paid'
-            loaded_order.status = "paid"
-            await db.commit()
-            return loaded_order
-        
+        except HTTPException:
+            await db.rollback()
+            raise
         except Exception as e:
             await db.rollback()
             raise Exception(f"Payment processing failed: {str(e)}")
@@ -85,27 +404,35 @@ class OrderService:
         order_update
     ):
         try:
-            # Fetch order with user relationship loaded
-            result = await db.execute(select(Order).where(Order.id == order_id).options(selectinload(Order.user)))
-            order = result.scalars().first()
-
-            if not order:
-                raise Exception("Order not found")
-            
-            # Update the order status
-            order.status = order_update.status
-            await db.commit()
+            order = await OrderService.transition(
+                db, order_id, OrderStatus(order_update.status), expected_version=order_update.version
+            )
+            quantities, hot_release, restocked = {}, Counter(), False
+            if order.status == OrderStatus.CANCELLED:
+                # an admin cancel gives the stock back exactly like cancel_order
+                quantities, hot_release, restocked = await OrderService._release_stock(db, order_id)
+            user_email = (await db.execute(select(User.email).where(User.id == order.user_id))).scalar()
 
-            # Send notification to the user
-            NotificationService.send_notification(
-                user_email=order.user.email,
+            # Queue the notification in the same transaction as the status change;
+            # transitions close together reach the customer as one digest
+            await NotificationService.enqueue_digest(
+                db,
+                user_email=user_email,
+                digest_key="order-status",
                 subject="Order Status Update",
-                message=f"Your order #{order.id} status has been updated to {order.status}.",
+                message=f"Your order #{order.id} status has been updated to {order.status.value}.",
                 method="email"
             )
+            await db.commit()
 
-            return order
-        
+        except HTTPException:
+            await db.rollback()
+            raise
         except Exception as e:
             await db.rollback()
             raise Exception(f"Order status update failed: {str(e)}")
+
+        if hot_release or quantities:
+            await hot_inventory.release(hot_release)
+            await product_cache.invalidate([*quantities, *hot_release], listings=restocked)
+        return order
@@ -1,18 +1,34 @@
 import datetime
 import logging
+from typing import List, Optional
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import and_
+from sqlalchemy.sql import func
+from sqlalchemy import and_, or_, case, cast, column, update, values, Integer, Float
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.models.product import Product
 from app.models.user import User
-from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate, CategoryResponse
+from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate, CategoryResponse, ProductBulkUpdateItem, ProductBulkUpdateResult
+from app.core.pagination import encode_cursor, decode_cursor, parse_cursor_datetime, keyset_after
+from app.services.hot_inventory import hot_inventory
+from app.services.product_cache import product_cache
 
 logger = logging.getLogger(__name__)
 
+# sort key accepted by GET /products -> (column, descending)
+PRODUCT_SORTS = {
+    "-updated_at": (Product.updated_at, True),
+    "updated_at": (Product.updated_at, False),
+    "price": (Product.price, False),
+    "-price": (Product.price, True),
+}
+
+# rows per set-based UPDATE in bulk updates, keeps bind parameters well under driver limits
+BULK_UPDATE_CHUNK_SIZE = 1000
+
 class ProductService:
 
     @staticmethod
@@ -48,6 +64,7 @@ class ProductService:
             db.add(new_product)
             await db.commit()
             await db.refresh(new_product)
+            await product_cache.invalidate()
 
             # Ensure proper serialization
             return ProductResponse(
@@ -61,7 +78,9 @@ class ProductService:
                 sku=new_product.sku,
                 image_url=new_product.image_url,
                 is_active=new_product.is_active,
-                updated_at=new_product.updated_at
+                hot_inventory=new_product.hot_inventory,
+                updated_at=new_product.updated_at,
+                rating=new_product.rating
             )
 
         except HTTPException:
@@ -76,39 +95,93 @@ class ProductService:
 
 
     @staticmethod
-    async def get_products(db: AsyncSession, user: User):
+    def to_response(p: Product) -> ProductResponse:
+        return ProductResponse(
+            id=p.id,
+            name=p.name,
+            description=p.description,
+            price=p.price,
+            category_id=p.category_id,
+            category=CategoryResponse(
+                id=p.category.id, 
+                name=p.category.name, 
+                created_at=getattr(p.category, 'created_at', None)  # Safe handling
+            ) if p.category else None,
+            stock_quantity=p.stock_quantity,
+            sku=p.sku,
+            image_url=str(p.image_url) if p.image_url else None,
+            is_active=p.is_active,
+            hot_inventory=p.hot_inventory,
+            user_id=p.user_id,
+            updated_at=p.updated_at,
+            rating=p.rating
+        )
+
+    @staticmethod
+    async def get_products(
+        db: AsyncSession,
+        user: User,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        sort: str = "-updated_at",
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        is_active: Optional[bool] = None
+    ):
+        """
+        Return one page of products and the cursor for the next page.
+
+        Pages are keyset-paginated on (sort column, id), so every page costs the
+        same indexed range scan no matter how deep the client has paged.
+        """
         try:
             await ProductService._verify_user_authorization(user)
 
+            scope = f"seller:{user.id}" if user.role.value == "seller" else "all"
+            params = {
+                "limit": limit, "cursor": cursor, "sort": sort, "category_id": category_id,
+                "min_price": min_price, "max_price": max_price, "is_active": is_active,
+            }
+            cached, cache_key = await product_cache.get_list(scope, params)
+            if cached is not None:
+                return [ProductResponse.model_validate(p) for p in cached["data"]], cached["next_cursor"]
+
+            column, descending = PRODUCT_SORTS[sort]
             query = select(Product).options(selectinload(Product.category))
             if user.role.value == "seller":
                 query = query.where(Product.user_id == user.id)
+            if category_id is not None:
+                query = query.where(Product.category_id == category_id)
+            if min_price is not None:
+                query = query.where(Product.price >= min_price)
+            if max_price is not None:
+                query = query.where(Product.price <= max_price)
+            if is_active is not None:
+                query = query.where(Product.is_active == is_active)
 
-            result = await db.execute(query)
+            if cursor:
+                last_value, last_id = decode_cursor(cursor, 2)
+                if column.key == "updated_at":
+                    last_value = parse_cursor_datetime(last_value)
+                query = query.where(keyset_after((column, Product.id), (last_value, last_id), descending))
+
+            order = (column.desc(), Product.id.desc()) if descending else (column.asc(), Product.id.asc())
+            result = await db.execute(query.order_by(*order).limit(limit + 1))
             products = result.scalars().all()
 
-            product_list = []
-            for p in products:
-                product_list.append(ProductResponse(
-                    id=p.id,
-                    name=p.name,
-                    description=p.description,
-                    price=p.price,
-                    category_id=p.category_id,
-                    category=CategoryResponse(
-                        id=p.category.id, 
-                        name=p.category.name, 
-                        created_at=getattr(p.category, 'created_at', None)  # Safe handling
-                    ) if p.category else None,
-                    stock_quantity=p.stock_quantity,
-                    sku=p.sku,
-                    image_url=str(p.image_url) if p.image_url else None,
-                    is_active=p.is_active,
-                    user_id=p.user_id,
-                    updated_at=p.updated_at
-                ))
-
-            return product_list
+            next_cursor = None
+            if len(products) > limit:
+                products = products[:limit]
+                last = products[-1]
+                next_cursor = encode_cursor([getattr(last, column.key), last.id])
+
+            product_list = [ProductService.to_response(p) for p in products]
+            await product_cache.set_list(cache_key, {
+                "data": [p.model_dump(mode="json") for p in product_list],
+                "next_cursor": next_cursor
+            })
+            return product_list, next_cursor
 
         except HTTPException:
             raise
@@ -151,6 +224,25 @@ class ProductService:
                 detail="Failed to fetch product"
             )
 
+    @staticmethod
+    async def get_product_detail(db: AsyncSession, product_id: int, user: User) -> ProductResponse:
+        """Serialized product for the detail endpoint, served from Redis when cached."""
+        await ProductService._verify_user_authorization(user)
+
+        cached, version = await product_cache.get_detail(product_id)
+        if cached is None:
+            product = await ProductService.get_product(db, product_id, user)
+            response = ProductService.to_response(product)
+            await product_cache.set_detail(product_id, version, response)
+            return response
+
+        if user.role.value == "seller" and cached["user_id"] != user.id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
+            )
+        return ProductResponse.model_validate(cached)
+
     @staticmethod
     async def update_product(db: AsyncSession, product_id: int, product_data: ProductUpdate, user: User):
         try:
@@ -171,11 +263,19 @@ class ProductService:
                         detail="SKU already exists for your products"
                     )
 
+            was_hot = product.hot_inventory
+            if was_hot and update_dict.get('hot_inventory') is False:
+                # leaving flash-sale mode: fold pending Redis reservations into stock_quantity first
+                await hot_inventory.reconcile(db, [product.id])
+
             for key, value in update_dict.items():
                 setattr(product, key, value)
 
             await db.commit()
             await db.refresh(product, ['category'])
+            if (was_hot or product.hot_inventory) and update_dict.keys() & {'stock_quantity', 'hot_inventory'}:
+                await hot_inventory.forget([product.id])
+            await product_cache.invalidate([product.id])
             return product
 
         except HTTPException:
@@ -188,12 +288,109 @@ class ProductService:
                 detail="Product update failed"
             )
 
+    @staticmethod
+    async def bulk_update_stock_and_price(db: AsyncSession, items: List[ProductBulkUpdateItem], user: User) -> ProductBulkUpdateResult:
+        """
+        Apply many (id or sku, stock_quantity, price) updates in one transaction.
+
+        Keys are resolved with one query, then rows are written with set-based
+        UPDATEs (UPDATE ... FROM (VALUES ...) on Postgres, a CASE on other
+        databases) instead of one round trip per product.
+        """
+        await ProductService._verify_user_authorization(user)
+
+        ids = {item.id for item in items if item.id is not None}
+        skus = {item.sku for item in items if item.sku is not None}
+        query = select(Product.id, Product.sku).where(or_(Product.id.in_(ids), Product.sku.in_(skus)))
+        if user.role.value == "seller":
+            query = query.where(Product.user_id == user.id)
+
+        try:
+            result = await db.execute(query)
+            id_by_sku = {}
+            found_ids = set()
+            for product_id, sku in result.all():
+                found_ids.add(product_id)
+                id_by_sku[sku] = product_id
+
+            # Later entries for the same product win
+            changes = {}
+            for item in items:
+                product_id = item.id if item.id is not None else id_by_sku.get(item.sku)
+                if product_id is None or product_id not in found_ids:
+                    continue
+                stock, price = changes.get(product_id, (None, None))
+                changes[product_id] = (
+                    item.stock_quantity if item.stock_quantity is not None else stock,
+                    item.price if item.price is not None else price,
+                )
+
+            rows = [(product_id, stock, price) for product_id, (stock, price) in changes.items()]
+            dialect = db.get_bind().dialect.name
+            updated = 0
+            for start in range(0, len(rows), BULK_UPDATE_CHUNK_SIZE):
+                chunk = rows[start:start + BULK_UPDATE_CHUNK_SIZE]
+                result = await db.execute(ProductService._bulk_update_statement(dialect, chunk))
+                updated += result.rowcount
+            await db.commit()
+
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Bulk product update failed: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Bulk product update failed"
+            )
+
+        # stock edits on flash-sale products invalidate their Redis counters (no-op for other products)
+        await hot_inventory.forget(product_id for product_id, (stock_quantity, _) in changes.items() if stock_quantity is not None)
+        await product_cache.invalidate(changes.keys())
+
+        return ProductBulkUpdateResult(
+            updated=updated,
+            unknown_ids=sorted(ids - found_ids),
+            unknown_skus=sorted(skus - id_by_sku.keys())
+        )
+
+    @staticmethod
+    def _bulk_update_statement(dialect: str, rows):
+        """One UPDATE applying (id, stock_quantity, price) rows; None leaves a column unchanged."""
+        if dialect == "postgresql":
+            v = values(
+                column("id", Integer), column("stock_quantity", Integer), column("price", Float),
+                name="v"
+            ).data(rows)
+            return (
+                update(Product)
+                .where(Product.id == v.c.id)
+                .values(
+                    stock_quantity=func.coalesce(cast(v.c.stock_quantity, Integer), Product.stock_quantity),
+                    price=func.coalesce(cast(v.c.price, Float), Product.price)
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        stock = {product_id: value for product_id, value, _ in rows if value is not None}
+        price = {product_id: value for product_id, _, value in rows if value is not None}
+        changes = {}
+        if stock:
+            changes["stock_quantity"] = case(stock, value=Product.id, else_=Product.stock_quantity)
+        if price:
+            changes["price"] = case(price, value=Product.id, else_=Product.price)
+        return (
+            update(Product)
+            .where(Product.id.in_([product_id for product_id, _, _ in rows]))
+            .values(**changes)
+            .execution_options(synchronize_session=False)
+        )
+
     @staticmethod
     async def delete_product(db: AsyncSession, product_id: int, user: User):
         try:
             product = await ProductService.get_product(db, product_id, user)
             await db.delete(product)
             await db.commit()
+            await product_cache.invalidate([product_id])
             return {"message": "Product deleted successfully"}
 
         except HTTPException:
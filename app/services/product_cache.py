@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+from typing import Any, Iterable, Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCache:
+    """
+    Read-through Redis cache for product details and product listings.
+
+    Keys embed a version number instead of being deleted on writes: each product
+    has its own version counter and all listings share one. A write bumps the
+    counters after commit, so entries filled from a read that raced the write
+    land under a version nobody reads again and can never serve stale data.
+    """
+
+    LIST_VERSION_KEY = "products:list:version"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _version_key(product_id: int) -> str:
+        return f"product:{product_id}:version"
+
+    @staticmethod
+    async def _version(key: str) -> int:
+        return int(await redis_service.get(key) or 0)
+
+    async def get_detail(self, product_id: int) -> Tuple[Optional[dict], int]:
+        version = await self._version(self._version_key(product_id))
+        return await redis_service.get(f"product:{product_id}:v{version}"), version
+
+    async def set_detail(self, product_id: int, version: int, data: Any):
+        await redis_service.set(f"product:{product_id}:v{version}", data, expire=self.ttl)
+
+    @staticmethod
+    def _list_key(version: int, scope: str, params: dict) -> str:
+        normalized = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        return f"products:list:v{version}:{scope}:{digest}"
+
+    async def get_list(self, scope: str, params: dict) -> Tuple[Optional[dict], str]:
+        version = await self._version(self.LIST_VERSION_KEY)
+        key = self._list_key(version, scope, params)
+        return await redis_service.get(key), key
+
+    async def set_list(self, key: str, data: Any):
+        await redis_service.set(key, data, expire=self.ttl)
+
+    async def invalidate(self, product_ids: Iterable[int] = (), listings: bool = True):
+        """Drop cached details for `product_ids` and, unless `listings` is False, every cached listing."""
+        keys = [self._version_key(product_id) for product_id in product_ids]
+        if listings:
+            keys.append(self.LIST_VERSION_KEY)
+        await redis_service.incr_many(*keys)
+
+
+product_cache = ProductCache(ttl=settings.PRODUCT_CACHE_TTL_SECONDS)
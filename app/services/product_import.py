@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import logging
+from typing import BinaryIO, Iterator, List, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from starlette.concurrency import iterate_in_threadpool
+
+from app.core.config import settings
+from app.models.category import Category
+from app.models.product import Product
+from app.models.user import User
+from app.schemas.product import ProductCreate, ProductImportError, ProductImportReport
+from app.services.product import ProductService
+from app.services.product_cache import product_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# rows parsed per trip to the threadpool; reading the upload blocks, so it never runs on the event loop
+IMPORT_READ_CHUNK_ROWS = 500
+
+
+class ProductImportService:
+    """
+    Streaming bulk import of products from CSV or NDJSON.
+
+    Rows are parsed one at a time and validated with the `ProductCreate` rules.
+    Each batch checks SKU and category conflicts with one query apiece and is
+    written with a single multi-row INSERT in its own transaction, so memory
+    stays bounded and a bad batch never rolls back earlier ones.
+    """
+
+    @staticmethod
+    def detect_format(filename: str, content_type: str = None) -> str:
+        name = (filename or "").lower()
+        if name.endswith(".csv") or content_type == "text/csv":
+            return "csv"
+        if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+            return "ndjson"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported import format, upload a .csv or .ndjson file"
+        )
+
+    @staticmethod
+    def iter_rows(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, dict, str]]:
+        """
+        Yield (row number, raw row, parse error) without reading the whole file. A file
+        that can't be read past some point (not UTF-8, malformed CSV) ends with a row
+        of None and the reason.
+        """
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        number = 0
+        try:
+            if fmt == "csv":
+                for number, row in enumerate(csv.DictReader(text), start=1):
+                    # Empty cells fall back to the schema defaults
+                    yield number, {k: v for k, v in row.items() if k and v not in ("", None)}, None
+                return
+
+            for number, line in enumerate(text, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield number, {}, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield number, {}, "Expected a JSON object"
+                    continue
+                yield number, row, None
+        except UnicodeDecodeError:
+            yield number + 1, None, "File is not valid UTF-8"
+        except csv.Error as e:
+            yield number + 1, None, f"Malformed CSV: {e}"
+
+    @staticmethod
+    def iter_row_chunks(stream: BinaryIO, fmt: str) -> Iterator[List[Tuple[int, dict, str]]]:
+        chunk = []
+        for row in ProductImportService.iter_rows(stream, fmt):
+            chunk.append(row)
+            if len(chunk) >= IMPORT_READ_CHUNK_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    async def import_stream(db: AsyncSession, stream: BinaryIO, fmt: str, user: User) -> ProductImportReport:
+        await ProductService._verify_user_authorization(user)
+
+        report = ProductImportReport(total_rows=0, inserted=0, failed=0, errors=[])
+        seen_skus = set()
+        known_categories = set()
+        batch: List[Tuple[int, ProductCreate]] = []
+
+        def fail(number: int, sku, messages: List[str]):
+            report.failed += 1
+            if len(report.errors) < settings.PRODUCT_IMPORT_MAX_REPORTED_ERRORS:
+                report.errors.append(ProductImportError(row=number, sku=sku, errors=messages))
+            else:
+                report.errors_truncated = True
+
+        chunks = iterate_in_threadpool(ProductImportService.iter_row_chunks(stream, fmt))
+        written = False
+        async for number, row, parse_error in (item async for chunk in chunks for item in chunk):
+            if row is None:
+                # the rest of the file is unreadable: reject it outright unless batches are already in
+                if not written:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Row {number}: {parse_error}")
+                report.total_rows += 1
+                fail(number, None, [parse_error, "Import stopped, later rows were not read"])
+                break
+
+            report.total_rows += 1
+            if parse_error:
+                fail(number, None, [parse_error])
+                continue
+
+            try:
+                product = ProductCreate.model_validate(row)
+            except ValidationError as e:
+                fail(number, row.get("sku"), [
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+                ])
+                continue
+
+            if product.sku in seen_skus:
+                fail(number, product.sku, ["Duplicate SKU within the uploaded file"])
+                continue
+            seen_skus.add(product.sku)
+
+            batch.append((number, product))
+            if len(batch) >= settings.PRODUCT_IMPORT_BATCH_SIZE:
+                await ProductImportService._write_batch(db, batch, user, known_categories, report, fail)
+                batch = []
+                written = True
+
+        if batch:
+            await ProductImportService._write_batch(db, batch, user, known_categories, report, fail)
+
+        if report.inserted:
+            await product_cache.invalidate()
+
+        logger.info(f"Product import by user {user.id}: {report.inserted} inserted, {report.failed} failed")
+        return report
+
+    @staticmethod
+    async def _write_batch(db: AsyncSession, batch, user: User, known_categories: set, report: ProductImportReport, fail):
+        skus = [product.sku for _, product in batch]
+        result = await db.execute(select(Product.sku).where(Product.sku.in_(skus)))
+        existing_skus = set(result.scalars().all())
+
+        missing_categories = {product.category_id for _, product in batch} - known_categories
+        if missing_categories:
+            result = await db.execute(select(Category.id).where(Category.id.in_(missing_categories)))
+            known_categories.update(result.scalars().all())
+
+        rows = []
+        numbers = []
+        for number, product in batch:
+            if product.sku in existing_skus:
+                fail(number, product.sku, ["SKU already exists"])
+            elif product.category_id not in known_categories:
+                fail(number, product.sku, [f"category_id: Category {product.category_id} not found"])
+            else:
+                rows.append({**product.model_dump(exclude={"user_id"}), "user_id": user.id})
+                numbers.append((number, product.sku))
+
+        if not rows:
+            return
+
+        try:
+            await db.execute(insert(Product), rows)
+            await db.commit()
+            report.inserted += len(rows)
+        except SQLAlchemyError as e:
+            # A concurrent writer took one of the SKUs; report the whole batch rather than guess
+            await db.rollback()
+            logger.error(f"Product import batch failed: {str(e)}")
+            for number, sku in numbers:
+                fail(number, sku, ["Batch insert failed, retry the import for this row"])
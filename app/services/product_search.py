@@ -0,0 +1,113 @@
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import column, func, literal_column, table
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.product import Product, PRODUCT_SEARCH_DOCUMENT
+from app.models.user import User
+from app.services.product import ProductService
+
+logger = logging.getLogger(__name__)
+
+products_fts = table("products_fts", column("rowid"))
+
+
+class ProductSearchService:
+    """Ranked full-text search over product names and descriptions."""
+
+    @staticmethod
+    def _fts5_query(q: str) -> str:
+        # Quote every term so user input is never parsed as FTS5 syntax; terms are ANDed
+        return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+    @staticmethod
+    def _ranked_query(dialect: str, q: str):
+        """Select matching products with the best matches first."""
+        if dialect == "postgresql":
+            document = literal_column(PRODUCT_SEARCH_DOCUMENT)
+            tsquery = func.websearch_to_tsquery(literal_column("'english'"), q)
+            return (
+                select(Product)
+                .where(document.op("@@")(tsquery))
+                .order_by(func.ts_rank(document, tsquery).desc(), Product.id)
+            )
+
+        if dialect == "sqlite":
+            return (
+                select(Product)
+                .join(products_fts, products_fts.c.rowid == Product.id)
+                .where(literal_column("products_fts").op("MATCH")(ProductSearchService._fts5_query(q)))
+                .order_by(func.bm25(literal_column("products_fts")), Product.id)
+            )
+
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"Product search is not supported on {dialect}"
+        )
+
+    @staticmethod
+    async def search(
+        db: AsyncSession,
+        user: User,
+        q: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        category_id: Optional[int] = None
+    ):
+        """
+        Return one page of ranked matches and the cursor for the next page.
+
+        Relevance is query dependent, so the cursor carries an offset rather
+        than a keyset; the text index keeps each page cheap to compute.
+        """
+        q = q.strip()
+        if not q:
+            # FTS5 rejects an empty MATCH
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Search query must not be blank"
+            )
+
+        offset = decode_cursor(cursor, 1)[0] if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+
+        try:
+            query = ProductSearchService._ranked_query(db.get_bind().dialect.name, q)
+            if category_id is not None:
+                query = query.where(Product.category_id == category_id)
+
+            # Shoppers only see active products; sellers and admins see everything they list
+            if user.role.value == "seller":
+                query = query.where(Product.user_id == user.id)
+            elif user.role.value != "admin":
+                query = query.where(Product.is_active.is_(True))
+
+            result = await db.execute(
+                query.options(selectinload(Product.category)).offset(offset).limit(limit + 1)
+            )
+            products = result.scalars().all()
+
+            next_cursor = None
+            if len(products) > limit:
+                products = products[:limit]
+                next_cursor = encode_cursor([offset + limit])
+
+            return [ProductService.to_response(p) for p in products], next_cursor
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Product search failed: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Product search failed"
+            )
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.utils import utcnow
+from app.db.session import async_session
+from app.models.notification import CampaignStatus, PromoCampaign
+from app.models.user import User
+from app.services.notification import NotificationService
+from app.services.smtp_pool import SMTPConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces calls evenly so that at most `rate` happen per second across all senders."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class PromoCampaignService:
+    @staticmethod
+    async def create(db: AsyncSession, subject: str, message: str, user) -> PromoCampaign:
+        campaign = PromoCampaign(subject=subject, message=message, created_by=user.id)
+        db.add(campaign)
+        await db.commit()
+        await db.refresh(campaign)
+        return campaign
+
+    @staticmethod
+    async def get(db: AsyncSession, campaign_id: int) -> PromoCampaign:
+        campaign = await db.get(PromoCampaign, campaign_id)
+        if not campaign:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
+        return campaign
+
+
+class PromoCampaignRunner:
+    """
+    Sends queued promo campaigns in the background.
+
+    Recipients are read in user id order, one keyset chunk of `batch_size` per
+    short-lived session, so memory stays flat however many users there are and
+    no transaction stays open while mail goes out. Each chunk is fanned out to
+    `concurrency` senders sharing a pool of authenticated SMTP connections under
+    an overall rate limit, then checkpointed (`last_user_id`, counters,
+    heartbeat). The heartbeat is also refreshed every third of the stale window
+    while a chunk is sending, so a slow chunk never looks like a dead worker.
+    A campaign whose worker died is picked up again once its heartbeat is
+    stale and resumes after the last checkpoint, so at most one chunk is sent
+    twice.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        concurrency: int,
+        rate: float,
+        stale_seconds: float,
+        session_factory=async_session,
+        pool_factory: Callable[[int], SMTPConnectionPool] = SMTPConnectionPool.from_settings
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate = rate
+        self.stale_seconds = stale_seconds
+        self.session_factory = session_factory
+        self.pool_factory = pool_factory
+
+    async def claim(self) -> Optional[int]:
+        """Take the oldest queued campaign, or a running one whose worker stopped checkpointing."""
+        async with self.session_factory() as db:
+            now = utcnow()
+            claimable = or_(
+                PromoCampaign.status == CampaignStatus.QUEUED,
+                (PromoCampaign.status == CampaignStatus.RUNNING)
+                & (PromoCampaign.heartbeat_at < now - timedelta(seconds=self.stale_seconds))
+            )
+            campaign_id = (await db.execute(
+                select(PromoCampaign.id).where(claimable).order_by(PromoCampaign.id).limit(1)
+            )).scalar()
+            if campaign_id is None:
+                return None
+
+            # conditional UPDATE: only one worker wins the campaign
+            result = await db.execute(
+                update(PromoCampaign)
+                .where(PromoCampaign.id == campaign_id, claimable)
+                .values(
+                    status=CampaignStatus.RUNNING,
+                    heartbeat_at=now,
+                    started_at=func.coalesce(PromoCampaign.started_at, now)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return campaign_id if result.rowcount == 1 else None
+
+    async def _checkpoint(self, campaign_id: int, **values):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(PromoCampaign)
+                .where(PromoCampaign.id == campaign_id)
+                .values(heartbeat_at=utcnow(), **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _send_chunk(self, pool: SMTPConnectionPool, limiter: RateLimiter, campaign, emails) -> int:
+        """Send to every address in `emails` with bounded concurrency; returns the failure count."""
+        pending = iter(emails)
+        failed = 0
+        heartbeat_every = self.stale_seconds / 3
+        next_heartbeat = time.monotonic() + heartbeat_every
+
+        async def sender():
+            nonlocal failed, next_heartbeat
+            for email in pending:
+                if time.monotonic() >= next_heartbeat:
+                    next_heartbeat = time.monotonic() + heartbeat_every
+                    await self._checkpoint(campaign.id)
+                await limiter.wait()
+                try:
+                    await asyncio.to_thread(
+                        pool.send, settings.EMAIL_FROM, email,
+                        NotificationService.build_email(email, campaign.subject, campaign.message)
+                    )
+                except Exception as e:
+                    failed += 1
+                    logger.warning(f"Campaign {campaign.id}: sending to {email} failed: {str(e)}")
+
+        await asyncio.gather(*(sender() for _ in range(self.concurrency)))
+        return failed
+
+    async def _next_chunk(self, after_user_id: int):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(User.id, User.email)
+                .where(User.is_active.is_(True), User.id > after_user_id)
+                .order_by(User.id)
+                .limit(self.batch_size)
+            )
+            return result.all()
+
+    async def run_campaign(self, campaign_id: int):
+        async with self.session_factory() as db:
+            campaign = await db.get(PromoCampaign, campaign_id)
+            total = campaign.total_recipients
+            if total is None:
+                total = (await db.execute(
+                    select(func.count()).select_from(User).where(User.is_active.is_(True))
+                )).scalar()
+        if campaign.total_recipients is None:
+            await self._checkpoint(campaign_id, total_recipients=total)
+        sent, failed, last_user_id = campaign.sent_count, campaign.failed_count, campaign.last_user_id
+
+        pool = self.pool_factory(self.concurrency)
+        limiter = RateLimiter(self.rate)
+        try:
+            while chunk := await self._next_chunk(last_user_id):
+                chunk_failed = await self._send_chunk(pool, limiter, campaign, [row.email for row in chunk])
+                sent += len(chunk) - chunk_failed
+                failed += chunk_failed
+                last_user_id = chunk[-1].id
+                await self._checkpoint(campaign_id, sent_count=sent, failed_count=failed, last_user_id=last_user_id)
+
+            await self._checkpoint(campaign_id, status=CampaignStatus.COMPLETED, finished_at=utcnow())
+            logger.info(f"Campaign {campaign_id} completed: {sent} sent, {failed} failed")
+        except Exception as e:
+            logger.error(f"Campaign {campaign_id} failed: {str(e)}", exc_info=True)
+            await self._checkpoint(campaign_id, status=CampaignStatus.FAILED, last_error=str(e), finished_at=utcnow())
+        finally:
+            await asyncio.to_thread(pool.close)
+
+    async def run(self, interval: float):
+        """Poll for campaigns forever; started from the application lifespan."""
+        while True:
+            try:
+                campaign_id = await self.claim()
+                if campaign_id is not None:
+                    await self.run_campaign(campaign_id)
+                    continue
+            except Exception as e:
+                logger.error(f"Promo campaign worker pass failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(interval)
+
+
+promo_campaign_runner = PromoCampaignRunner(
+    batch_size=settings.PROMO_BATCH_SIZE,
+    concurrency=settings.PROMO_SEND_CONCURRENCY,
+    rate=settings.PROMO_RATE_PER_SECOND,
+    stale_seconds=settings.PROMO_STALE_SECONDS,
+)
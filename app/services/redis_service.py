@@ -2,16 +2,157 @@ import redis.asyncio as redis
 import json
 import logging
 import backoff
-from typing import Any, Union
+from typing import Any, Dict, Optional, Tuple, Union
 from pydantic import BaseModel
 import os
+import time
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
+
+# Decrement the n counters KEYS[1..n] by the matching ARGV amounts, or none of them.
+# A success also records each amount under the reservation token ARGV[n+1] in the
+# in-flight hashes KEYS[n+1..2n] as "amount:unix time", and keeps those hashes for
+# ARGV[n+2] seconds. Returns {1, remaining...} on success, {0, short key indexes...}
+# when a counter is too low and {-1, missing key indexes...} when a counter has not
+# been seeded.
+RESERVE_COUNTERS_LUA = """
+local n = #KEYS / 2
+local missing, short = {}, {}
+for i = 1, n do
+    local value = redis.call('GET', KEYS[i])
+    if not value then
+        table.insert(missing, i)
+    elseif tonumber(value) < tonumber(ARGV[i]) then
+        table.insert(short, i)
+    end
+end
+if #missing > 0 then
+    table.insert(missing, 1, -1)
+    return missing
+end
+if #short > 0 then
+    table.insert(short, 1, 0)
+    return short
+end
+local now = redis.call('TIME')[1]
+local remaining = {1}
+for i = 1, n do
+    table.insert(remaining, redis.call('DECRBY', KEYS[i], ARGV[i]))
+    redis.call('HSET', KEYS[n + i], ARGV[n + 1], ARGV[i] .. ':' .. now)
+    redis.call('EXPIRE', KEYS[n + i], ARGV[n + 2])
+end
+return remaining
+"""
+
+# Undo a reservation: drop token ARGV[n+1] from the in-flight hashes KEYS[n+1..2n]
+# and add the ARGV amounts back to the counters KEYS[1..n]. A counter only gets its
+# amount back if the token was still held, since a counter reseeded after the token
+# was dropped never had it subtracted.
+RELEASE_HELD_LUA = """
+local n = #KEYS / 2
+for i = 1, n do
+    if redis.call('HDEL', KEYS[n + i], ARGV[n + 1]) == 1 and redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[i])
+    end
+end
+return n
+"""
+
+# Sum the amounts held in each in-flight hash in KEYS, skipping entries older than
+# ARGV[1] seconds (left behind by a process that died mid-checkout).
+HELD_SUMS_LUA = """
+local now = tonumber(redis.call('TIME')[1])
+local sums = {}
+for i, key in ipairs(KEYS) do
+    local sum = 0
+    for _, entry in ipairs(redis.call('HVALS', key)) do
+        local amount, at = string.match(entry, '(%d+):(%d+)')
+        if now - tonumber(at) < tonumber(ARGV[1]) then
+            sum = sum + tonumber(amount)
+        end
+    end
+    table.insert(sums, sum)
+end
+return sums
+"""
+
+# Add ARGV amounts to the counters in KEYS that exist; missing counters are left
+# for the next seed, which reads the amount from the database.
+INCR_EXISTING_LUA = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBY', key, ARGV[i])
+    end
+end
+return #KEYS
+"""
+
+# Apply a write to the hash KEYS[1] only if it is already loaded, then add ARGV[2]
+# to the set KEYS[2] and refresh the hash TTL (ARGV[1]). ARGV[3] is the mode:
+# "incr" adds amounts, "set" replaces them and "del" removes fields (amounts
+# ignored); fields that drop to 0 or below are removed. "clear" keeps only the
+# "_" marker field. Returns -1 when the hash is missing, otherwise the new values.
+HASH_WRITE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local mode, values = ARGV[3], {}
+if mode == 'clear' then
+    redis.call('DEL', KEYS[1])
+    redis.call('HSET', KEYS[1], '_', 1)
+end
+for i = 4, #ARGV, 2 do
+    local field, amount, value = ARGV[i], tonumber(ARGV[i + 1]), 0
+    if mode == 'incr' then
+        value = redis.call('HINCRBY', KEYS[1], field, amount)
+    elseif mode == 'set' then
+        value = amount
+    end
+    if value > 0 then
+        if mode == 'set' then
+            redis.call('HSET', KEYS[1], field, value)
+        end
+    else
+        redis.call('HDEL', KEYS[1], field)
+        value = 0
+    end
+    table.insert(values, value)
+end
+redis.call('SADD', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return values
+"""
+
+# Fill the hash KEYS[1] from ARGV field/value pairs unless it already exists,
+# with TTL ARGV[1]. Returns 1 if it was loaded, 0 if another caller got there first.
+HASH_LOAD_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Fill the set KEYS[1] with the ARGV[2..] members unless it already exists, with
+# TTL ARGV[1]. Returns 1 if it was loaded, 0 if another caller got there first.
+SET_LOAD_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('SADD', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
  
 class RedisService:
     def __init__(self):
         self._redis = None
         self.redis_url = os.getenv("REDIS_URL")
+        self.reconnect_cooldown = settings.REDIS_RECONNECT_COOLDOWN_SECONDS
+        self._retry_at = 0.0
 
     @backoff.on_exception(backoff.expo, (redis.ConnectionError, redis.TimeoutError), max_tries=3)
     async def connect(self):
@@ -32,14 +173,17 @@ class RedisService:
         logger.info("Successfully connected to Redis")
 
     async def _ensure_connection(self):
-        """Ensure Redis connection exists."""
-        if self._redis is None:
+        """Ensure Redis connection exists, without retrying on every call while Redis is down."""
+        if self._redis is None and time.monotonic() >= self._retry_at:
             try:
                 await self.connect()
             except Exception as e:
                 logger.error(f"Failed to connect to Redis: {str(e)}")
                 self._redis = None
 
+            if self._redis is None:
+                self._retry_at = time.monotonic() + self.reconnect_cooldown
+
     async def set(self, key: str, value: Union[BaseModel, list, dict], expire: int = 3600):
         """Set a value in Redis with proper serialization."""
         try:
@@ -50,10 +194,10 @@ class RedisService:
 
             # Serialize the value
             if isinstance(value, BaseModel):
-                serialized_value = value.model_dump()
+                serialized_value = value.model_dump(mode="json")
             elif isinstance(value, list):
                 serialized_value = [
-                    item.model_dump() if isinstance(item, BaseModel) else item
+                    item.model_dump(mode="json") if isinstance(item, BaseModel) else item
                     for item in value
                 ]
             else:
@@ -64,6 +208,19 @@ class RedisService:
         except Exception as e:
             logger.error(f"Error setting Redis key {key}: {str(e)}")
 
+    async def set_nx(self, key: str, value: Union[list, dict], expire: int) -> Optional[bool]:
+        """Set a JSON value only if the key is absent; None when Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping conditional set")
+                return None
+
+            return bool(await self._redis.set(key, json.dumps(value), ex=expire, nx=True))
+        except Exception as e:
+            logger.error(f"Error setting Redis key {key}: {str(e)}")
+            return None
+
     async def get(self, key: str) -> Any:
         """Get and deserialize a value from Redis."""
         try:
@@ -78,6 +235,286 @@ class RedisService:
             logger.error(f"Error getting Redis key {key}: {str(e)}")
             return None
 
+    async def delete(self, *keys: str):
+        """Delete one or more keys from Redis."""
+        if not keys:
+            return
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping cache delete")
+                return
+
+            await self._redis.delete(*keys)
+            logger.debug(f"Deleted Redis keys: {keys}")
+        except Exception as e:
+            logger.error(f"Error deleting Redis keys {keys}: {str(e)}")
+
+    async def incr_many(self, *keys: str):
+        """Increment several counters in one round trip, e.g. to bump cache versions."""
+        if not keys:
+            return
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping counter increment")
+                return
+
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.incr(key)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error incrementing Redis keys {keys}: {str(e)}")
+
+    async def reserve_counters(
+        self, amounts: Dict[str, int], held: Dict[str, str], token: str, hold: int
+    ) -> Optional[Tuple[int, list]]:
+        """
+        Atomically decrement several counters, all or nothing, recording the amounts
+        under `token` in the in-flight hash `held[counter]` of each (RESERVE_COUNTERS_LUA).
+
+        Returns (1, remaining values), (0, short keys), (-1, unseeded keys), or None
+        when Redis is unavailable.
+        """
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - cannot reserve counters")
+                return None
+
+            keys = list(amounts)
+            reply = await self._redis.register_script(RESERVE_COUNTERS_LUA)(
+                keys=[*keys, *(held[key] for key in keys)], args=[*(amounts[key] for key in keys), token, hold]
+            )
+            outcome, values = int(reply[0]), [int(value) for value in reply[1:]]
+            if outcome == 1:
+                return outcome, values
+            return outcome, [keys[index - 1] for index in values]
+        except Exception as e:
+            logger.error(f"Error reserving Redis counters {list(amounts)}: {str(e)}")
+            return None
+
+    async def release_held(self, amounts: Dict[str, int], held: Dict[str, str], token: str) -> bool:
+        """Undo a reserve_counters() call (RELEASE_HELD_LUA); False if Redis is unavailable."""
+        if not amounts:
+            return True
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping counter release")
+                return False
+
+            keys = list(amounts)
+            await self._redis.register_script(RELEASE_HELD_LUA)(
+                keys=[*keys, *(held[key] for key in keys)], args=[*(amounts[key] for key in keys), token]
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error releasing Redis counters {list(amounts)}: {str(e)}")
+            return False
+
+    async def held_sums(self, keys: list, hold: int) -> Optional[list]:
+        """Total amount held in each in-flight hash (HELD_SUMS_LUA); None if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - cannot read held amounts")
+                return None
+
+            return [int(value) for value in await self._redis.register_script(HELD_SUMS_LUA)(keys=keys, args=[hold])]
+        except Exception as e:
+            logger.error(f"Error reading Redis held amounts {keys}: {str(e)}")
+            return None
+
+    async def hash_delete(self, keys: list, field: str) -> bool:
+        """HDEL `field` from several hashes in one round trip; False if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping hash delete")
+                return False
+
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hdel(key, field)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting {field} from Redis hashes {keys}: {str(e)}")
+            return False
+
+    async def get_counters(self, keys: list) -> Optional[list]:
+        """MGET integer counters, None for missing ones; None if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping counter get")
+                return None
+
+            return [None if value is None else int(value) for value in await self._redis.mget(keys)]
+        except Exception as e:
+            logger.error(f"Error getting Redis counters {keys}: {str(e)}")
+            return None
+
+    async def incr_existing(self, amounts: Dict[str, int]) -> bool:
+        """Add amounts to the counters that exist (INCR_EXISTING_LUA); False if Redis is unavailable."""
+        if not amounts:
+            return True
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping counter release")
+                return False
+
+            keys = list(amounts)
+            await self._redis.register_script(INCR_EXISTING_LUA)(keys=keys, args=[amounts[key] for key in keys])
+            return True
+        except Exception as e:
+            logger.error(f"Error releasing Redis counters {list(amounts)}: {str(e)}")
+            return False
+
+    async def set_many_nx(self, values: Dict[str, int]) -> bool:
+        """SET NX each key in one round trip, keeping any value already present."""
+        if not values:
+            return True
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping counter seed")
+                return False
+
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(key, value, nx=True)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error seeding Redis keys {list(values)}: {str(e)}")
+            return False
+
+    async def hash_write(
+        self, key: str, dirty_set: str, member: str, mode: str, amounts: Dict[str, int], expire: int
+    ) -> Union[list, bool, None]:
+        """
+        Apply an "incr", "set", "del" or "clear" write to a loaded hash and mark `member` dirty
+        (HASH_WRITE_LUA). Returns the new values, [] for "clear"/"del", False when the hash
+        is not loaded, or None when Redis is unavailable.
+        """
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - cannot write hash")
+                return None
+
+            args = [expire, member, mode]
+            for field, amount in amounts.items():
+                args += [field, amount]
+            reply = await self._redis.register_script(HASH_WRITE_LUA)(keys=[key, dirty_set], args=args)
+            if reply == -1:
+                return False
+            return [int(value) for value in reply] if mode in ("incr", "set") else []
+        except Exception as e:
+            logger.error(f"Error writing Redis hash {key}: {str(e)}")
+            return None
+
+    async def hash_load(self, key: str, values: Dict[str, int], expire: int) -> bool:
+        """Fill a hash unless it already exists (HASH_LOAD_LUA); False if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - cannot load hash")
+                return False
+
+            args = [expire]
+            for field, value in values.items():
+                args += [field, value]
+            await self._redis.register_script(HASH_LOAD_LUA)(keys=[key], args=args)
+            return True
+        except Exception as e:
+            logger.error(f"Error loading Redis hash {key}: {str(e)}")
+            return False
+
+    async def hash_get_many(self, keys: list, expire: Optional[int] = None) -> Optional[list]:
+        """HGETALL several hashes in one round trip, refreshing their TTL if `expire` is set; None if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping hash get")
+                return None
+
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hgetall(key)
+                    if expire:
+                        pipe.expire(key, expire)
+                replies = await pipe.execute()
+            return replies[::2] if expire else replies
+        except Exception as e:
+            logger.error(f"Error getting Redis hashes {keys}: {str(e)}")
+            return None
+
+    async def set_pop(self, key: str, count: int) -> Optional[list]:
+        """Remove and return up to `count` members of a set; None if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping set pop")
+                return None
+
+            return await self._redis.spop(key, count) or []
+        except Exception as e:
+            logger.error(f"Error popping Redis set {key}: {str(e)}")
+            return None
+
+    async def set_add(self, key: str, *members: str) -> bool:
+        """Add members to a set; False if Redis is unavailable."""
+        if not members:
+            return True
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping set add")
+                return False
+
+            await self._redis.sadd(key, *members)
+            return True
+        except Exception as e:
+            logger.error(f"Error adding to Redis set {key}: {str(e)}")
+            return False
+
+    async def set_contains(self, key: str, members: list, expire: Optional[int] = None) -> Optional[list]:
+        """SMISMEMBER in one round trip, refreshing the TTL if `expire` is set; None if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - skipping set lookup")
+                return None
+
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.smismember(key, members)
+                if expire:
+                    pipe.expire(key, expire)
+                replies = await pipe.execute()
+            return [bool(flag) for flag in replies[0]]
+        except Exception as e:
+            logger.error(f"Error looking up Redis set {key}: {str(e)}")
+            return None
+
+    async def set_load(self, key: str, members: list, expire: int) -> bool:
+        """Fill a set unless it already exists (SET_LOAD_LUA); False if Redis is unavailable."""
+        try:
+            await self._ensure_connection()
+            if self._redis is None:
+                logger.warning("Redis unavailable - cannot load set")
+                return False
+
+            await self._redis.register_script(SET_LOAD_LUA)(keys=[key], args=[expire, *members])
+            return True
+        except Exception as e:
+            logger.error(f"Error loading Redis set {key}: {str(e)}")
+            return False
+
     async def close(self):
         """Close the Redis connection."""
         if self._redis is not None:
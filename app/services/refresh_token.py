@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.utils import generate_uuid
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshTokenService:
+    """
+    Rotating refresh tokens.
+
+    Only an HMAC of each token is stored, so exchanging one costs a hash and a
+    single indexed lookup instead of a bcrypt verification. Every exchange
+    revokes the presented token and issues a new one in the same family;
+    presenting an already rotated token revokes the whole family.
+    """
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hmac.new(settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _as_utc(value: datetime) -> datetime:
+        # SQLite hands back naive datetimes; everything here is stored in UTC
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    def _invalid_token() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+
+    @staticmethod
+    async def issue(db: AsyncSession, user: User, family_id: str = None) -> str:
+        token = secrets.token_urlsafe(32)
+        db.add(RefreshToken(
+            user_id=user.id,
+            token_hash=RefreshTokenService._hash(token),
+            family_id=family_id or generate_uuid(),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        ))
+        await db.commit()
+        return token
+
+    @staticmethod
+    async def rotate(db: AsyncSession, token: str):
+        """Exchange a refresh token for a new one; returns the owning user and the new token."""
+        result = await db.execute(
+            select(RefreshToken, User)
+            .join(User, User.id == RefreshToken.user_id)
+            .where(RefreshToken.token_hash == RefreshTokenService._hash(token))
+        )
+        row = result.first()
+        if not row:
+            raise RefreshTokenService._invalid_token()
+
+        stored, user = row
+        now = datetime.now(timezone.utc)
+
+        if stored.revoked_at is not None:
+            logger.warning(f"Refresh token reuse detected for user {user.id}, revoking family {stored.family_id}")
+            await RefreshTokenService.revoke_family(db, stored.family_id)
+            raise RefreshTokenService._invalid_token()
+
+        if RefreshTokenService._as_utc(stored.expires_at) <= now or not user.is_active:
+            raise RefreshTokenService._invalid_token()
+
+        # Conditional revoke so two concurrent exchanges of one token cannot both succeed
+        revoked = await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.id == stored.id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+        )
+        if revoked.rowcount != 1:
+            await db.rollback()
+            raise RefreshTokenService._invalid_token()
+
+        new_token = await RefreshTokenService.issue(db, user, family_id=stored.family_id)
+        return user, new_token
+
+    @staticmethod
+    async def revoke(db: AsyncSession, token: str):
+        result = await db.execute(
+            select(RefreshToken.family_id).where(RefreshToken.token_hash == RefreshTokenService._hash(token))
+        )
+        family_id = result.scalar()
+        if family_id:
+            await RefreshTokenService.revoke_family(db, family_id)
+
+    @staticmethod
+    async def revoke_family(db: AsyncSession, family_id: str):
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
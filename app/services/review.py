@@ -0,0 +1,216 @@
+import logging
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, literal_column, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.product import Product
+from app.models.review import Review
+from app.models.user import User
+from app.core.pagination import encode_cursor, decode_cursor, parse_cursor_datetime, keyset_after
+from app.schemas.review import ReviewCreate, ReviewResponse, ReviewUpdate
+from app.services.product_cache import product_cache
+from app.services.review_cache import review_cache
+
+logger = logging.getLogger(__name__)
+
+RATING_STARS = range(1, 6)
+RATING_COLUMNS = ["rating_count", "rating_sum", *(f"rating_{stars}" for stars in RATING_STARS)]
+
+# sort key accepted by GET /reviews/products/{id} -> (column, descending)
+REVIEW_SORTS = {
+    "-created_at": (Review.created_at, True),
+    "created_at": (Review.created_at, False),
+    "-rating": (Review.rating, True),
+    "rating": (Review.rating, False),
+}
+
+
+class ReviewService:
+    """
+    Review writes, each in one transaction with an increment of the product's
+    rating stats (count, sum and per-star histogram). The increments are
+    `column = column + delta` in SQL, so concurrent reviews of one product
+    never overwrite each other's counts.
+    """
+
+    @staticmethod
+    async def _apply_rating(db: AsyncSession, product_id: int, added: Optional[int] = None, removed: Optional[int] = None) -> bool:
+        """Move the product's stats from rating `removed` to `added` (either may be None); False if there is no such product."""
+        deltas = Counter()
+        for rating, sign in ((added, 1), (removed, -1)):
+            if rating is not None:
+                deltas["rating_count"] += sign
+                deltas["rating_sum"] += sign * rating
+                deltas[f"rating_{rating}"] += sign
+
+        values = {name: getattr(Product, name) + delta for name, delta in deltas.items() if delta}
+        if not values:
+            return True
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(**values, updated_at=Product.updated_at)  # a review is not a product edit
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    @staticmethod
+    async def _get_own(db: AsyncSession, review_id: int, user: User, action: str) -> Review:
+        # lock the review so a concurrent edit can't change the rating we are about to subtract
+        result = await db.execute(select(Review).where(Review.id == review_id).with_for_update())
+        review = result.scalars().first()
+        if not review:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+        if review.user_id != user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"You are not authorized to {action} this review")
+        return review
+
+    @staticmethod
+    async def _invalidate(product_id: int):
+        await review_cache.invalidate(product_id)
+        await product_cache.invalidate([product_id])
+
+    @staticmethod
+    async def create(db: AsyncSession, data: ReviewCreate, user: User) -> Review:
+        review = Review(**data.model_dump(), user_id=user.id)
+        try:
+            if not await ReviewService._apply_rating(db, review.product_id, added=review.rating):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+            db.add(review)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await db.refresh(review)
+        await ReviewService._invalidate(review.product_id)
+        return review
+
+    @staticmethod
+    async def update(db: AsyncSession, review_id: int, data: ReviewUpdate, user: User) -> Review:
+        try:
+            review = await ReviewService._get_own(db, review_id, user, "update")
+            if data.rating != review.rating:
+                await ReviewService._apply_rating(db, review.product_id, added=data.rating, removed=review.rating)
+            review.rating = data.rating
+            review.comment = data.comment
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await db.refresh(review)
+        await ReviewService._invalidate(review.product_id)
+        return review
+
+    @staticmethod
+    async def delete(db: AsyncSession, review_id: int, user: User):
+        try:
+            review = await ReviewService._get_own(db, review_id, user, "delete")
+            await ReviewService._apply_rating(db, review.product_id, removed=review.rating)
+            await db.delete(review)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await ReviewService._invalidate(review.product_id)
+
+    @staticmethod
+    async def list_for_product(
+        db: AsyncSession,
+        product_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        sort: str = "-created_at"
+    ) -> Tuple[List[ReviewResponse], Optional[str]]:
+        """
+        One page of a product's reviews and the cursor for the next page, keyset-paginated
+        on (sort column, id) within the product. First pages are served from Redis.
+        """
+        cache_key = None
+        if not cursor:
+            cached, cache_key = await review_cache.get_first_page(product_id, sort, limit)
+            if cached is not None:
+                return [ReviewResponse.model_validate(r) for r in cached["data"]], cached["next_cursor"]
+
+        column, descending = REVIEW_SORTS[sort]
+        query = select(Review).where(Review.product_id == product_id)
+        if cursor:
+            last_value, last_id = decode_cursor(cursor, 2)
+            if column.key == "created_at":
+                last_value = parse_cursor_datetime(last_value)
+            query = query.where(keyset_after((column, Review.id), (last_value, last_id), descending))
+
+        order = (column.desc(), Review.id.desc()) if descending else (column.asc(), Review.id.asc())
+        result = await db.execute(query.order_by(*order).limit(limit + 1))
+        reviews = result.scalars().all()
+
+        next_cursor = None
+        if len(reviews) > limit:
+            reviews = reviews[:limit]
+            last = reviews[-1]
+            next_cursor = encode_cursor([getattr(last, column.key), last.id])
+
+        page = [ReviewResponse.model_validate(review) for review in reviews]
+        if cache_key:
+            await review_cache.set_first_page(cache_key, {
+                "data": [r.model_dump(mode="json") for r in page],
+                "next_cursor": next_cursor
+            })
+        return page, next_cursor
+
+    @staticmethod
+    async def recompute_ratings(db: AsyncSession, product_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Recompute rating stats from the reviews table with one GROUP BY, for
+        `product_ids` or every product. Only rows that had drifted are written;
+        returns their ids.
+        """
+        product_ids = list(product_ids) if product_ids is not None else None
+
+        reviews = select(Review.product_id).where(Review.product_id.is_not(None), Review.rating.between(1, 5))
+        if product_ids is not None:
+            reviews = reviews.where(Review.product_id.in_(product_ids))
+        stats = (
+            reviews
+            .add_columns(
+                func.count().label("rating_count"),
+                func.sum(Review.rating).label("rating_sum"),
+                *(func.sum(case((Review.rating == stars, 1), else_=0)).label(f"rating_{stars}") for stars in RATING_STARS)
+            )
+            .group_by(Review.product_id)
+            .subquery()
+        )
+
+        repaired = []
+        # products with reviews: copy the aggregates over where they differ
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == stats.c.product_id)
+            .where(or_(*(getattr(Product, name) != stats.c[name] for name in RATING_COLUMNS)))
+            .values(**{name: stats.c[name] for name in RATING_COLUMNS}, updated_at=Product.updated_at)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        repaired.extend(result.scalars().all())
+
+        # products without reviews: back to zero
+        reset = (
+            update(Product)
+            .where(Product.id.not_in(reviews.with_only_columns(Review.product_id)))
+            .where(or_(*(getattr(Product, name) != 0 for name in RATING_COLUMNS)))
+            .values(**dict.fromkeys(RATING_COLUMNS, literal_column("0")), updated_at=Product.updated_at)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        if product_ids is not None:
+            reset = reset.where(Product.id.in_(product_ids))
+        result = await db.execute(reset)
+        repaired.extend(result.scalars().all())
+
+        await db.commit()
+        if repaired:
+            await product_cache.invalidate(repaired)
+        return repaired
@@ -0,0 +1,38 @@
+import logging
+from typing import Any, Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewCache:
+    """
+    Redis cache for the first page of a product's reviews, which is nearly all
+    review read traffic; deeper pages go to the database.
+
+    Like ProductCache, keys embed a per-product version that review writes bump
+    after commit, so a page filled by a read racing a write is never served.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _version_key(product_id: int) -> str:
+        return f"reviews:{product_id}:version"
+
+    async def get_first_page(self, product_id: int, sort: str, limit: int) -> Tuple[Optional[dict], str]:
+        version = int(await redis_service.get(self._version_key(product_id)) or 0)
+        key = f"reviews:{product_id}:v{version}:{sort}:{limit}"
+        return await redis_service.get(key), key
+
+    async def set_first_page(self, key: str, data: Any):
+        await redis_service.set(key, data, expire=self.ttl)
+
+    async def invalidate(self, product_id: int):
+        await redis_service.incr_many(self._version_key(product_id))
+
+
+review_cache = ReviewCache(ttl=settings.REVIEW_CACHE_TTL_SECONDS)
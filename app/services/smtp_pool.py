@@ -0,0 +1,101 @@
+import logging
+import queue
+import smtplib
+import threading
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Thread-safe pool of authenticated SMTP connections.
+
+    Blocking, like smtplib itself: call `send` from worker threads. At most `size`
+    connections exist at once; idle ones are reused, so STARTTLS and login happen
+    once per connection instead of once per message. A connection the server
+    dropped is replaced and the message retried once on the new one.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        use_tls: bool,
+        size: int,
+        timeout: float = 30
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    @classmethod
+    def from_settings(cls, size: int) -> "SMTPConnectionPool":
+        return cls(
+            settings.SMTP_SERVER, settings.SMTP_PORT, settings.SMTP_USERNAME, settings.SMTP_PASSWORD,
+            settings.SMTP_USE_TLS, size
+        )
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    def send(self, sender: str, recipient: str, message: str):
+        with self._slots:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                server = self._connect()
+
+            try:
+                server.sendmail(sender, [recipient], message)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+                # stale connection: replace it and retry once
+                server.close()
+                server = self._connect()
+                try:
+                    server.sendmail(sender, [recipient], message)
+                except Exception:
+                    server.close()
+                    raise
+            except smtplib.SMTPException:
+                # the server rejected this message; the connection is still usable
+                try:
+                    server.rset()
+                    self._idle.put(server)
+                except Exception:
+                    server.close()
+                raise
+            self._idle.put(server)
+
+    def close(self):
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                server.quit()
+            except Exception:
+                server.close()
@@ -0,0 +1,61 @@
+import logging
+import time
+
+from app.core.security import access_token_lifetime
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class TokenDenylist:
+    """
+    Revocation list for stateless access tokens.
+
+    Every token carries the user's `token_version` in its `ver` claim. Revoking a
+    user's tokens records the lowest version still accepted for that user id, in
+    Redis so every worker sees it and in process memory as a fallback when Redis
+    is unavailable. Entries only need to outlive the tokens they reject.
+    """
+
+    def __init__(self):
+        self._local: dict[int, tuple[int, float]] = {}
+
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"auth:min_token_version:{user_id}"
+
+    @staticmethod
+    def _ttl_seconds() -> int:
+        return int(access_token_lifetime().total_seconds())
+
+    def _local_min_version(self, user_id: int) -> int:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return 0
+
+        version, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._local[user_id]
+            return 0
+        return version
+
+    async def revoke_before(self, user_id: int, min_version: int):
+        """Reject every token for `user_id` whose version is lower than `min_version`."""
+        ttl = self._ttl_seconds()
+        self._local[user_id] = (
+            max(min_version, self._local_min_version(user_id)),
+            time.monotonic() + ttl,
+        )
+        await redis_service.set(self._redis_key(user_id), min_version, expire=ttl)
+        logger.info(f"Revoked tokens below version {min_version} for user {user_id}")
+
+    async def is_revoked(self, user_id: int, version: int) -> bool:
+        min_version = self._local_min_version(user_id)
+        if version < min_version:
+            return True
+
+        shared = await redis_service.get(self._redis_key(user_id))
+        return shared is not None and version < int(shared)
+
+
+token_denylist = TokenDenylist()
@@ -0,0 +1,113 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User, UserRole
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    Cache in front of the `User` lookup done by `deps.get_current_user`.
+
+    FastAPI already resolves `get_current_user` once per request, so this adds
+    the process-level tier: a TTL-bounded, size-capped LRU keyed by email, with
+    Redis as an optional shared tier behind it. Entries hold plain column values
+    (never the password hash) and are re-attached to the caller's session, so
+    handlers still get a regular `User` they can modify and commit.
+
+    Writes that change a user row must call `invalidate`. Other workers drop
+    their local copy when the TTL runs out, so keep the TTL short.
+    """
+
+    _FIELDS = ("id", "email", "name", "phone_number", "is_active", "role", "token_version", "created_at", "updated_at")
+    _DATETIME_FIELDS = ("created_at", "updated_at")
+
+    def __init__(self, max_size: int, ttl: int, use_redis: bool):
+        self._local = TTLCache(max_size=max_size, ttl=ttl)
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.redis_hits = 0
+        self.db_queries = 0
+
+    @staticmethod
+    def _redis_key(email: str) -> str:
+        return f"user:email:{email}"
+
+    @classmethod
+    def _serialize(cls, user: User) -> dict:
+        data = {field: getattr(user, field) for field in cls._FIELDS}
+        data["role"] = user.role.value if user.role else None
+        for field in cls._DATETIME_FIELDS:
+            data[field] = data[field].isoformat() if data[field] else None
+        return data
+
+    @classmethod
+    def _deserialize(cls, data: dict) -> User:
+        values = dict(data)
+        values["role"] = UserRole(values["role"]) if values["role"] else None
+        for field in cls._DATETIME_FIELDS:
+            values[field] = datetime.fromisoformat(values[field]) if values[field] else None
+        return User(**values)
+
+    async def get_user(self, db: AsyncSession, email: str) -> Optional[User]:
+        data = self._local.get(email)
+
+        if data is None and self.use_redis:
+            data = await redis_service.get(self._redis_key(email))
+            if data is not None:
+                self.redis_hits += 1
+                self._local.set(email, data)
+
+        if data is None:
+            self.db_queries += 1
+            result = await db.execute(select(User).where(User.email == email))
+            user = result.scalars().first()
+            if user:
+                await self.store(user)
+            return user
+
+        # Attach a fresh instance to this request's session without querying
+        user = self._deserialize(data)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    async def store(self, user: User):
+        data = self._serialize(user)
+        self._local.set(user.email, data)
+        if self.use_redis:
+            await redis_service.set(self._redis_key(user.email), data, expire=self.ttl)
+
+    async def invalidate(self, email: str):
+        self._local.pop(email)
+        if self.use_redis:
+            await redis_service.delete(self._redis_key(email))
+
+    def clear(self):
+        self._local.clear()
+
+    def stats(self) -> dict:
+        local = self._local.stats()
+        lookups = local["hits"] + self.redis_hits + self.db_queries
+        return {
+            **local,
+            "redis_enabled": self.use_redis,
+            "redis_hits": self.redis_hits,
+            "db_queries": self.db_queries,
+            "hit_ratio": round((lookups - self.db_queries) / lookups, 4) if lookups else None,
+        }
+
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    use_redis=settings.USER_CACHE_USE_REDIS,
+)
@@ -0,0 +1,138 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.product import Product
+from app.models.wishlist import Wishlist
+from app.schemas.wishlist import WishlistProduct
+from app.services.hot_inventory import hot_inventory
+from app.services.redis_service import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class WishlistMembership:
+    """
+    Per-user Redis set of wishlisted product ids, for answering "is this product
+    hearted?" for a whole listing page at once.
+
+    A missing set is rebuilt from the `wishlist` table on first lookup. Like
+    ProductCache, set keys embed a per-user version, `wishlist:{user_id}:v{n}`:
+    adds and removes bump it after commit and delete the set it replaced, so a
+    set rebuilt from a read that raced the write lands under a version nobody
+    reads again. The "_" member marks a loaded set, which keeps an empty
+    wishlist a hit and lets one SMISMEMBER both check existence and answer.
+    Without Redis, lookups fall back to one IN query.
+    """
+
+    LOADED_MEMBER = "_"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"wishlist:{user_id}:version"
+
+    @staticmethod
+    def _key(user_id: int, version: int) -> str:
+        return f"wishlist:{user_id}:v{version}"
+
+    async def _version(self, user_id: int) -> int:
+        return int(await redis_service.get(self._version_key(user_id)) or 0)
+
+    @staticmethod
+    async def _from_db(db: AsyncSession, user_id: int, product_ids: Iterable[int] = None) -> set:
+        query = select(Wishlist.product_id).where(Wishlist.user_id == user_id)
+        if product_ids is not None:
+            query = query.where(Wishlist.product_id.in_(list(product_ids)))
+        return set((await db.execute(query)).scalars().all())
+
+    async def contains(self, db: AsyncSession, user_id: int, product_ids: List[int]) -> Dict[int, bool]:
+        """{product_id: wishlisted} for every id in `product_ids`."""
+        key = self._key(user_id, await self._version(user_id))
+        flags = await redis_service.set_contains(key, [self.LOADED_MEMBER, *map(str, product_ids)], expire=self.ttl)
+        if flags is None:
+            wishlisted = await self._from_db(db, user_id, product_ids)
+        elif flags[0]:
+            return dict(zip(product_ids, flags[1:]))
+        else:
+            wishlisted = await self._from_db(db, user_id)
+            await redis_service.set_load(key, [self.LOADED_MEMBER, *map(str, wishlisted)], self.ttl)
+        return {product_id: product_id in wishlisted for product_id in product_ids}
+
+    async def invalidate(self, user_id: int):
+        """Call after a wishlist row is added or deleted and committed."""
+        version = await self._version(user_id)
+        await redis_service.incr_many(self._version_key(user_id))
+        await redis_service.delete(self._key(user_id, version))
+
+
+class WishlistService:
+    @staticmethod
+    async def add(db: AsyncSession, user_id: int, product_id: int) -> Tuple[Wishlist, bool]:
+        """Add a product to the wishlist if it isn't there yet; returns (entry, whether it was added)."""
+        insert_ = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        result = await db.execute(
+            insert_(Wishlist)
+            .values(user_id=user_id, product_id=product_id)
+            .on_conflict_do_nothing(index_elements=[Wishlist.user_id, Wishlist.product_id])
+        )
+        added = result.rowcount > 0
+        entry = (await db.execute(
+            select(Wishlist).where(Wishlist.user_id == user_id, Wishlist.product_id == product_id)
+        )).scalar_one()
+        await db.commit()
+        if added:
+            await wishlist_membership.invalidate(user_id)
+        return entry, added
+
+    @staticmethod
+    async def list_items(
+        db: AsyncSession, user_id: int, limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[WishlistProduct], Optional[str]]:
+        """
+        One page of the wishlist, newest first, with the product fields a listing needs,
+        from a single joined query keyset-paginated on the entry id. Flash-sale products
+        are in stock according to their hot-inventory counters.
+        """
+        query = (
+            select(
+                Wishlist.id, Wishlist.product_id, Wishlist.created_at.label("added_at"),
+                Product.name, Product.price, Product.image_url,
+                and_(Product.is_active.is_(True), Product.stock_quantity > 0).label("in_stock"),
+                Product.is_active, Product.hot_inventory
+            )
+            .join(Product, Product.id == Wishlist.product_id)
+            .where(Wishlist.user_id == user_id)
+        )
+        if cursor:
+            last_id, = decode_cursor(cursor, 1)
+            query = query.where(Wishlist.id < last_id)
+
+        result = await db.execute(query.order_by(Wishlist.id.desc()).limit(limit + 1))
+        rows = result.all()
+        # flash-sale products sell from their Redis counters, not products.stock_quantity
+        hot = await hot_inventory.available(
+            db, {row.product_id for row in rows if row.hot_inventory and row.is_active}
+        )
+        items = [
+            WishlistProduct.model_validate({**row._mapping, "in_stock": hot[row.product_id] > 0})
+            if row.product_id in hot else WishlistProduct.model_validate(row._mapping)
+            for row in rows
+        ]
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor([items[-1].id])
+        return items, next_cursor
+
+
+wishlist_membership = WishlistMembership(ttl=settings.WISHLIST_CACHE_TTL_SECONDS)
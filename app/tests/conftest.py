@@ -1,6 +1,10 @@
+import asyncio
+
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
 from app.db.base_class import Base
 from app.models.user import User
@@ -52,6 +56,29 @@ def test_user(client):
     db.commit()
     db.close()
 
+@pytest.fixture
+def async_engine(tmp_path):
+    """
+    Async engine on a fresh SQLite file with every table created, for service tests
+    that drive their own event loop with asyncio.run(). NullPool keeps no connection
+    tied to the loop that opened it.
+    """
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", connect_args={"timeout": 30}, poolclass=NullPool
+    )
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield engine
+    asyncio.run(engine.dispose())
+
+@pytest.fixture
+def session_factory(async_engine):
+    return sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 def test_return_health_check(client, test_user):
     response = client.get("/okey")
     assert response.status_code == 200
\ No newline at end of file
@@ -0,0 +1,148 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from app.api.v1 import cart as cart_api
+from app.models.cart import Cart
+from app.models.product import Product
+from app.schemas.cart import CartBatchCreate, CartBatchUpdate, CartCreate
+from app.services.cart import DatabaseCartStore, RedisCartStore
+from app.services.redis_service import redis_service
+
+BUYER = SimpleNamespace(id=1, role="user")
+
+
+async def _add_products(session_factory, prices):
+    async with session_factory() as db:
+        for i, price in enumerate(prices, start=1):
+            db.add(Product(name=f"p{i}", price=price, stock_quantity=10, sku=f"SKU-{i:05d}", is_active=True))
+        await db.commit()
+
+
+@pytest.mark.parametrize("store", [DatabaseCartStore(), RedisCartStore(ttl=60, batch_size=10)], ids=["database", "redis"])
+def test_cart_adds_sums_sets_and_prices_lines(monkeypatch, store, session_factory):
+    monkeypatch.setattr(cart_api, "cart_store", store)
+
+    async def run():
+        await _add_products(session_factory, [10, 2.5, 4])
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            async with session_factory() as db:
+                await cart_api.create_cart(CartCreate(product_id=1, quantity=1), db, BUYER)
+                again = await cart_api.create_cart(CartCreate(product_id=1, quantity=2), db, BUYER)
+                # the same product twice in one batch is summed
+                added = await cart_api.add_cart_items(CartBatchCreate(items=[
+                    {"product_id": 2, "quantity": 1}, {"product_id": 3, "quantity": 1}, {"product_id": 2, "quantity": 3},
+                ]), db, BUYER)
+                # 0 removes a line
+                updated = await cart_api.update_cart_items(CartBatchUpdate(items=[
+                    {"product_id": 3, "quantity": 0}, {"product_id": 1, "quantity": 2},
+                ]), db, BUYER)
+                viewed = await cart_api.get_cart(db, BUYER)
+                if isinstance(store, RedisCartStore):
+                    await store.flush(db)
+                rows = (await db.execute(select(Cart.product_id, Cart.quantity).order_by(Cart.product_id))).all()
+            return again["data"].quantity, added, updated, viewed, [tuple(row) for row in rows]
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    again, added, updated, viewed, rows = asyncio.run(run())
+    assert again == 3
+    assert [(line.product_id, line.quantity, line.subtotal) for line in added["data"]] == [(1, 3, 30), (2, 4, 10), (3, 1, 4)]
+    assert (added["count"], added["total"]) == (3, 44)
+    assert [(line.product_id, line.quantity, line.subtotal) for line in updated["data"]] == [(1, 2, 20), (2, 4, 10)]
+    assert (viewed["count"], viewed["total"]) == (2, 30)
+    assert viewed["data"] == updated["data"]
+    assert rows == [(1, 2), (2, 4)]  # one row per product
+
+
+@pytest.mark.parametrize("store", [DatabaseCartStore(), RedisCartStore(ttl=60, batch_size=10)], ids=["database", "redis"])
+def test_cart_rejects_unknown_products(monkeypatch, store, session_factory):
+    monkeypatch.setattr(cart_api, "cart_store", store)
+
+    async def run():
+        await _add_products(session_factory, [10])
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            async with session_factory() as db:
+                errors = []
+                for call, batch in [
+                    (cart_api.create_cart, CartCreate(product_id=9, quantity=1)),
+                    (cart_api.add_cart_items, CartBatchCreate(items=[
+                        {"product_id": 1, "quantity": 1}, {"product_id": 8, "quantity": 1}, {"product_id": 9, "quantity": 1},
+                    ])),
+                    (cart_api.update_cart_items, CartBatchUpdate(items=[{"product_id": 9, "quantity": 2}])),
+                ]:
+                    with pytest.raises(HTTPException) as error:
+                        await call(batch, db, BUYER)
+                    errors.append((error.value.status_code, error.value.detail))
+                # setting an unknown product to 0 removes nothing and is not an error
+                cleared = await cart_api.update_cart_items(CartBatchUpdate(items=[{"product_id": 9, "quantity": 0}]), db, BUYER)
+                return errors, cleared["count"], await store.items(db, BUYER.id)
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    errors, count, items = asyncio.run(run())
+    assert errors == [(404, "Product 9 not found"), (404, "Product 8, 9 not found"), (404, "Product 9 not found")]
+    assert (count, items) == (0, {})  # nothing from the rejected batches was written
+
+
+def test_redis_cart_flush_drops_lines_for_deleted_products(session_factory):
+    store = RedisCartStore(ttl=60, batch_size=10)
+
+    async def run():
+        await _add_products(session_factory, [10, 20])
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            async with session_factory() as db:
+                await store.add_many(db, 1, {1: 1, 2: 1})
+                await store.add_many(db, 2, {1: 3})
+                await db.execute(delete(Product).where(Product.id == 2))
+                await db.commit()
+                flushed = await store.flush(db)
+                rows = (await db.execute(select(Cart.user_id, Cart.product_id, Cart.quantity).order_by(Cart.user_id))).all()
+                return flushed, [tuple(row) for row in rows], await redis_service._redis.scard(store.DIRTY_KEY)
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    flushed, rows, still_dirty = asyncio.run(run())
+    # both carts are persisted instead of the batch failing on every pass
+    assert (flushed, still_dirty) == (2, 0)
+    assert rows == [(1, 1, 1), (2, 1, 3)]
+
+
+def test_cart_lines_are_deleted_by_row_id_or_product_id(monkeypatch, session_factory):
+    monkeypatch.setattr(cart_api, "cart_store", DatabaseCartStore())
+
+    async def delete_line(call, db, line_id, user=BUYER):
+        try:
+            return (await call(line_id, db, user))["status"]
+        except HTTPException as e:
+            return e.status_code
+
+    async def run():
+        await _add_products(session_factory, [10, 20, 30])
+        async with session_factory() as db:
+            db.add_all([Cart(user_id=BUYER.id, product_id=1, quantity=1), Cart(user_id=BUYER.id, product_id=2, quantity=1),
+                        Cart(user_id=BUYER.id, product_id=3, quantity=1)])
+            await db.commit()
+            results = [
+                await delete_line(cart_api.delete_cart, db, 2, SimpleNamespace(id=2, role="user")),
+                await delete_line(cart_api.delete_cart, db, 2),  # row 2 holds product 2
+                await delete_line(cart_api.delete_cart, db, 2),
+                await delete_line(cart_api.delete_cart_product, db, 3),
+                await delete_line(cart_api.delete_cart_product, db, 3),
+            ]
+            return results, await DatabaseCartStore().items(db, BUYER.id)
+
+    results, items = asyncio.run(run())
+    assert results == [403, "success", 404, "success", 404]
+    assert items == {1: 1}
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.core.utils import utcnow
+from app.models.notification import NotificationOutbox, OutboxStatus
+from app.services.notification import NotificationService
+from app.services.notification_outbox import NotificationOutboxWorker
+
+
+async def _outbox(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(select(NotificationOutbox).order_by(NotificationOutbox.id))
+        return {row.recipient: row for row in result.scalars().all()}
+
+
+async def _make_due(session_factory, recipient):
+    """Move a row's lease or retry time into the past."""
+    async with session_factory() as db:
+        await db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.recipient == recipient)
+            .values(available_at=utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+
+
+def test_outbox_worker_leases_claims_retries_and_dead_letters(monkeypatch, session_factory):
+    sent = []
+
+    def deliver(recipient, subject, message, method="email"):
+        if recipient == "down@example.com":
+            raise ConnectionError("mailbox unavailable")
+        sent.append(recipient)
+
+    monkeypatch.setattr(NotificationService, "deliver", deliver)
+    worker = NotificationOutboxWorker(batch_size=10, max_attempts=2, retry_base=60, retry_max=60, lease=60)
+
+    async def run():
+        async with session_factory() as db:
+            NotificationService.enqueue(db, "rolled-back@example.com", "Hi", "never committed")
+            await db.rollback()
+            NotificationService.enqueue(db, "ok@example.com", "Hi", "hello")
+            NotificationService.enqueue(db, "down@example.com", "Hi", "hello")
+            await db.commit()
+
+        async with session_factory() as db:
+            first = await worker.drain(db)
+            again = await worker.drain(db)  # the failed row waits out its backoff
+        after_failure = await _outbox(session_factory)
+
+        # a worker that dies after claiming leaves the row leased, then it is picked up again
+        async with session_factory() as db:
+            NotificationService.enqueue(db, "crashed@example.com", "Hi", "hello")
+            await db.commit()
+            await worker._claim(db)
+            leased = await worker.drain(db)
+        await _make_due(session_factory, "crashed@example.com")
+        await _make_due(session_factory, "down@example.com")
+        async with session_factory() as db:
+            last = await worker.drain(db)
+        return first, again, after_failure, leased, last, await _outbox(session_factory)
+
+    first, again, after_failure, leased, last, rows = asyncio.run(run())
+    assert (first, again, leased, last) == (2, 0, 0, 2)
+    assert "rolled-back@example.com" not in rows
+    assert sent == ["ok@example.com", "crashed@example.com"]
+
+    retried = after_failure["down@example.com"]
+    assert (retried.status, retried.attempts) == (OutboxStatus.PENDING, 1)
+    assert retried.last_error == "ConnectionError: mailbox unavailable"
+    assert retried.available_at.replace(tzinfo=None) > utcnow().replace(tzinfo=None) + timedelta(seconds=20)
+
+    assert (rows["ok@example.com"].status, rows["ok@example.com"].attempts) == (OutboxStatus.SENT, 1)
+    assert (rows["crashed@example.com"].status, rows["crashed@example.com"].attempts) == (OutboxStatus.SENT, 2)
+    assert (rows["down@example.com"].status, rows["down@example.com"].attempts) == (OutboxStatus.DEAD, 2)
+
+
+def test_digest_window_merges_notifications_into_one_send(monkeypatch, session_factory):
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_WINDOW_SECONDS", 60)
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_MAX_EVENTS", 3)
+    sent = []
+    monkeypatch.setattr(NotificationService, "deliver", lambda *args: sent.append(args))
+    worker = NotificationOutboxWorker(batch_size=10, max_attempts=2, retry_base=60, retry_max=60, lease=60)
+
+    async def enqueue(session_factory, recipient, message, digest_key="order-status"):
+        async with session_factory() as db:
+            await NotificationService.enqueue_digest(db, recipient, digest_key, "Order update", message)
+            await db.commit()
+
+    async def run():
+        await enqueue(session_factory, "slow@example.com", "order 1 shipped")
+        await enqueue(session_factory, "slow@example.com", "order 2 shipped")
+        await enqueue(session_factory, "slow@example.com", "order 3 shipped", digest_key="other")
+        for i in range(1, 4):
+            await enqueue(session_factory, "busy@example.com", f"order {i} shipped")
+        async with session_factory() as db:
+            full_window = await worker.drain(db)  # only busy@'s window is full
+        await _make_due(session_factory, "slow@example.com")
+        async with session_factory() as db:
+            timed_out = await worker.drain(db)
+        return full_window, timed_out
+
+    full_window, timed_out = asyncio.run(run())
+    assert (full_window, timed_out) == (3, 3)
+    assert sent == [
+        ("busy@example.com", "Order update (3 updates)", "order 1 shipped\n\norder 2 shipped\n\norder 3 shipped", "email"),
+        ("slow@example.com", "Order update (2 updates)", "order 1 shipped\n\norder 2 shipped", "email"),
+        ("slow@example.com", "Order update", "order 3 shipped", "email"),
+    ]
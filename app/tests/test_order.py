@@ -0,0 +1,259 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.future import select
+
+from app.models.address import Address
+from app.models.cart import Cart
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.product import Product
+from app.services.inventory import InventoryService
+from app.schemas.order import OrderCreate
+from app.services import order as order_service
+from app.services.cart import RedisCartStore
+from app.services.order import OrderService
+from app.services.redis_service import redis_service
+
+BUYER = SimpleNamespace(id=1, role="user")
+
+
+async def _add_products(session_factory, stock):
+    async with session_factory() as db:
+        for i, quantity in enumerate(stock, start=1):
+            db.add(Product(name=f"p{i}", price=10, stock_quantity=quantity, sku=f"SKU-{i:05d}", is_active=True))
+        await db.commit()
+
+
+async def _stock(session_factory, *product_ids):
+    async with session_factory() as db:
+        return [(await db.get(Product, product_id)).stock_quantity for product_id in product_ids]
+
+
+async def _buy(session_factory, quantities):
+    async with session_factory() as db:
+        try:
+            await InventoryService.reserve(db, quantities)
+            await db.commit()
+            return True
+        except HTTPException:
+            await db.rollback()
+            return False
+
+
+def test_concurrent_buyers_never_oversell(session_factory):
+    async def run():
+        await _add_products(session_factory, [10])
+        results = await asyncio.gather(*(_buy(session_factory, {1: 1}) for _ in range(40)))
+        return sum(results), await _stock(session_factory, 1)
+
+    sold, stock = asyncio.run(run())
+    assert sold == 10
+    assert stock == [0]
+
+
+def test_short_item_rolls_back_whole_reservation(session_factory):
+    async def run():
+        await _add_products(session_factory, [5, 1])
+        async with session_factory() as db:
+            with pytest.raises(HTTPException) as exc:
+                await InventoryService.reserve(db, {1: 2, 2: 3})
+            await db.rollback()
+        after_failure = await _stock(session_factory, 1, 2)
+
+        async with session_factory() as db:
+            await InventoryService.reserve(db, {1: 2, 2: 1})
+            await InventoryService.release(db, {1: 1})
+            await db.commit()
+        return exc.value, after_failure, await _stock(session_factory, 1, 2)
+
+    error, after_failure, after_release = asyncio.run(run())
+    assert error.status_code == 409
+    assert "product 2 (requested 3, available 1)" in error.detail
+    assert after_failure == [5, 1]
+    assert after_release == [4, 0]
+
+
+async def _transition(session_factory, order_id, target, expected_version=None):
+    async with session_factory() as db:
+        try:
+            await OrderService.transition(db, order_id, target, expected_version=expected_version)
+            await db.commit()
+            return target
+        except HTTPException as e:
+            await db.rollback()
+            assert e.status_code == 409
+            return None
+
+
+def test_parallel_transitions_apply_exactly_once(session_factory):
+    async def run():
+        async with session_factory() as db:
+            db.add(Order(user_id=1, total_amount=10))
+            await db.commit()
+        # pay and cancel race for the same pending order
+        targets = [OrderStatus.PAID, OrderStatus.CANCELLED] * 20
+        results = await asyncio.gather(*(_transition(session_factory, 1, target) for target in targets))
+        async with session_factory() as db:
+            order = await db.get(Order, 1)
+        return [result for result in results if result], order
+
+    winners, order = asyncio.run(run())
+    assert len(winners) == 1
+    assert order.status == winners[0]
+    assert order.version == 2
+
+
+def test_transitions_follow_state_machine_and_version(session_factory):
+    async def run():
+        async with session_factory() as db:
+            db.add(Order(user_id=1, total_amount=10))
+            await db.commit()
+        return [
+            await _transition(session_factory, 1, OrderStatus.SHIPPED),  # not paid yet
+            await _transition(session_factory, 1, OrderStatus.PAID, expected_version=1),
+            await _transition(session_factory, 1, OrderStatus.SHIPPED, expected_version=1),  # stale version
+            await _transition(session_factory, 1, OrderStatus.SHIPPED, expected_version=2),
+            await _transition(session_factory, 1, OrderStatus.CANCELLED),  # already shipped
+        ]
+
+    assert asyncio.run(run()) == [None, OrderStatus.PAID, None, OrderStatus.SHIPPED, None]
+
+
+def test_create_order_loads_products_once_and_snapshots_prices(async_engine, session_factory):
+    async def run():
+        await _add_products(session_factory, [5, 5])
+        product_selects = []
+
+        @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+        def count_product_selects(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "FROM products" in statement:
+                product_selects.append(statement)
+
+        async with session_factory() as db:
+            db.add(Address(user_id=BUYER.id, street_address="1 Main St", city="c", state="s", postal_code="1", country="c"))
+            (await db.get(Product, 2)).price = 7
+            await db.commit()
+        product_selects.clear()
+        async with session_factory() as db:
+            order = await OrderService.create_order(db, OrderCreate(shipping_address_id=1, items=[
+                {"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 1}, {"product_id": 1, "quantity": 1},
+            ]), BUYER)
+        selects = len(product_selects)
+
+        async with session_factory() as db:
+            (await db.get(Product, 1)).price = 99  # later price changes don't touch the order
+            await db.commit()
+            with pytest.raises(Exception, match="Product 3 not found"):
+                await OrderService.create_order(db, OrderCreate(shipping_address_id=1, items=[
+                    {"product_id": 1, "quantity": 1}, {"product_id": 3, "quantity": 1},
+                ]), BUYER)
+        async with session_factory() as db:
+            items = (await db.execute(
+                select(OrderItem.product_id, OrderItem.quantity, OrderItem.price).order_by(OrderItem.id)
+            )).all()
+        return order.total_amount, selects, items, await _stock(session_factory, 1, 2)
+
+    total, selects, items, stock = asyncio.run(run())
+    assert total == 37
+    assert selects == 1
+    assert [tuple(item) for item in items] == [(1, 2, 10), (2, 1, 7), (1, 1, 10)]
+    assert stock == [2, 4]  # the failed order reserved nothing
+
+
+def test_order_history_pages_newest_first_with_compact_items(session_factory):
+    async def run():
+        await _add_products(session_factory, [5, 5])
+        async with session_factory() as db:
+            for i in range(5):
+                db.add(Order(user_id=BUYER.id, total_amount=i, order_items=[
+                    OrderItem(product_id=1, quantity=1, price=10), OrderItem(product_id=2, quantity=i, price=10)
+                ][:1 + i % 2]))
+            db.add(Order(user_id=2, total_amount=99))  # someone else's
+            await db.commit()
+        pages, cursor = [], None
+        while True:
+            async with session_factory() as db:
+                page, cursor = await OrderService.list_orders(db, BUYER, limit=2, cursor=cursor, include_items=True)
+            pages.append(page)
+            if cursor is None:
+                return pages
+
+    pages = asyncio.run(run())
+    assert [[order.id for order in page] for page in pages] == [[5, 4], [3, 2], [1]]
+    orders = [order for page in pages for order in page]
+    assert [order.item_count for order in orders] == [1, 2, 1, 2, 1]
+    assert [item.product_name for item in orders[1].items] == ["p1", "p2"]
+
+
+async def _checkout(session_factory, user=BUYER):
+    async with session_factory() as db:
+        try:
+            return (await OrderService.checkout(db, 1, user)).id
+        except HTTPException as e:
+            return e.status_code
+
+
+def test_checkout_orders_the_cart_once_and_removes_its_lines(session_factory):
+    async def run():
+        await _add_products(session_factory, [5, 5])
+        async with session_factory() as db:
+            db.add(Address(user_id=BUYER.id, street_address="1 Main St", city="c", state="s", postal_code="1", country="c"))
+            await db.commit()
+        empty = await _checkout(session_factory)
+
+        async with session_factory() as db:
+            db.add_all([Cart(user_id=BUYER.id, product_id=1, quantity=2), Cart(user_id=2, product_id=1, quantity=1)])
+            await db.commit()
+        # another user can't ship to the buyer's address
+        foreign = await _checkout(session_factory, SimpleNamespace(id=2, role="user"))
+        # the same cart checked out twice at once
+        results = await asyncio.gather(_checkout(session_factory), _checkout(session_factory))
+        async with session_factory() as db:
+            orders = (await db.execute(select(Order.id))).scalars().all()
+            carts = (await db.execute(select(Cart.user_id, Cart.product_id, Cart.quantity))).all()
+        stock = await _stock(session_factory, 1)
+        return empty, foreign, sorted(results), orders, [tuple(cart) for cart in carts], stock
+
+    empty, foreign, results, orders, carts, stock = asyncio.run(run())
+    assert (empty, foreign) == (400, 404)
+    assert results == [1, 409]
+    assert orders == [1]
+    assert carts == [(2, 1, 1)]  # another user's cart is untouched
+    assert stock == [3]
+
+
+def test_redis_checkout_keeps_quantity_added_while_checking_out(monkeypatch, session_factory):
+    store = RedisCartStore(ttl=60, batch_size=10)
+    monkeypatch.setattr(order_service, "cart_store", store)
+    place_order = OrderService._place_order
+
+    async def add_while_placing(db, *args):
+        await store.add(db, BUYER.id, 1, 1)  # a second tab adds one more while the order is placed
+        return await place_order(db, *args)
+
+    monkeypatch.setattr(OrderService, "_place_order", add_while_placing)
+
+    async def run():
+        await _add_products(session_factory, [5, 5])
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            async with session_factory() as db:
+                db.add(Address(user_id=BUYER.id, street_address="1 Main St", city="c", state="s", postal_code="1", country="c"))
+                await db.commit()
+                await store.add_many(db, BUYER.id, {1: 2, 2: 1})
+                await store.flush(db)
+                order = await OrderService.checkout(db, 1, BUYER)
+                rows = (await db.execute(select(Cart.product_id, Cart.quantity))).all()
+                return order.total_amount, await store.items(db, BUYER.id), rows
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    total, cart, rows = asyncio.run(run())
+    assert total == 30
+    assert cart == {1: 1}
+    assert rows == []  # the flushed ordered lines go with the order
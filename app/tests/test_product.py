@@ -0,0 +1,304 @@
+import asyncio
+import io
+import threading
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.address import Address
+from app.models.category import Category
+from app.models.product import Product
+from app.models.user import UserRole
+from app.schemas.order import OrderCreate
+from app.schemas.product import ProductBulkUpdateItem, ProductUpdate
+from app.services import product as product_service
+from app.services.order import OrderService
+from app.services.product import ProductService
+from app.services.product_import import ProductImportService
+from app.services.product_search import ProductSearchService
+from app.services.redis_service import redis_service
+
+ADMIN = SimpleNamespace(id=1, role=UserRole.ADMIN)
+SELLER = SimpleNamespace(id=2, role=UserRole.SELLER)
+
+
+async def _add_products(session_factory, prices):
+    """Products priced `prices`, owned alternately by ADMIN and SELLER."""
+    async with session_factory() as db:
+        db.add(Category(name="general"))
+        for i, price in enumerate(prices, start=1):
+            db.add(Product(
+                name=f"product {i}", description="A product for testing", price=price, stock_quantity=5,
+                sku=f"SKU-{i:05d}", category_id=1, user_id=(ADMIN, SELLER)[i % 2 == 0].id, is_active=True
+            ))
+        await db.commit()
+
+
+async def _all_pages(session_factory, user, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        async with session_factory() as db:
+            page, cursor = await ProductService.get_products(db, user, limit=limit, cursor=cursor, **filters)
+        ids += [product.id for product in page]
+        if cursor is None:
+            return ids
+
+
+def test_product_pages_cover_every_match_once_in_sort_order(session_factory):
+    prices = [5, 3, 5, 1, 9, 3, 7]
+
+    async def run():
+        await _add_products(session_factory, prices)
+        by_price = await _all_pages(session_factory, ADMIN, 3, sort="price")
+        by_price_desc = await _all_pages(session_factory, ADMIN, 2, sort="-price")
+        in_range = await _all_pages(session_factory, ADMIN, 2, sort="price", min_price=3, max_price=5)
+        own = await _all_pages(session_factory, SELLER, 2, sort="price")
+        async with session_factory() as db:
+            with pytest.raises(HTTPException) as bad_cursor:
+                await ProductService.get_products(db, ADMIN, cursor="not-a-cursor")
+        return by_price, by_price_desc, in_range, own, bad_cursor.value.status_code
+
+    by_price, by_price_desc, in_range, own, bad_cursor = asyncio.run(run())
+    ids = range(1, len(prices) + 1)
+    assert by_price == sorted(ids, key=lambda i: (prices[i - 1], i))
+    assert by_price_desc == sorted(ids, key=lambda i: (prices[i - 1], i), reverse=True)
+    assert in_range == [2, 6, 1, 3]
+    assert own == [4, 2, 6]  # the seller only sees its own products
+    assert bad_cursor == 400
+
+
+def test_product_cache_serves_reads_until_a_write_invalidates(session_factory):
+    async def read(session_factory):
+        async with session_factory() as db:
+            detail = await ProductService.get_product_detail(db, 1, ADMIN)
+            listing, _ = await ProductService.get_products(db, ADMIN, sort="price")
+        return detail.price, [product.price for product in listing]
+
+    async def run():
+        await _add_products(session_factory, [5, 3])
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            first = await read(session_factory)
+            # changed behind the service's back: reads keep coming from Redis
+            async with session_factory() as db:
+                await db.execute(update(Product).where(Product.id == 1).values(price=50))
+                await db.commit()
+            cached = await read(session_factory)
+            async with session_factory() as db:
+                await ProductService.update_product(db, 2, ProductUpdate(price=4), ADMIN)
+            after_other_write = await read(session_factory)
+            async with session_factory() as db:
+                await ProductService.update_product(db, 1, ProductUpdate(price=6), ADMIN)
+            return first, cached, after_other_write, await read(session_factory)
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    first, cached, after_other_write, after_write = asyncio.run(run())
+    assert first == cached == (5, [3, 5])
+    # product 2's write drops every listing but not product 1's detail
+    assert after_other_write == (5, [4, 50])
+    assert after_write == (6, [4, 6])
+
+
+def test_search_ranks_matches_and_follows_product_writes(session_factory):
+    async def search(session_factory, q):
+        async with session_factory() as db:
+            try:
+                products, _ = await ProductSearchService.search(db, ADMIN, q)
+            except HTTPException as e:
+                return e.status_code
+        return [product.id for product in products]
+
+    async def run():
+        await _add_products(session_factory, [10, 10, 10])
+        async with session_factory() as db:
+            for product_id, name, description in [
+                (1, "Blue hat", "A woollen hat with a thin red band"),
+                (2, "Red scarf", "Bright red scarf, red fringe"),
+                (3, "Green gloves", "Warm gloves for winter"),
+            ]:
+                product = await db.get(Product, product_id)
+                product.name, product.description = name, description
+            await db.commit()
+        ranked = await search(session_factory, "red")
+
+        # the FTS index follows inserts, updates and deletes
+        async with session_factory() as db:
+            db.add(Product(
+                name="Red mittens", description="Knitted mittens", price=5, stock_quantity=1,
+                sku="SKU-00004", category_id=1, user_id=1
+            ))
+            (await db.get(Product, 3)).name = "Red gloves"
+            await db.delete(await db.get(Product, 2))
+            await db.commit()
+        return ranked, *[await search(session_factory, query) for query in ("red", "green", "   ")]
+
+    ranked, after_writes, renamed_away, blank = asyncio.run(run())
+    assert ranked == [2, 1]  # three mentions outrank one
+    assert sorted(after_writes) == [1, 3, 4]
+    assert renamed_away == []
+    assert blank == 400
+
+
+class _ThreadRecordingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.threads = set()
+
+    def read1(self, *args):
+        self.threads.add(threading.current_thread())
+        return super().read1(*args)
+
+    def read(self, *args):
+        self.threads.add(threading.current_thread())
+        return super().read(*args)
+
+
+def test_import_reports_bad_rows_and_inserts_the_rest(monkeypatch, session_factory):
+    monkeypatch.setattr(settings, "PRODUCT_IMPORT_BATCH_SIZE", 2)
+    csv_file = _ThreadRecordingStream((
+        "name,description,price,category_id,stock_quantity,sku\n"
+        "Lamp,A reading lamp,20,1,3,LAMP-0001\n"
+        "Chair,An office chair,80,1,2,bad sku!\n"
+        "Desk,A standing desk,300,9,1,DESK-0001\n"
+        "Lamp two,Another reading lamp,25,1,3,LAMP-0001\n"
+        "Taken,Clashes with the seed data,5,1,1,SKU-00001\n"
+        "\"Sofa, large\",\"Three seats,\nlinen\",500,1,1,SOFA-0001\n"
+    ).encode())
+    ndjson_file = io.BytesIO(b'{"name": "Rug", "description": "A wool rug", "price": 40, "category_id": 1, "stock_quantity": 1, "sku": "RUG-00001"}\n{oops\n')
+
+    async def run():
+        await _add_products(session_factory, [10])
+        async with session_factory() as db:
+            csv_report = await ProductImportService.import_stream(db, csv_file, "csv", ADMIN)
+            ndjson_report = await ProductImportService.import_stream(db, ndjson_file, "ndjson", ADMIN)
+        async with session_factory() as db:
+            skus = (await db.execute(select(Product.sku).order_by(Product.id))).scalars().all()
+        return csv_report, ndjson_report, skus
+
+    csv_report, ndjson_report, skus = asyncio.run(run())
+    assert (csv_report.total_rows, csv_report.inserted, csv_report.failed) == (6, 2, 4)
+    assert {error.row: error.errors[0].split(":")[0] for error in csv_report.errors} == {
+        2: "sku", 3: "category_id", 4: "Duplicate SKU within the uploaded file", 5: "SKU already exists",
+    }
+    assert (ndjson_report.inserted, ndjson_report.errors[0].row) == (1, 2)
+    assert skus == ["SKU-00001", "LAMP-0001", "SOFA-0001", "RUG-00001"]
+    assert threading.main_thread() not in csv_file.threads  # the upload is read in the threadpool
+
+
+def test_bulk_update_applies_changes_by_id_or_sku_in_chunks(monkeypatch, session_factory):
+    monkeypatch.setattr(product_service, "BULK_UPDATE_CHUNK_SIZE", 2)
+    items = [
+        {"id": 1, "stock_quantity": 0},
+        {"sku": "sku-00003", "price": 33},  # SKUs are matched case-insensitively
+        {"id": 4, "stock_quantity": 40, "price": 44},
+        {"id": 1, "price": 11},  # later entries for a product win, field by field
+        {"id": 99, "price": 1},
+        {"sku": "NOPE-00001", "stock_quantity": 1},
+    ]
+
+    async def run():
+        await _add_products(session_factory, [10, 20, 30, 40, 50])
+        async with session_factory() as db:
+            result = await ProductService.bulk_update_stock_and_price(
+                db, [ProductBulkUpdateItem(**item) for item in items], ADMIN
+            )
+        async with session_factory() as db:
+            # the seller may only touch its own (even-numbered) products
+            seller_result = await ProductService.bulk_update_stock_and_price(
+                db, [ProductBulkUpdateItem(id=1, price=1), ProductBulkUpdateItem(id=2, price=2)], SELLER
+            )
+        async with session_factory() as db:
+            rows = (await db.execute(
+                select(Product.id, Product.stock_quantity, Product.price).order_by(Product.id)
+            )).all()
+        return result, seller_result, rows
+
+    result, seller_result, rows = asyncio.run(run())
+    assert (result.updated, result.unknown_ids, result.unknown_skus) == (3, [99], ["NOPE-00001"])
+    assert (seller_result.updated, seller_result.unknown_ids) == (1, [1])
+    assert [tuple(row) for row in rows] == [(1, 0, 11), (2, 5, 2), (3, 5, 33), (4, 40, 44), (5, 5, 50)]
+
+
+def test_import_rejects_unreadable_files_or_stops_with_a_partial_report(monkeypatch, session_factory):
+    monkeypatch.setattr(settings, "PRODUCT_IMPORT_BATCH_SIZE", 50)
+    header = b"name,description,price,category_id,stock_quantity,sku\n"
+    rows = b"".join(f"Lamp {i},A reading lamp,20,1,3,LAMP-{i:04d}\n".encode() for i in range(1, 301))
+    uploads = {
+        "not_utf8": header + b"Lamp,A reading lamp,20,1,3,LAMP-0001\nCaf\xe9,Bad bytes,5,1,1,CAFE-0001\n",
+        "malformed_csv": header + b'Lamp,"' + b"x" * 200000 + b'",20,1,3,LAMP-0001\n',
+        # the bad bytes sit past the first decoded chunk, after whole batches were committed
+        "late_bad_bytes": header + rows + b"Caf\xe9,Bad bytes,5,1,1,CAFE-0001\n",
+    }
+
+    async def run():
+        await _add_products(session_factory, [10])
+        outcomes = {}
+        for name, data in uploads.items():
+            async with session_factory() as db:
+                try:
+                    outcomes[name] = await ProductImportService.import_stream(db, io.BytesIO(data), "csv", ADMIN)
+                except HTTPException as e:
+                    outcomes[name] = (e.status_code, e.detail)
+        async with session_factory() as db:
+            count = len((await db.execute(select(Product.id))).all())
+        return outcomes, count
+
+    outcomes, count = asyncio.run(run())
+    assert outcomes["not_utf8"] == (400, "Row 1: File is not valid UTF-8")
+    assert outcomes["malformed_csv"][0] == 400 and "Malformed CSV" in outcomes["malformed_csv"][1]
+    report = outcomes["late_bad_bytes"]
+    # rows read before the bad chunk are all imported, the rest are reported as not read
+    assert 50 < report.inserted < 300
+    assert (report.failed, report.errors[0].row) == (1, report.inserted + 1)
+    assert report.errors[0].errors == ["File is not valid UTF-8", "Import stopped, later rows were not read"]
+    assert count == 1 + report.inserted
+
+
+def test_listings_follow_sell_outs_and_stock_changes_keep_updated_at(session_factory):
+    async def listing(session_factory):
+        async with session_factory() as db:
+            products, _ = await ProductService.get_products(db, ADMIN, sort="-updated_at")
+        return [(product.id, product.stock_quantity) for product in products]
+
+    async def order(session_factory, quantity):
+        async with session_factory() as db:
+            return (await OrderService.create_order(
+                db, OrderCreate(shipping_address_id=1, items=[{"product_id": 1, "quantity": quantity}]), ADMIN
+            )).id
+
+    async def run():
+        await _add_products(session_factory, [5, 3])
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            async with session_factory() as db:
+                db.add(Address(user_id=ADMIN.id, street_address="1 Main St", city="c", state="s", postal_code="1", country="c"))
+                await db.commit()
+                before = (await db.get(Product, 1)).updated_at
+            first = await listing(session_factory)
+            await order(session_factory, 2)
+            still_cached = await listing(session_factory)  # stock moved but nothing sold out
+            last = await order(session_factory, 3)
+            sold_out = await listing(session_factory)
+            async with session_factory() as db:
+                await OrderService.cancel_order(db, last, ADMIN)
+            restocked = await listing(session_factory)
+            async with session_factory() as db:
+                after = (await db.get(Product, 1)).updated_at
+            return first, still_cached, sold_out, restocked, before == after
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    first, still_cached, sold_out, restocked, updated_at_kept = asyncio.run(run())
+    # product 2 was created last, and purchases don't move product 1 ahead of it
+    assert first == still_cached == [(2, 5), (1, 5)]
+    assert sold_out == [(2, 5), (1, 0)]
+    assert restocked == [(2, 5), (1, 3)]
+    assert updated_at_kept
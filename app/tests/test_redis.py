@@ -0,0 +1,299 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.address import Address
+from app.models.cart import Cart
+from app.models.order import OrderItem, OrderStatus
+from app.models.product import Product
+from app.models.user import User
+from app.models.wishlist import Wishlist
+from app.schemas.order import OrderCreate, OrderUpdateSchema
+from app.services.cart import RedisCartStore
+from app.services.hot_inventory import hot_inventory
+from app.services.idempotency import REPLAY_HEADER, IdempotencyStore
+from app.services.order import OrderService
+from app.services.redis_service import RedisService, redis_service
+from app.services.wishlist import WishlistService
+
+BUYER = SimpleNamespace(id=1, role="user")
+
+
+async def _add_hot_product(session_factory):
+    async with session_factory() as db:
+        db.add(Address(user_id=BUYER.id, street_address="1 Main St", city="c", state="s", postal_code="1", country="c"))
+        db.add(Product(name="drop", price=10, stock_quantity=10, sku="DROP-00001", is_active=True, hot_inventory=True))
+        await db.commit()
+
+
+async def _checkout(session_factory, quantity):
+    async with session_factory() as db:
+        try:
+            order = await OrderService.create_order(
+                db, OrderCreate(shipping_address_id=1, items=[{"product_id": 1, "quantity": quantity}]), BUYER
+            )
+            return order.id
+        except HTTPException as e:
+            assert e.status_code == 409
+            return None
+
+
+async def _state(session_factory):
+    async with session_factory() as db:
+        stock = (await db.execute(select(Product.stock_quantity).where(Product.id == 1))).scalar_one()
+        pending = (await db.execute(
+            select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.stock_committed.is_(False))
+        )).scalar_one()
+    return stock, pending, int(await redis_service._redis.get("inv:1"))
+
+
+async def _reconcile(session_factory):
+    async with session_factory() as db:
+        return await hot_inventory.reconcile(db)
+
+
+def test_hot_inventory_reserves_in_redis_and_survives_a_restart(session_factory):
+    async def run():
+        await _add_hot_product(session_factory)
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            # concurrent buyers are limited by the Redis counter; the product row is untouched
+            orders = await asyncio.gather(*(_checkout(session_factory, 1) for _ in range(8)))
+            assert sum(order is not None for order in orders) == 8
+            assert await _state(session_factory) == (10, 8, 2)
+            late = await asyncio.gather(*(_checkout(session_factory, 1) for _ in range(5)))
+            assert late.count(None) == 3
+
+            # Redis loses everything before the reconciler ran: the counter is reseeded
+            # from stock_quantity minus the reservations still pending in the database
+            await redis_service._redis.flushall()
+            assert await _checkout(session_factory, 1) is None
+            assert await _state(session_factory) == (10, 10, 0)
+
+            assert await _reconcile(session_factory) == 10
+            assert await _state(session_factory) == (0, 0, 0)
+
+            # cancelling a reconciled order returns stock to both the table and the counter
+            first = next(order for order in orders if order is not None)
+            async with session_factory() as db:
+                await OrderService.cancel_order(db, first, BUYER)
+            assert await _state(session_factory) == (1, 0, 1)
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    asyncio.run(run())
+
+
+def test_admin_status_cancel_returns_stock_like_cancel_order(session_factory):
+    async def run():
+        await _add_hot_product(session_factory)
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            async with session_factory() as db:
+                db.add(User(email="buyer@example.com", hashed_password="x"))
+                db.add(Product(name="plain", price=5, stock_quantity=4, sku="PLAIN-0001", is_active=True))
+                await db.commit()
+                order = await OrderService.create_order(db, OrderCreate(shipping_address_id=1, items=[
+                    {"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 3},
+                ]), BUYER)
+            placed = await _state(session_factory)
+
+            async with session_factory() as db:
+                await OrderService.update_order_status(db, order.id, OrderUpdateSchema(status=OrderStatus.CANCELLED))
+            async with session_factory() as db:
+                plain_stock = (await db.get(Product, 2)).stock_quantity
+            return placed, await _state(session_factory), plain_stock, await _reconcile(session_factory)
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    placed, cancelled, plain_stock, reconciled = asyncio.run(run())
+    assert placed == (10, 2, 8)
+    # the hot item is claimed and its counter refilled, the plain item goes back to the table
+    assert cancelled == (10, 0, 10)
+    assert plain_stock == 4
+    assert reconciled == 0
+
+
+def test_hot_inventory_is_unavailable_without_redis(monkeypatch, session_factory):
+    async def run():
+        await _add_hot_product(session_factory)
+        monkeypatch.setattr(redis_service, "_retry_at", float("inf"))
+        async with session_factory() as db:
+            try:
+                await OrderService.create_order(
+                    db, OrderCreate(shipping_address_id=1, items=[{"product_id": 1, "quantity": 1}]), BUYER
+                )
+            except HTTPException as e:
+                return e.status_code
+
+    assert asyncio.run(run()) == 503
+
+
+def test_reseeded_counter_holds_back_reservations_still_in_flight(monkeypatch, session_factory):
+    place_order = OrderService._place_order
+
+    async def run():
+        await _add_hot_product(session_factory)
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        calls, during = [], []
+
+        async def interleave(db, *args):
+            order = await place_order(db, *args)
+            calls.append(order)
+            if len(calls) == 1:
+                # stock is edited while this order is uncommitted and the next buyer reseeds the counter
+                await hot_inventory.forget([1])
+                during.append(await _checkout(session_factory, 3))
+            else:
+                raise HTTPException(status_code=409, detail="Payment declined")  # rolled back after reserving
+            return order
+
+        monkeypatch.setattr(OrderService, "_place_order", interleave)
+        try:
+            first = await _checkout(session_factory, 8)
+            declined = await _checkout(session_factory, 2)
+            return first, during, declined, await _state(session_factory), await redis_service._redis.hlen("inv:1:held")
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    first, during, declined, state, held = asyncio.run(run())
+    assert first == 1
+    assert during == [None]  # 10 in stock, 8 of them reserved by the uncommitted order
+    assert declined is None
+    assert state == (10, 8, 2)
+    assert held == 0
+
+
+def test_wishlist_in_stock_follows_hot_inventory_counters(session_factory):
+    async def run():
+        await _add_hot_product(session_factory)
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            async with session_factory() as db:
+                db.add(Wishlist(user_id=BUYER.id, product_id=1))
+                await db.commit()
+                states = []
+                for counter in (0, 4, None):
+                    if counter is None:
+                        await redis_service._redis.delete("inv:1")  # falls back to the database
+                    else:
+                        await redis_service._redis.set("inv:1", counter)
+                    items, _ = await WishlistService.list_items(db, BUYER.id)
+                    states.append(items[0].in_stock)
+                return states
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    assert asyncio.run(run()) == [False, True, True]
+
+
+def test_redis_cart_writes_behind_and_reloads(session_factory):
+    async def run():
+        await _add_hot_product(session_factory)
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        store = RedisCartStore(ttl=60, batch_size=10)
+        try:
+            async with session_factory() as db:
+                db.add(Cart(user_id=BUYER.id, product_id=7, quantity=2))  # flushed earlier
+                await db.commit()
+
+                # the cold cart is loaded from the table, then lives in Redis
+                assert await store.add(db, BUYER.id, 1, 2) == 2
+                assert await store.add(db, BUYER.id, 1, 3) == 5
+                assert await store.remove(db, BUYER.id, 7)
+                assert await store.items(db, BUYER.id) == {1: 5}
+                rows = (await db.execute(select(Cart.product_id, Cart.quantity))).all()
+                assert rows == [(7, 2)]  # nothing written yet
+
+                assert await store.flush(db) == 1
+                assert await store.flush(db) == 0
+                rows = (await db.execute(select(Cart.product_id, Cart.quantity))).all()
+                assert rows == [(1, 5)]
+
+                # Redis loses the cart: it comes back from the last flush
+                await redis_service._redis.flushall()
+                assert await store.items(db, BUYER.id) == {1: 5}
+                await store.clear(db, BUYER.id)
+                assert await store.items(db, BUYER.id) == {}
+                await store.flush(db)
+                return (await db.execute(select(func.count()).select_from(Cart))).scalar_one()
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    assert asyncio.run(run()) == 0
+
+
+def test_idempotency_key_runs_a_request_once_and_replays_it():
+    store = IdempotencyStore(ttl=60, lock_ttl=10, wait_seconds=2)
+    calls = []
+
+    def handler(status_code):
+        async def handle():
+            calls.append(status_code)
+            await asyncio.sleep(0.05)
+            return JSONResponse(status_code=status_code, content={"call": len(calls)})
+        return handle
+
+    async def run():
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            # a double submit: the duplicate waits for the first response instead of running
+            first, duplicate = await asyncio.gather(
+                store.run(1, "orders:create", "k1", "body-a", handler(201)),
+                store.run(1, "orders:create", "k1", "body-a", handler(201)),
+            )
+            with pytest.raises(HTTPException) as reused:
+                await store.run(1, "orders:create", "k1", "body-b", handler(201))
+            # another user's key of the same name is independent
+            other_user = await store.run(2, "orders:create", "k1", "body-a", handler(201))
+            # server errors are not stored, so a retry runs again
+            failed = await store.run(1, "orders:create", "k2", "body-a", handler(503))
+            retried = await store.run(1, "orders:create", "k2", "body-a", handler(201))
+            return first, duplicate, reused.value.status_code, other_user, failed, retried
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    first, duplicate, reused, other_user, failed, retried = asyncio.run(run())
+    assert calls == [201, 201, 503, 201]
+    assert (first.status_code, first.body) == (duplicate.status_code, duplicate.body) == (201, b'{"call":1}')
+    assert REPLAY_HEADER not in first.headers and duplicate.headers[REPLAY_HEADER] == "true"
+    assert reused == 422
+    assert other_user.body == b'{"call":2}'
+    assert (failed.status_code, retried.status_code) == (503, 201)
+
+
+def test_redis_waits_out_the_configured_cooldown_after_a_failed_connect(monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_RECONNECT_COOLDOWN_SECONDS", 7)
+    service = RedisService()
+    service.redis_url = None  # every connect attempt fails
+    connects = []
+    real_connect = service.connect
+
+    async def connect():
+        connects.append(1)
+        await real_connect()
+
+    monkeypatch.setattr(service, "connect", connect)
+
+    async def run():
+        assert await service.get("key") is None
+        assert await service.get("key") is None  # inside the cooldown: no second attempt
+        return service._retry_at - time.monotonic()
+
+    remaining = asyncio.run(run())
+    assert len(connects) == 1
+    assert 6 < remaining <= 7
@@ -0,0 +1,99 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app.models.product import Product
+from app.models.review import Review
+from app.models.user import User
+from app.schemas.review import ReviewCreate, ReviewUpdate
+from app.services.redis_service import redis_service
+from app.services.review import ReviewService
+
+
+async def _add_reviewers(session_factory, reviewers):
+    async with session_factory() as db:
+        users = [User(email=f"reviewer{i}@example.com", hashed_password="x") for i in range(1, reviewers + 1)]
+        db.add_all(users)
+        db.add_all([Product(name=f"p{i}", price=10, sku=f"SKU-{i:05d}") for i in (1, 2)])
+        await db.commit()
+    return users
+
+
+async def _review(session_factory, call, *args):
+    async with session_factory() as db:
+        return await call(db, *args)
+
+
+def test_review_writes_keep_product_rating_stats_in_step(session_factory):
+    async def run():
+        users = await _add_reviewers(session_factory, 4)
+        # concurrent reviews of one product are all counted
+        reviews = await asyncio.gather(*(
+            _review(session_factory, ReviewService.create, ReviewCreate(product_id=1, rating=rating), user)
+            for user, rating in zip(users, (5, 4, 4, 1))
+        ))
+        await _review(
+            session_factory, ReviewService.update, reviews[3].id, ReviewUpdate(rating=2, comment="meh"), users[3]
+        )
+        await _review(session_factory, ReviewService.delete, reviews[0].id, users[0])
+        with pytest.raises(HTTPException) as missing:
+            await _review(session_factory, ReviewService.create, ReviewCreate(product_id=99, rating=3), users[0])
+        with pytest.raises(HTTPException) as foreign:
+            await _review(session_factory, ReviewService.delete, reviews[1].id, users[0])
+        async with session_factory() as db:
+            live = (await db.get(Product, 1)).rating
+
+        # drift both products, then repair from the reviews table
+        async with session_factory() as db:
+            await db.execute(update(Product).values(rating_count=7, rating_sum=30, rating_5=7))
+            await db.commit()
+        repaired = await _review(session_factory, ReviewService.recompute_ratings)
+        async with session_factory() as db:
+            recomputed = [(await db.get(Product, i)).rating for i in (1, 2)]
+        return live, missing.value, foreign.value, sorted(repaired), recomputed
+
+    live, missing, foreign, repaired, recomputed = asyncio.run(run())
+    assert live == {"count": 3, "sum": 10, "histogram": {1: 0, 2: 1, 3: 0, 4: 2, 5: 0}}
+    assert (missing.status_code, foreign.status_code) == (404, 403)
+    assert repaired == [1, 2]
+    assert recomputed == [live, {"count": 0, "sum": 0, "histogram": dict.fromkeys(range(1, 6), 0)}]
+
+
+def test_review_pages_follow_keyset_and_first_page_is_cached(session_factory):
+    async def page(session_factory, cursor=None, sort="-created_at"):
+        reviews, next_cursor = await _review(session_factory, ReviewService.list_for_product, 1, 2, cursor, sort)
+        return [review.id for review in reviews], next_cursor
+
+    async def run():
+        users = await _add_reviewers(session_factory, 4)
+        redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        try:
+            for user, rating in zip(users[:3], (3, 5, 3)):
+                await _review(session_factory, ReviewService.create, ReviewCreate(product_id=1, rating=rating), user)
+
+            first, cursor = await page(session_factory)
+            second, last_cursor = await page(session_factory, cursor)
+            top_rated, rating_cursor = await page(session_factory, sort="-rating")
+            rest_rated, _ = await page(session_factory, rating_cursor, "-rating")
+
+            # written behind the service's back: the cached first page doesn't see it
+            async with session_factory() as db:
+                db.add(Review(product_id=1, user_id=users[3].id, rating=1))
+                await db.commit()
+            cached, _ = await page(session_factory)
+            # a review write invalidates it
+            await _review(session_factory, ReviewService.update, first[0], ReviewUpdate(rating=4), users[2])
+            refreshed, _ = await page(session_factory)
+            return first, second, last_cursor, top_rated + rest_rated, cached, refreshed
+        finally:
+            await redis_service._redis.aclose()
+            redis_service._redis = None
+
+    first, second, last_cursor, by_rating, cached, refreshed = asyncio.run(run())
+    assert (first, second, last_cursor) == ([3, 2], [1], None)
+    assert by_rating == [2, 3, 1]  # 5 stars, then the two 3s newest first
+    assert cached == [3, 2]
+    assert refreshed == [4, 3]
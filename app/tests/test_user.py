@@ -0,0 +1,361 @@
+import asyncio
+import email
+import socketserver
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from fastapi import HTTPException
+from app.api.deps import get_current_user, revoke_user_tokens
+from app.api.v1.user import authenticate_user
+from app.core.config import settings
+from app.core.security import PasswordHashPool, build_token_claims, create_access_token, hash_password
+from app.core.utils import utcnow
+from app.models.notification import CampaignStatus, PromoCampaign
+from app.models.user import User
+from app.services.promo_campaign import PromoCampaignRunner
+from app.services.refresh_token import RefreshTokenService
+from app.services.smtp_pool import SMTPConnectionPool
+from app.schemas.user import TokenPrincipal
+from app.services.token_denylist import token_denylist
+from app.services.user_cache import UserCache, user_cache
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL/RCPT/DATA, RSET, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN")
+            elif command == "AUTH":
+                self.server.logins += 1
+                self.reply("235 Authentication successful")
+            elif command == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(line.split(":", 1)[1].strip(" <>"))
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while (data_line := self.rfile.readline().decode()) != ".\r\n":
+                    data.append(data_line)
+                with self.server.lock:
+                    for recipient in recipients:
+                        self.server.messages.append((recipient, email.message_from_string("".join(data))))
+                self.reply("250 OK queued")
+            elif command in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+
+
+def _smtp_server():
+    server = _SMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _add_users(session_factory, users):
+    async with session_factory() as db:
+        for i, active in enumerate(users, start=1):
+            db.add(User(email=f"user{i}@example.com", hashed_password="x", is_active=active))
+        await db.commit()
+
+
+def _runner(session_factory, server, pools, concurrency=3, batch_size=4):
+    def pool_factory(size):
+        pool = SMTPConnectionPool("127.0.0.1", server.server_address[1], "promo", "secret", False, size)
+        pools.append(pool)
+        return pool
+
+    return PromoCampaignRunner(
+        batch_size=batch_size, concurrency=concurrency, rate=0, stale_seconds=60,
+        session_factory=session_factory, pool_factory=pool_factory
+    )
+
+
+def test_promo_campaign_reaches_every_active_user_over_pooled_connections(session_factory):
+    server = _smtp_server()
+    pools = []
+
+    async def run():
+        # users 5 and 10 are inactive
+        await _add_users(session_factory, [i not in (5, 10) for i in range(1, 24)])
+        async with session_factory() as db:
+            db.add(PromoCampaign(subject="Sale", message="Everything must go"))
+            await db.commit()
+        runner = _runner(session_factory, server, pools)
+        campaign_id = await runner.claim()
+        assert campaign_id is not None
+        assert await runner.claim() is None  # already taken
+        await runner.run_campaign(campaign_id)
+        async with session_factory() as db:
+            return await db.get(PromoCampaign, campaign_id)
+
+    try:
+        campaign = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    expected = {f"user{i}@example.com" for i in range(1, 24) if i not in (5, 10)}
+    assert sorted(recipient for recipient, _ in server.messages) == sorted(expected)
+    assert all(message["Subject"] == "Sale" for _, message in server.messages)
+    # connections are opened once and reused across chunks
+    assert pools[0].connections_opened <= 3
+    assert server.connections == server.logins == pools[0].connections_opened
+    assert campaign.status == CampaignStatus.COMPLETED
+    assert (campaign.total_recipients, campaign.sent_count, campaign.failed_count) == (21, 21, 0)
+    assert campaign.last_user_id == 23
+
+
+def test_stale_promo_campaign_resumes_from_checkpoint(session_factory):
+    server = _smtp_server()
+    pools = []
+
+    async def run():
+        await _add_users(session_factory, [True] * 10)
+        async with session_factory() as db:
+            # a worker sent to users 1-6 and then died
+            db.add(PromoCampaign(
+                subject="Sale", message="Everything must go", status=CampaignStatus.RUNNING,
+                total_recipients=10, sent_count=6, last_user_id=6,
+                heartbeat_at=utcnow() - timedelta(minutes=5)
+            ))
+            await db.commit()
+        runner = _runner(session_factory, server, pools, concurrency=2)
+        campaign_id = await runner.claim()
+        await runner.run_campaign(campaign_id)
+        async with session_factory() as db:
+            return await db.get(PromoCampaign, campaign_id)
+
+    try:
+        campaign = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert sorted(recipient for recipient, _ in server.messages) == sorted(f"user{i}@example.com" for i in range(7, 11))
+    assert campaign.status == CampaignStatus.COMPLETED
+    assert (campaign.sent_count, campaign.last_user_id) == (10, 10)
+
+
+class _SlowPool:
+    """Stands in for the SMTP pool: every send takes `delay` seconds."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+
+    def send(self, sender, recipient, message):
+        time.sleep(self.delay)
+        self.sent.append(recipient)
+
+    def close(self):
+        pass
+
+
+def test_promo_heartbeat_keeps_a_slow_chunk_claimed(session_factory):
+    pool = _SlowPool(0.1)
+
+    async def run():
+        await _add_users(session_factory, [True] * 15)
+        async with session_factory() as db:
+            db.add(PromoCampaign(subject="Sale", message="Everything must go"))
+            await db.commit()
+        # one chunk of 15 sends takes 1.5s, longer than the 0.6s stale window
+        runner = PromoCampaignRunner(
+            batch_size=50, concurrency=1, rate=0, stale_seconds=0.6,
+            session_factory=session_factory, pool_factory=lambda size: pool
+        )
+        rival = PromoCampaignRunner(
+            batch_size=50, concurrency=1, rate=0, stale_seconds=0.6, session_factory=session_factory
+        )
+        campaign_id = await runner.claim()
+        sending = asyncio.create_task(runner.run_campaign(campaign_id))
+        takeovers = []
+        while not sending.done():
+            await asyncio.sleep(0.15)
+            takeovers.append(await rival.claim())
+        await sending
+        async with session_factory() as db:
+            return takeovers, await db.get(PromoCampaign, campaign_id)
+
+    takeovers, campaign = asyncio.run(run())
+    assert len(takeovers) >= 5 and set(takeovers) == {None}
+    assert sorted(pool.sent) == sorted(f"user{i}@example.com" for i in range(1, 16))
+    assert (campaign.status, campaign.sent_count) == (CampaignStatus.COMPLETED, 15)
+
+
+def test_cached_user_is_a_usable_session_object_without_the_password_hash(session_factory):
+    cache = UserCache(max_size=10, ttl=60, use_redis=False)
+
+    async def run():
+        await _add_users(session_factory, [True])
+        async with session_factory() as db:
+            (await db.get(User, 1)).hashed_password = hash_password("password123")
+            await db.commit()
+
+        # the hash is never loaded implicitly, whether the user came from the database or the cache
+        for _ in range(2):
+            async with session_factory() as db:
+                cached = await cache.get_user(db, "user1@example.com")
+                with pytest.raises(InvalidRequestError):
+                    cached.hashed_password
+        async with session_factory() as db:
+            cached = await cache.get_user(db, "user1@example.com")
+            # a handler can modify and commit the cached user like any other
+            cached.name = "Renamed"
+            await db.commit()
+        async with session_factory() as db:
+            authenticated = await authenticate_user("user1@example.com", "password123", db)
+            rejected = await authenticate_user("user1@example.com", "wrong-password", db)
+            return cached, authenticated, rejected
+
+    cached, authenticated, rejected = asyncio.run(run())
+    assert cache.db_queries == 1  # later lookups were cache hits
+    assert (cached.id, cached.email, cached.is_active) == (1, "user1@example.com", True)
+    assert authenticated.name == "Renamed"
+    assert rejected is False
+
+
+def test_password_hashing_is_bounded_and_off_the_event_loop():
+    pool = PasswordHashPool(concurrency=2)
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0, "threads": set()}
+
+    def slow_hash(value):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            state["threads"].add(threading.current_thread().name)
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return value
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticking = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(pool.run(slow_hash, i) for i in range(6)))
+        ticking.cancel()
+        return results, ticks
+
+    # each asyncio.run is a new event loop, as with test clients and CLI commands
+    for _ in range(2):
+        results, ticks = asyncio.run(run())
+        assert results == list(range(6))
+        assert ticks > 10  # the loop kept running while hashes were in flight
+
+    assert state["peak"] == 2
+    assert all(name.startswith("password-hash") for name in state["threads"])
+    assert pool.max_waiting == 4 and pool.completed == 12  # four of each six queued behind the bound
+
+
+def test_stateless_tokens_skip_the_database_until_revoked(monkeypatch, session_factory):
+    monkeypatch.setattr(settings, "STATELESS_AUTH", True)
+    user_cache.clear()
+
+    async def rejected(token, db):
+        try:
+            await get_current_user(db=db, token=token)
+        except HTTPException as e:
+            return e.status_code
+
+    async def run():
+        await _add_users(session_factory, [True])
+        try:
+            async with session_factory() as db:
+                user = await db.get(User, 1)
+                old_token = create_access_token(data=build_token_claims(user))
+            # no session at all: the signed claims are enough
+            principal = await get_current_user(db=None, token=old_token)
+
+            async with session_factory() as db:
+                user = await db.get(User, 1)
+                await revoke_user_tokens(db, user)
+                new_token = create_access_token(data=build_token_claims(user))
+            stateless = await rejected(old_token, None)
+            fresh = await get_current_user(db=None, token=new_token)
+
+            monkeypatch.setattr(settings, "STATELESS_AUTH", False)
+            async with session_factory() as db:
+                stateful = await rejected(old_token, db)
+            return principal, stateless, fresh, stateful
+        finally:
+            token_denylist._local.clear()
+            user_cache.clear()
+
+    principal, stateless, fresh, stateful = asyncio.run(run())
+    assert isinstance(principal, TokenPrincipal)
+    assert (principal.id, principal.email, principal.token_version) == (1, "user1@example.com", 0)
+    assert (stateless, stateful) == (401, 401)
+    assert fresh.token_version == 1
+
+
+def test_reusing_a_rotated_refresh_token_revokes_its_family(session_factory):
+    async def exchange(session_factory, token):
+        async with session_factory() as db:
+            try:
+                return (await RefreshTokenService.rotate(db, token))[1]
+            except HTTPException as e:
+                return e.status_code
+
+    async def run():
+        await _add_users(session_factory, [True])
+        async with session_factory() as db:
+            user = await db.get(User, 1)
+            first = await RefreshTokenService.issue(db, user)
+            other_login = await RefreshTokenService.issue(db, user)
+
+        second = await exchange(session_factory, first)
+        third = await exchange(session_factory, second)
+        # the stolen first token comes back: the whole family dies, the other login survives
+        return (
+            second, third, await exchange(session_factory, first), await exchange(session_factory, third),
+            await exchange(session_factory, other_login)
+        )
+
+    second, third, reused, after_reuse, other_login = asyncio.run(run())
+    assert isinstance(second, str) and isinstance(third, str) and second != third
+    assert (reused, after_reuse) == (401, 401)
+    assert isinstance(other_login, str)
@@ -0,0 +1,114 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+from sqlalchemy import delete
+
+from app.models.product import Product
+from app.models.wishlist import Wishlist
+from app.services.redis_service import redis_service
+from app.services.wishlist import WishlistMembership, WishlistService, wishlist_membership
+
+BUYER = SimpleNamespace(id=1, role="user")
+
+
+async def _add_products(session_factory, stock):
+    async with session_factory() as db:
+        for i, quantity in enumerate(stock, start=1):
+            db.add(Product(name=f"p{i}", price=10, stock_quantity=quantity, sku=f"SKU-{i:05d}", is_active=True))
+        await db.commit()
+
+
+async def _contains(session_factory, *product_ids):
+    async with session_factory() as db:
+        flags = await wishlist_membership.contains(db, BUYER.id, list(product_ids))
+    return [product_id for product_id, wishlisted in flags.items() if wishlisted]
+
+
+def test_wishlist_membership_rebuilds_serves_and_follows_writes(monkeypatch, session_factory):
+    from_db = WishlistMembership._from_db
+    racing = []
+
+    async def add_during_rebuild(db, user_id, product_ids=None):
+        wishlisted = await from_db(db, user_id, product_ids)
+        if racing:
+            # an add commits between the rebuild's read and its load
+            async with racing.pop()() as other:
+                await WishlistService.add(other, user_id, 3)
+        return wishlisted
+
+    async def run():
+        await _add_products(session_factory, [1, 1, 1])
+        try:
+            async with session_factory() as db:
+                await WishlistService.add(db, BUYER.id, 1)
+            # no Redis: answered by an IN query
+            monkeypatch.setattr(redis_service, "_retry_at", float("inf"))
+            without_redis = await _contains(session_factory, 1, 2)
+            monkeypatch.undo()
+
+            redis_service._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+            rebuilt = await _contains(session_factory, 1, 2, 3)
+            async with session_factory() as db:
+                db.add(Wishlist(user_id=BUYER.id, product_id=2))  # behind the service's back
+                await db.commit()
+            hit = await _contains(session_factory, 1, 2, 3)
+
+            async with session_factory() as db:
+                await db.execute(delete(Wishlist).where(Wishlist.product_id == 1))
+                await db.commit()
+                await wishlist_membership.invalidate(BUYER.id)
+            after_remove = await _contains(session_factory, 1, 2, 3)
+
+            monkeypatch.setattr(WishlistMembership, "_from_db", staticmethod(add_during_rebuild))
+            async with session_factory() as db:
+                await db.execute(delete(Wishlist).where(Wishlist.product_id == 2))
+                await db.commit()
+                await wishlist_membership.invalidate(BUYER.id)
+            racing.append(session_factory)
+            during_race = await _contains(session_factory, 1, 2, 3)
+            after_race = await _contains(session_factory, 1, 2, 3)
+            sets = sorted(await redis_service._redis.keys("wishlist:*:v[0-9]*"))
+            return without_redis, rebuilt, hit, after_remove, during_race, after_race, sets
+        finally:
+            if redis_service._redis is not None:
+                await redis_service._redis.aclose()
+                redis_service._redis = None
+
+    without_redis, rebuilt, hit, after_remove, during_race, after_race, sets = asyncio.run(run())
+    assert without_redis == [1]
+    assert rebuilt == hit == [1]  # the set is served until a write through the service
+    assert after_remove == [2]
+    assert during_race == []  # the stale snapshot answers the request that read it...
+    assert after_race == [3]  # ...but is never served again
+    # replaced sets are deleted; the racing rebuild's stale v2 is never read and expires
+    assert sets == ["wishlist:1:v2", "wishlist:1:v3"]
+
+
+def test_wishlist_add_is_idempotent_and_pages_cover_every_item_once(session_factory):
+    stock = [3, 0, 1, 0, 2]
+
+    async def run():
+        await _add_products(session_factory, stock)
+        async with session_factory() as db:
+            (await db.get(Product, 5)).is_active = False
+            await db.commit()
+            first, first_added = await WishlistService.add(db, BUYER.id, 1)
+            again, again_added = await WishlistService.add(db, BUYER.id, 1)
+            for product_id in range(2, 6):
+                await WishlistService.add(db, BUYER.id, product_id)
+            await WishlistService.add(db, 2, 1)  # someone else's
+
+        pages, cursor = [], None
+        while True:
+            async with session_factory() as db:
+                page, cursor = await WishlistService.list_items(db, BUYER.id, limit=2, cursor=cursor)
+            pages.append([(item.product_id, item.in_stock) for item in page])
+            if cursor is None:
+                return (first.id, first_added), (again.id, again_added), pages
+
+    first, again, pages = asyncio.run(run())
+    assert first == (1, True)
+    assert again == (1, False)
+    # newest first; out of stock and inactive products are flagged
+    assert pages == [[(5, False), (4, False)], [(3, True), (2, False)], [(1, True)]]